@@ -0,0 +1,151 @@
+"""
+Shared per-API-key request budget for Gemini calls
+
+Every extractor using the same API key - across pages, documents and batch
+requests in one process - draws from one budget: at most max_concurrent
+calls in flight and at most requests_per_minute calls started per minute.
+Calls rejected with 429 (quota) or a 5xx error are retried with exponential
+backoff, without holding a concurrency slot while waiting.
+"""
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Deployment defaults, overridable per key with get_api_budget
+DEFAULT_MAX_CONCURRENT = int(os.environ.get('GEMINI_MAX_CONCURRENT', 4))
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get('GEMINI_REQUESTS_PER_MINUTE', 60))
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Check if a Gemini API error is transient (quota or server side)
+
+    Args:
+        error (Exception): Exception raised by generate_content
+
+    Returns:
+        bool: True for 429 and 5xx responses
+    """
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    message = str(error).lower()
+    return any(str(status) in message for status in RETRYABLE_STATUS_CODES) or 'resource exhausted' in message
+
+
+class ApiKeyBudget:
+    """Concurrency and rate budget shared by all calls made with one API key"""
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+                 max_retries: int = 4, backoff_seconds: float = 2.0):
+        """
+        Args:
+            max_concurrent (int): Calls allowed in flight at once
+            requests_per_minute (int): Calls allowed to start per minute (0 = unlimited)
+            max_retries (int): Retries of a call rejected with 429/5xx
+            backoff_seconds (float): First retry delay, doubled on every retry
+        """
+        self.max_concurrent = max_concurrent
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._started = deque()  # start times of calls in the last minute
+
+    def _wait_for_rate(self):
+        """Block until another call may start within requests_per_minute"""
+        if self.requests_per_minute <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._started and now - self._started[0] >= 60.0:
+                    self._started.popleft()
+                if len(self._started) < self.requests_per_minute:
+                    self._started.append(now)
+                    return
+                wait = 60.0 - (now - self._started[0])
+            time.sleep(wait)
+
+    def call(self, function: Callable, *args, **kwargs):
+        """
+        Run an API call within the budget, retrying transient failures
+
+        Args:
+            function (Callable): The API call, e.g. model.generate_content
+            *args, **kwargs: Arguments for the call
+
+        Returns:
+            Whatever the call returns
+        """
+        return self.call_counted(function, *args, **kwargs)[0]
+
+    def call_counted(self, function: Callable, *args, **kwargs) -> Tuple[Any, int]:
+        """
+        Like call, but also report how many retries the call needed
+
+        Returns:
+            Tuple of (what the call returns, number of retries)
+        """
+        attempt = 0
+        while True:
+            self._wait_for_rate()
+            with self._slots:
+                try:
+                    return function(*args, **kwargs), attempt
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable_error(e):
+                        raise
+                    error = e
+
+            # Back off outside the slot so other calls can proceed
+            delay = self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+            attempt += 1
+            registry.inc("pdf_extractor_gemini_retries_total")
+            logger.warning(f"Gemini API call failed ({error}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+_budgets: Dict[str, ApiKeyBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def get_api_budget(api_key: str, max_concurrent: Optional[int] = None,
+                   requests_per_minute: Optional[int] = None) -> ApiKeyBudget:
+    """
+    Return the process-wide budget for an API key, creating it on first use
+
+    Args:
+        api_key (str): Gemini API key
+        max_concurrent (int): Concurrency limit used when the budget is created
+        requests_per_minute (int): Rate limit used when the budget is created
+
+    Returns:
+        ApiKeyBudget shared by every caller using this key
+    """
+    # Keys are held by digest only
+    key_id = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+    with _budgets_lock:
+        budget = _budgets.get(key_id)
+        if budget is None:
+            budget = ApiKeyBudget(
+                max_concurrent if max_concurrent is not None else DEFAULT_MAX_CONCURRENT,
+                requests_per_minute if requests_per_minute is not None else DEFAULT_REQUESTS_PER_MINUTE
+            )
+            _budgets[key_id] = budget
+        return budget
@@ -5,11 +5,21 @@ import zipfile
 import logging
 import traceback
 import sys
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 from pathlib import Path
 import tempfile
 import shutil
+import queue
+import threading
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from page_index import check_page_ranges, parse_targets
+from table_export import OUTPUT_FORMATS, PYARROW_AVAILABLE
+from result_cache import ResultCache, result_cache_key
+from metrics import registry
 
 # Configure logging to show everything
 logging.basicConfig(
@@ -27,15 +37,277 @@ UPLOAD_FOLDER = 'uploads'
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
 ALLOWED_EXTENSIONS = {'pdf'}
 
+# Page image encoding sent to Gemini - per deployment, overridable per request
+IMAGE_ENCODING = {
+    'format': os.environ.get('IMAGE_FORMAT', 'PNG'),
+    'quality': int(os.environ.get('IMAGE_QUALITY', 85)),
+    'mode': os.environ.get('IMAGE_MODE', 'RGB'),
+    'max_long_edge': int(os.environ['IMAGE_MAX_LONG_EDGE']) if os.environ.get('IMAGE_MAX_LONG_EDGE') else None
+}
+
+# Batch uploads - a whole results season in one request
+BATCH_MAX_CONTENT_LENGTH = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', 256 * 1024 * 1024))  # 256MB
+BATCH_DOCUMENT_WORKERS = int(os.environ.get('BATCH_DOCUMENT_WORKERS', 4))  # Documents processed at once
+
+# Longest a request may run - keep at or below the server's worker timeout. An
+# upload waiting for an identical running extraction gives up within it
+REQUEST_TIMEOUT = float(os.environ.get('REQUEST_TIMEOUT', 300))
+
+# A working API key is not re-probed for this many seconds
+API_KEY_CHECK_TTL = int(os.environ.get('API_KEY_CHECK_TTL', 300))
+_verified_api_keys = {}  # sha256 of key -> time of last successful probe
+
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
+# Finished /upload archives, answered again without re-extraction
+result_cache = ResultCache()
+
 # Create upload directory
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def image_encoding_from_form(form):
+    """
+    Build the page image encoding from deployment defaults and request overrides
+    
+    Returns:
+        Tuple of (image encoding, None), or (None, error response naming the bad field)
+    """
+    from model1 import ImageEncodingError, validate_image_encoding
+    encoding = dict(IMAGE_ENCODING)
+    for field in ('format', 'quality', 'mode', 'max_long_edge'):
+        if form.get(f'image_{field}'):
+            encoding[field] = form[f'image_{field}'].strip()
+    try:
+        return validate_image_encoding(encoding), None
+    except ImageEncodingError as e:
+        return None, (jsonify({'error': str(e), 'field': f'image_{e.field}', 'step': 'image_encoding'}), 400)
+
+def read_upload_request():
+    """
+    Validate the uploaded file and form fields shared by /upload and /extract
+    
+    Returns:
+        Tuple of (upload dict with file, api_key, pages and targets, None), or
+        (None, error response)
+    """
+    # Step 1: Validate request
+    if 'file' not in request.files:
+        error_msg = "No file found in request"
+        logger.error(error_msg)
+        return None, (jsonify({'error': error_msg, 'step': 'file_validation'}), 400)
+    
+    file = request.files['file']
+    if file.filename == '':
+        error_msg = "No file selected"
+        logger.error(error_msg)
+        return None, (jsonify({'error': error_msg, 'step': 'file_validation'}), 400)
+    
+    if not allowed_file(file.filename):
+        error_msg = f"Invalid file type: {file.filename}. Only PDF files are allowed."
+        logger.error(error_msg)
+        return None, (jsonify({'error': error_msg, 'step': 'file_validation'}), 400)
+    
+    # Step 2: Validate API key
+    api_key = request.form.get('api_key', '').strip()
+    if not api_key:
+        error_msg = "API key is required"
+        logger.error(error_msg)
+        return None, (jsonify({'error': error_msg, 'step': 'api_key_validation'}), 400)
+    
+    logger.info(f"File: {file.filename}, API key length: {len(api_key)}")
+    
+    # Optional page targeting
+    pages = request.form.get('pages', '').strip() or None
+    try:
+        targets = parse_targets(request.form.get('targets', ''))
+        if pages:
+            check_page_ranges(pages)
+    except ValueError as e:
+        return None, (jsonify({'error': str(e), 'step': 'page_selection'}), 400)
+    
+    return {'file': file, 'api_key': api_key, 'pages': pages, 'targets': targets}, None
+
+def read_output_format(form):
+    """
+    Read and validate the output file format of the extracted tables
+    
+    Returns:
+        Tuple of (output format, None), or (None, error response)
+    """
+    output_format = form.get('output_format', '').strip().lower() or 'csv'
+    if output_format not in OUTPUT_FORMATS:
+        error_msg = f"Unknown output format: {output_format}. Use one of: {', '.join(OUTPUT_FORMATS)}"
+        return None, (jsonify({'error': error_msg, 'step': 'output_format'}), 400)
+    if output_format == 'parquet' and not PYARROW_AVAILABLE:
+        return None, (jsonify({
+            'error': 'Parquet output is not available on this server',
+            'step': 'output_format',
+            'suggestion': 'Install pyarrow or choose CSV output'
+        }), 400)
+    return output_format, None
+
+def save_pdf(file, folder=None):
+    """
+    Save an uploaded PDF and check that it is one
+    
+    The file is hashed while it is copied to disk, so result lookups by
+    document hash cost no extra pass over the upload.
+    
+    Returns:
+        Tuple of (saved file path, SHA-256 of its bytes, None), or
+        (None, None, error response)
+    """
+    # Step 3: Save uploaded file
+    try:
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(folder or app.config['UPLOAD_FOLDER'], filename)
+        digest = hashlib.sha256()
+        file_size = 0
+        with registry.time('pdf_extractor_stage_seconds', stage='upload_save'):
+            with open(filepath, 'wb') as out:
+                for chunk in iter(lambda: file.stream.read(1 << 20), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    file_size += len(chunk)
+        logger.info(f"File saved: {filepath} ({file_size} bytes)")
+    except Exception as e:
+        error_msg = f"Failed to save file: {str(e)}"
+        logger.error(error_msg)
+        return None, None, (jsonify({'error': error_msg, 'step': 'file_save'}), 500)
+    
+    # Step 4: Validate PDF
+    try:
+        with open(filepath, 'rb') as f:
+            header = f.read(4)
+            if header != b'%PDF':
+                os.remove(filepath)
+                error_msg = "File is not a valid PDF"
+                logger.error(error_msg)
+                return None, None, (jsonify({'error': error_msg, 'step': 'pdf_validation'}), 400)
+    except Exception as e:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        error_msg = f"Error validating PDF: {str(e)}"
+        logger.error(error_msg)
+        return None, None, (jsonify({'error': error_msg, 'step': 'pdf_validation'}), 400)
+    
+    return filepath, digest.hexdigest(), None
+
+def api_key_scope(api_key):
+    """SHA-256 of an API key, so the key itself is never stored or logged"""
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()
+
+def check_api_access(api_key):
+    """
+    Check the server dependencies and that the API key works
+    
+    Returns:
+        None, or an error response
+    """
+    # Step 5: Test imports
+    try:
+        logger.info("Testing imports...")
+        import google.generativeai as genai
+        logger.info("✓ google.generativeai imported")
+        
+        import fitz
+        logger.info("✓ PyMuPDF imported")
+        
+        from model1 import PDFTableExtractor
+        logger.info("✓ PDFTableExtractor imported")
+        
+    except ImportError as e:
+        error_msg = f"Missing dependency: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            'error': error_msg, 
+            'step': 'import_validation',
+            'suggestion': 'Server configuration issue - missing Python packages'
+        }), 500
+    
+    # A configured model factory (benchmarks, local stubs) needs no Gemini key
+    if app.config.get('MODEL_FACTORY'):
+        logger.info("✓ Using configured model factory")
+        return None
+    
+    # Step 6: Test API connection (once per key every API_KEY_CHECK_TTL seconds)
+    key_id = api_key_scope(api_key)
+    if time.monotonic() - _verified_api_keys.get(key_id, float('-inf')) < API_KEY_CHECK_TTL:
+        logger.info("✓ API key verified recently")
+        return None
+    try:
+        logger.info("Testing API connection...")
+        genai.configure(api_key=api_key)
+        test_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        test_response = test_model.generate_content("Hello")
+        _verified_api_keys[key_id] = time.monotonic()
+        logger.info("✓ API connection successful")
+    except Exception as e:
+        error_msg = f"API connection failed: {str(e)}"
+        logger.error(error_msg)
+        
+        if "api key" in str(e).lower() or "invalid" in str(e).lower():
+            return jsonify({
+                'error': 'Invalid API key. Please check your Gemini API key.',
+                'step': 'api_test'
+            }), 401
+        else:
+            return jsonify({
+                'error': error_msg,
+                'step': 'api_test'
+            }), 500
+    
+    return None
+
+def create_extractor(api_key):
+    """
+    Create the PDF extractor for a request
+    
+    If app.config['MODEL_FACTORY'] is set, it is called with the API key and
+    its return value replaces the Gemini model (see benchmarks/).
+    """
+    from model1 import PDFTableExtractor
+    factory = app.config.get('MODEL_FACTORY')
+    return PDFTableExtractor(api_key, model=factory(api_key) if factory else None)
+
+def processing_error_response(results):
+    """
+    Error response for an extraction result that carries an error
+    
+    A pages/targets selection without pages is the client's mistake (400);
+    anything else is a processing failure (500).
+    """
+    if results.get('error_type') == 'page_selection':
+        return jsonify({
+            'error': results['error'],
+            'step': 'page_selection',
+            'document_pages': results.get('document_pages')
+        }), 400
+    return jsonify({'error': results['error'], 'step': 'processing_result'}), 500
+
+def save_upload(file, api_key):
+    """
+    Save the uploaded PDF and check it, the server dependencies and the API key
+    
+    Returns:
+        Tuple of (saved file path, None), or (None, error response)
+    """
+    filepath, _, error_response = save_pdf(file)
+    if error_response:
+        return None, error_response
+    
+    error_response = check_api_access(api_key)
+    if error_response:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        return None, error_response
+    
+    return filepath, None
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -45,113 +317,89 @@ def upload_file():
     """Upload and process PDF file with detailed error reporting"""
     filepath = None
     temp_dir = None
+    flight = None
+    cache_key = None
+    request_started = time.monotonic()
+    
+    def failed(error_response, scope=None):
+        # Identical uploads waiting on this extraction get the same answer
+        if flight is not None:
+            body, status = error_response
+            result_cache.put_failure(cache_key, body.get_json(), status, scope=scope)
+        return error_response
     
     try:
         logger.info("=== STARTING PDF PROCESSING ===")
         
-        # Step 1: Validate request
-        if 'file' not in request.files:
-            error_msg = "No file found in request"
-            logger.error(error_msg)
-            return jsonify({'error': error_msg, 'step': 'file_validation'}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            error_msg = "No file selected"
-            logger.error(error_msg)
-            return jsonify({'error': error_msg, 'step': 'file_validation'}), 400
-        
-        if not allowed_file(file.filename):
-            error_msg = f"Invalid file type: {file.filename}. Only PDF files are allowed."
-            logger.error(error_msg)
-            return jsonify({'error': error_msg, 'step': 'file_validation'}), 400
-        
-        # Step 2: Validate API key
-        api_key = request.form.get('api_key', '').strip()
-        if not api_key:
-            error_msg = "API key is required"
-            logger.error(error_msg)
-            return jsonify({'error': error_msg, 'step': 'api_key_validation'}), 400
+        # Steps 1-2: Validate request and API key
+        upload, error_response = read_upload_request()
+        if error_response:
+            return error_response
         
-        logger.info(f"File: {file.filename}, API key length: {len(api_key)}")
+        # Output file format of the extracted tables
+        output_format, error_response = read_output_format(request.form)
+        if error_response:
+            return error_response
         
-        # Step 3: Save uploaded file
-        try:
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            file_size = os.path.getsize(filepath)
-            logger.info(f"File saved: {filepath} ({file_size} bytes)")
-        except Exception as e:
-            error_msg = f"Failed to save file: {str(e)}"
-            logger.error(error_msg)
-            return jsonify({'error': error_msg, 'step': 'file_save'}), 500
+        # Page image encoding sent to Gemini
+        image_encoding, error_response = image_encoding_from_form(request.form)
+        if error_response:
+            return error_response
         
-        # Step 4: Validate PDF
-        try:
-            with open(filepath, 'rb') as f:
-                header = f.read(4)
-                if header != b'%PDF':
-                    os.remove(filepath)
-                    error_msg = "File is not a valid PDF"
-                    logger.error(error_msg)
-                    return jsonify({'error': error_msg, 'step': 'pdf_validation'}), 400
-        except Exception as e:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            error_msg = f"Error validating PDF: {str(e)}"
-            logger.error(error_msg)
-            return jsonify({'error': error_msg, 'step': 'pdf_validation'}), 400
+        # Steps 3-4: Save and validate the PDF
+        filepath, document_hash, error_response = save_pdf(upload['file'])
+        if error_response:
+            return error_response
         
-        # Step 5: Test imports
-        try:
-            logger.info("Testing imports...")
-            import google.generativeai as genai
-            logger.info("✓ google.generativeai imported")
-            
-            import pandas as pd
-            logger.info("✓ pandas imported")
-            
-            import fitz
-            logger.info("✓ PyMuPDF imported")
-            
-            from model1 import PDFTableExtractor
-            logger.info("✓ PDFTableExtractor imported")
-            
-        except ImportError as e:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            error_msg = f"Missing dependency: {str(e)}"
-            logger.error(error_msg)
-            return jsonify({
-                'error': error_msg, 
-                'step': 'import_validation',
-                'suggestion': 'Server configuration issue - missing Python packages'
-            }), 500
+        # The same document with the same options was extracted before - no
+        # render, no API call
+        from model1 import extraction_prompt_version
+        cache_key = result_cache_key(document_hash, extraction_prompt_version(), {
+            'output_format': output_format,
+            'column_types': request.form.get('column_types', ''),
+            'image_encoding': image_encoding,
+            'pages': upload['pages'],
+            'targets': upload['targets']
+        })
+        cached = result_cache.get(cache_key)
+        if not cached:
+            # Identical uploads running at the same time wait for the first one
+            # and are answered from its cached result (or its error)
+            waiting_since = time.time()
+            flight = result_cache.claim(cache_key, max(0.0, REQUEST_TIMEOUT - (time.monotonic() - request_started)))
+            cached = result_cache.get(cache_key)
+            failure = None if cached else result_cache.get_failure(cache_key, waiting_since,
+                                                                   scope=api_key_scope(upload['api_key']))
+            if failure:
+                cleanup_files(filepath, None)
+                body, status = failure
+                logger.info(f"✓ Returning the error of the extraction this upload waited for ({cache_key[:12]})")
+                response = jsonify(body)
+                response.status_code = status
+                response.headers['X-Result-Cache'] = 'coalesced'
+                return response
+        registry.inc('pdf_extractor_result_cache_total', result='hit' if cached else 'miss')
+        if cached:
+            cleanup_files(filepath, None)
+            archive_path, metadata = cached
+            logger.info(f"✓ Returning cached result {cache_key[:12]}")
+            response = send_file(
+                archive_path,
+                mimetype='application/zip',
+                as_attachment=True,
+                download_name=metadata['download_name']
+            )
+            response.headers['X-Image-Bytes'] = '0'
+            response.headers['X-Image-Tokens'] = '0'
+            response.headers['X-Result-Cache'] = 'hit'
+            return response
         
-        # Step 6: Test API connection
-        try:
-            logger.info("Testing API connection...")
-            genai.configure(api_key=api_key)
-            test_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            test_response = test_model.generate_content("Hello")
-            logger.info("✓ API connection successful")
-        except Exception as e:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            error_msg = f"API connection failed: {str(e)}"
-            logger.error(error_msg)
-            
-            if "api key" in str(e).lower() or "invalid" in str(e).lower():
-                return jsonify({
-                    'error': 'Invalid API key. Please check your Gemini API key.',
-                    'step': 'api_test'
-                }), 401
-            else:
-                return jsonify({
-                    'error': error_msg,
-                    'step': 'api_test'
-                }), 500
+        # Steps 5-6: Check dependencies and the API key
+        error_response = check_api_access(upload['api_key'])
+        if error_response:
+            cleanup_files(filepath, None)
+            # Only waiters sending the same key share a key error
+            return failed(error_response, scope=api_key_scope(upload['api_key']))
         
         # Step 7: Create temp directory
         try:
@@ -162,36 +410,39 @@ def upload_file():
                 os.remove(filepath)
             error_msg = f"Failed to create temp directory: {str(e)}"
             logger.error(error_msg)
-            return jsonify({'error': error_msg, 'step': 'temp_dir'}), 500
+            return failed((jsonify({'error': error_msg, 'step': 'temp_dir'}), 500))
         
         # Step 8: Initialize extractor
         try:
             logger.info("Initializing PDF extractor...")
-            extractor = PDFTableExtractor(api_key)
+            extractor = create_extractor(upload['api_key'])
             extractor.base_output_dir = Path(temp_dir)
             extractor.base_output_dir.mkdir(exist_ok=True)
+            extractor.image_encoding.update(image_encoding)
+            extractor.typed_export = request.form.get('column_types') == 'typed'
+            extractor.output_format = output_format
             logger.info("✓ Extractor initialized")
         except Exception as e:
             cleanup_files(filepath, temp_dir)
             error_msg = f"Failed to initialize extractor: {str(e)}"
             logger.error(error_msg)
-            return jsonify({'error': error_msg, 'step': 'extractor_init'}), 500
+            return failed((jsonify({'error': error_msg, 'step': 'extractor_init'}), 500))
         
         # Step 9: Process PDF
         try:
             logger.info("Processing PDF...")
-            results = extractor.process_pdf(filepath)
+            results = extractor.process_pdf(filepath, pages=upload['pages'], targets=upload['targets'] or None)
             logger.info(f"Processing complete: {len(results.get('csv_files', []))} files generated")
         except Exception as e:
             cleanup_files(filepath, temp_dir)
             error_msg = f"PDF processing failed: {str(e)}"
             logger.error(error_msg)
             logger.error(f"Traceback: {traceback.format_exc()}")
-            return jsonify({
+            return failed((jsonify({
                 'error': error_msg,
                 'step': 'pdf_processing',
                 'traceback': traceback.format_exc()
-            }), 500
+            }), 500))
         
         # Step 10: Clean up original file
         if os.path.exists(filepath):
@@ -200,12 +451,12 @@ def upload_file():
         # Step 11: Check results
         if "error" in results:
             cleanup_files(None, temp_dir)
-            return jsonify({'error': results['error'], 'step': 'processing_result'}), 500
+            return failed(processing_error_response(results))
         
         csv_files = results.get('csv_files', [])
         if not csv_files:
             cleanup_files(None, temp_dir)
-            return jsonify({
+            return failed((jsonify({
                 'error': 'No tables found in PDF',
                 'step': 'table_detection',
                 'debug_info': {
@@ -217,11 +468,12 @@ def upload_file():
                     'Check if PDF is text-based (not scanned)',
                     'Try a different PDF with simpler tables'
                 ]
-            }), 404
+            }), 404))
         
         # Step 12: Create ZIP file
         try:
             logger.info("Creating ZIP file...")
+            zip_started = time.perf_counter()
             zip_buffer = io.BytesIO()
             
             with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
@@ -241,28 +493,326 @@ def upload_file():
                     pass
             
             cleanup_files(None, temp_dir)
-            zip_buffer.seek(0)
+            zip_data = zip_buffer.getvalue()
+            download_name = f"{results.get('pdf_name', 'tables')}_extracted.zip"
+            registry.observe('pdf_extractor_stage_seconds', time.perf_counter() - zip_started, stage='zip_build')
             
             logger.info(f"✓ ZIP created with {files_added} files")
+            result_cache.put(cache_key, zip_data, {'download_name': download_name})
             
-            return send_file(
-                io.BytesIO(zip_buffer.read()),
+            response = send_file(
+                io.BytesIO(zip_data),
                 mimetype='application/zip',
                 as_attachment=True,
-                download_name=f"{results.get('pdf_name', 'tables')}_extracted.zip"
+                download_name=download_name
             )
+            response.headers['X-Image-Bytes'] = str(results.get('image_bytes_sent', 0))
+            response.headers['X-Image-Tokens'] = str(results.get('image_tokens', 0))
+            response.headers['X-Result-Cache'] = 'miss'
+            return response
             
         except Exception as e:
             cleanup_files(None, temp_dir)
             error_msg = f"Failed to create ZIP: {str(e)}"
             logger.error(error_msg)
-            return jsonify({'error': error_msg, 'step': 'zip_creation'}), 500
+            return failed((jsonify({'error': error_msg, 'step': 'zip_creation'}), 500))
         
+    except RequestEntityTooLarge:
+        cleanup_files(filepath, temp_dir)
+        raise
     except Exception as e:
         cleanup_files(filepath, temp_dir)
         error_msg = f"Unexpected error: {str(e)}"
         logger.error(error_msg)
         logger.error(f"Traceback: {traceback.format_exc()}")
+        return failed((jsonify({
+            'error': error_msg,
+            'step': 'unexpected_error',
+            'traceback': traceback.format_exc()
+        }), 500))
+    finally:
+        # The result is cached (or the attempt failed) - let waiting duplicates go
+        if flight is not None:
+            flight.release()
+
+def extraction_summary(results):
+    """Document-level counters returned alongside the tables by /extract"""
+    return {
+        'pdf_name': results.get('pdf_name'),
+        'total_pages': results.get('total_pages', 0),
+        'pages_with_tables': results.get('pages_with_tables', 0),
+        'pages_skipped': results.get('pages_skipped', 0),
+        'total_tables_extracted': results.get('total_tables_extracted', 0),
+        'image_bytes_sent': results.get('image_bytes_sent', 0),
+        'image_tokens': results.get('image_tokens', 0),
+        'gemini_input_tokens': results.get('gemini_input_tokens', 0),
+        'gemini_output_tokens': results.get('gemini_output_tokens', 0),
+        'gemini_retries': results.get('gemini_retries', 0),
+        'timings': results.get('timings')
+    }
+
+@app.route('/extract', methods=['POST'])
+def extract_tables():
+    """
+    Extract tables for machine clients, without CSV files or ZIP packaging
+    
+    Takes the same form fields as /upload. With format=json (default) the
+    grouped tables are returned in one JSON document; with format=ndjson one
+    JSON record is streamed per table as soon as its group is finished,
+    followed by a summary record.
+    """
+    filepath = None
+    
+    try:
+        logger.info("=== STARTING PDF EXTRACTION (API) ===")
+        
+        upload, error_response = read_upload_request()
+        if error_response:
+            return error_response
+        
+        response_format = request.form.get('format', request.args.get('format', 'json')).strip().lower()
+        if response_format not in ('json', 'ndjson'):
+            return jsonify({'error': f"Unknown response format: {response_format}. Use json or ndjson",
+                            'step': 'response_format'}), 400
+        
+        image_encoding, error_response = image_encoding_from_form(request.form)
+        if error_response:
+            return error_response
+        
+        filepath, error_response = save_upload(upload['file'], upload['api_key'])
+        if error_response:
+            return error_response
+        
+        extractor = create_extractor(upload['api_key'])
+        extractor.image_encoding.update(image_encoding)
+        process_args = {'pages': upload['pages'], 'targets': upload['targets'] or None}
+        
+        if response_format == 'json':
+            tables = []
+            try:
+                results = extractor.process_pdf(filepath, table_sink=tables.append, **process_args)
+            finally:
+                cleanup_files(filepath, None)
+            
+            if "error" in results:
+                return processing_error_response(results)
+            return jsonify(dict(extraction_summary(results), tables=tables))
+        
+        # NDJSON: run the extraction in the background and stream each table as it is finished
+        records = queue.Queue()
+        disconnected = threading.Event()
+        
+        def table_sink(record):
+            if disconnected.is_set():
+                raise Exception("Client disconnected")
+            records.put(dict(record, type='table'))
+        
+        def run_extraction():
+            try:
+                results = extractor.process_pdf(filepath, table_sink=table_sink, **process_args)
+                if "error" in results:
+                    records.put({'type': 'error', 'error': results['error'],
+                                 'step': results.get('error_type', 'processing_result')})
+                else:
+                    records.put(dict(extraction_summary(results), type='summary'))
+            except Exception as e:
+                logger.error(f"PDF extraction failed: {e}")
+                records.put({'type': 'error', 'error': f"PDF processing failed: {str(e)}", 'step': 'pdf_processing'})
+            finally:
+                cleanup_files(filepath, None)
+                records.put(None)
+        
+        def stream():
+            try:
+                while True:
+                    record = records.get()
+                    if record is None:
+                        return
+                    yield json.dumps(record, ensure_ascii=False) + '\n'
+            finally:
+                disconnected.set()
+        
+        threading.Thread(target=run_extraction, name="extract-ndjson", daemon=True).start()
+        return Response(stream(), mimetype='application/x-ndjson')
+        
+    except RequestEntityTooLarge:
+        cleanup_files(filepath, None)
+        raise
+    except Exception as e:
+        cleanup_files(filepath, None)
+        error_msg = f"Unexpected error: {str(e)}"
+        logger.error(error_msg)
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({
+            'error': error_msg,
+            'step': 'unexpected_error',
+            'traceback': traceback.format_exc()
+        }), 500
+
+def unique_name(name, used):
+    """Return name, or name_2, name_3, ... if it is already in used (and record it)"""
+    candidate = name
+    counter = 2
+    while candidate in used:
+        candidate = f"{name}_{counter}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+@app.route('/batch', methods=['POST'])
+def batch_upload():
+    """
+    Process many PDFs in one request
+    
+    All documents share one API key check, one configured extractor and one
+    per-key concurrency/rate budget (see api_budget.py). The response is a ZIP
+    with a folder per document and batch_status.json listing the outcome of
+    each document. Takes the same form fields as /upload, with the PDFs
+    sent as repeated "files" fields.
+    """
+    batch_dir = None
+    
+    try:
+        logger.info("=== STARTING BATCH PROCESSING ===")
+        # Per-request limit (Flask >= 3.1) above the single-upload MAX_CONTENT_LENGTH
+        request.max_content_length = BATCH_MAX_CONTENT_LENGTH
+        if request.content_length and request.content_length > BATCH_MAX_CONTENT_LENGTH:
+            raise RequestEntityTooLarge()
+        
+        files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+        if not files:
+            return jsonify({'error': 'No files found in request', 'step': 'file_validation'}), 400
+        invalid = [f.filename for f in files if not allowed_file(f.filename)]
+        if invalid:
+            return jsonify({'error': f"Only PDF files are allowed: {', '.join(invalid)}",
+                            'step': 'file_validation'}), 400
+        
+        api_key = request.form.get('api_key', '').strip()
+        if not api_key:
+            return jsonify({'error': 'API key is required', 'step': 'api_key_validation'}), 400
+        
+        pages = request.form.get('pages', '').strip() or None
+        try:
+            targets = parse_targets(request.form.get('targets', ''))
+            if pages:
+                check_page_ranges(pages)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'step': 'page_selection'}), 400
+        
+        output_format, error_response = read_output_format(request.form)
+        if error_response:
+            return error_response
+        
+        image_encoding, error_response = image_encoding_from_form(request.form)
+        if error_response:
+            return error_response
+        
+        # Save every document before spending any API quota
+        batch_dir = tempfile.mkdtemp()
+        upload_dir = os.path.join(batch_dir, 'uploads')
+        os.makedirs(upload_dir)
+        folders = set()
+        documents = []
+        rejected = []
+        for file in files:
+            folder = unique_name(Path(secure_filename(file.filename)).stem or 'document', folders)
+            document_dir = os.path.join(upload_dir, folder)
+            os.makedirs(document_dir)
+            filepath, _, error_response = save_pdf(file, document_dir)
+            if error_response:
+                # An unreadable document fails on its own, not the whole batch
+                error = error_response[0].get_json().get('error')
+                rejected.append({'file': file.filename, 'folder': folder, 'status': 'error', 'error': error})
+                continue
+            documents.append({'file': file.filename, 'folder': folder, 'path': filepath})
+        logger.info(f"Saved {len(documents)} documents, rejected {len(rejected)}")
+        if not documents:
+            cleanup_files(None, batch_dir)
+            return jsonify({'error': 'No valid PDF files in batch', 'step': 'pdf_validation',
+                            'documents': rejected}), 400
+        
+        # One key probe and one configured extractor for the whole batch
+        error_response = check_api_access(api_key)
+        if error_response:
+            cleanup_files(None, batch_dir)
+            return error_response
+        
+        extractor = create_extractor(api_key)
+        extractor.image_encoding.update(image_encoding)
+        extractor.typed_export = request.form.get('column_types') == 'typed'
+        extractor.output_format = output_format
+        # Page calls of all documents queue on the shared key budget
+        extractor.extract_workers = extractor.api_budget.max_concurrent
+        document_workers = max(1, min(BATCH_DOCUMENT_WORKERS, len(documents)))
+        extractor.render_workers = max(1, (os.cpu_count() or 1) // document_workers)
+        
+        def process_document(document):
+            document_extractor = extractor.fork()
+            document_extractor.base_output_dir = Path(batch_dir) / 'output' / document['folder']
+            document_extractor.base_output_dir.mkdir(parents=True)
+            status = {'file': document['file'], 'folder': document['folder']}
+            try:
+                results = document_extractor.process_pdf(document['path'], pages=pages, targets=targets or None)
+            except Exception as e:
+                logger.error(f"Batch document {document['file']} failed: {e}")
+                status.update(status='error', error=str(e))
+                return status, None, []
+            
+            if "error" in results:
+                status.update(status='error', error=results['error'])
+                return status, None, []
+            
+            output_files = list(results.get('csv_files', []))
+            try:
+                output_files.append(document_extractor.generate_summary_report(results))
+            except Exception as e:
+                logger.warning(f"Summary report for {document['file']} failed: {e}")
+            status.update(
+                status='ok' if results.get('csv_files') else 'no_tables',
+                total_pages=results.get('total_pages', 0),
+                pages_with_tables=results.get('pages_with_tables', 0),
+                pages_skipped=results.get('pages_skipped', 0),
+                tables=results.get('total_tables_extracted', 0),
+                image_tokens=results.get('image_tokens', 0),
+                files=[os.path.basename(path) for path in output_files]
+            )
+            return status, results, output_files
+        
+        with ThreadPoolExecutor(max_workers=document_workers, thread_name_prefix="batch-doc") as executor:
+            outcomes = list(executor.map(process_document, documents))
+        outcomes.extend((status, None, []) for status in rejected)
+        
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for status, results, output_files in outcomes:
+                for path in output_files:
+                    if os.path.exists(path):
+                        zip_file.write(path, f"{status['folder']}/{os.path.basename(path)}")
+            zip_file.writestr('batch_status.json', json.dumps({
+                'documents': [status for status, _, _ in outcomes],
+                'succeeded': sum(1 for status, _, _ in outcomes if status['status'] == 'ok'),
+                'failed': sum(1 for status, _, _ in outcomes if status['status'] == 'error')
+            }, indent=2, ensure_ascii=False))
+        
+        cleanup_files(None, batch_dir)
+        zip_buffer.seek(0)
+        logger.info(f"✓ Batch complete: {len(outcomes)} documents")
+        
+        return send_file(
+            zip_buffer,
+            mimetype='application/zip',
+            as_attachment=True,
+            download_name='batch_extracted.zip'
+        )
+        
+    except RequestEntityTooLarge:
+        cleanup_files(None, batch_dir)
+        raise
+    except Exception as e:
+        cleanup_files(None, batch_dir)
+        error_msg = f"Unexpected error: {str(e)}"
+        logger.error(error_msg)
+        logger.error(f"Traceback: {traceback.format_exc()}")
         return jsonify({
             'error': error_msg,
             'step': 'unexpected_error',
@@ -330,6 +880,17 @@ def debug_extraction():
             'error': f'Debug error: {str(e)}'
         }), 500
 
+@app.after_request
+def flush_metrics(response):
+    """Publish this worker's metrics snapshot once its request is done"""
+    registry.flush(force=True)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Pipeline metrics of all worker processes in the Prometheus text format"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health_check():
     """Health check with dependency status"""
@@ -368,7 +929,12 @@ def health_check():
 
 @app.errorhandler(413)
 def file_too_large(e):
-    return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
+    # /batch raises the limit for its request - report the one that applied
+    limit = request.max_content_length or MAX_CONTENT_LENGTH
+    return jsonify({
+        'error': f'File too large. Maximum size is {limit / (1024 * 1024):g}MB.',
+        'max_content_length': limit
+    }), 413
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
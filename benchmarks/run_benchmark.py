@@ -0,0 +1,302 @@
+"""
+End-to-end throughput benchmark without Gemini quota
+
+Generates synthetic financial-statement PDFs, then runs them through
+PDFTableExtractor.process_pdf ("direct") and/or the Flask /upload route
+("upload") with the Gemini model replaced by benchmarks.stub_model.StubModel.
+Reports pages/sec, p50/p95 latencies and peak RSS.
+
+    python -m benchmarks.run_benchmark --documents 4 --pages 30 --latency 1.0 --error-rate 0.05
+    python -m benchmarks.run_benchmark --mode upload --jobs 4 --json results.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+# Optional imports - peak RSS is only available on POSIX
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# Keep checkpoints, cached results and metric snapshots of benchmark runs away
+# from the real ones (read when model1/app are imported)
+WORK_DIR = tempfile.mkdtemp(prefix="pdf_extractor_bench_")
+os.environ.setdefault('EXTRACTION_CHECKPOINT_DIR', os.path.join(WORK_DIR, 'checkpoints'))
+os.environ.setdefault('RESULT_CACHE_DIR', os.path.join(WORK_DIR, 'result_cache'))
+os.environ.setdefault('METRICS_DIR', os.path.join(WORK_DIR, 'metrics'))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api_budget import get_api_budget  # noqa: E402
+from observers import ExtractionObserver  # noqa: E402
+from benchmarks.stub_model import StubModel  # noqa: E402
+from benchmarks.synthetic_pdfs import make_financial_pdf  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Never sent anywhere: the stub model ignores it, it only names the API budget
+BENCHMARK_API_KEY = "benchmark-stub-key"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile (0.0 for no values)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """Peak resident set size of this process and of its finished children (render pool)"""
+    if not RESOURCE_AVAILABLE:
+        return {"self": None, "children": None}
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+class PageLatencyObserver(ExtractionObserver):
+    """Times every page from the Gemini request to its response (retries included)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sent: Dict[int, float] = {}
+        self.page_seconds: List[float] = []
+        self.failed_pages = 0
+
+    def request_sent(self, page_number, image_info):
+        with self._lock:
+            self._sent[page_number] = time.perf_counter()
+
+    def response_received(self, page_number, extraction, usage):
+        with self._lock:
+            started = self._sent.pop(page_number, None)
+            if started is not None:
+                self.page_seconds.append(time.perf_counter() - started)
+            if "error" in extraction:
+                self.failed_pages += 1
+
+
+def generate_documents(args, directory: Path) -> List[Dict]:
+    """Write the synthetic PDFs of a run"""
+    documents = []
+    started = time.perf_counter()
+    for index in range(args.documents):
+        documents.append(make_financial_pdf(
+            str(directory / f"synthetic_{index + 1:03d}.pdf"),
+            pages=args.pages,
+            tables_per_page=args.tables_per_page,
+            rows_per_table=args.rows,
+            continuation_pages=args.continuation_pages,
+            scanned_ratio=args.scanned_ratio,
+            blank_ratio=args.blank_ratio,
+            seed=args.seed + index
+        ))
+    logger.info(f"📄 Generated {len(documents)} PDFs x {args.pages} pages in {time.perf_counter() - started:.1f}s")
+    return documents
+
+
+def make_stub_model(args) -> StubModel:
+    return StubModel(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                     tables_per_page=args.tables_per_page, rows=args.rows,
+                     continuation_pages=args.continuation_pages, seed=args.seed)
+
+
+def summarize(mode: str, documents: List[Dict], wall_seconds: float, document_seconds: List[float],
+              page_seconds: List[float], model: StubModel, failed_documents: int, failed_pages: int) -> Dict:
+    pages = sum(document["pages"] for document in documents)
+    return {
+        "mode": mode,
+        "documents": len(documents),
+        "pages": pages,
+        "wall_seconds": round(wall_seconds, 3),
+        "pages_per_second": round(pages / wall_seconds, 3) if wall_seconds else 0.0,
+        "document_p50_seconds": round(percentile(document_seconds, 0.50), 3),
+        "document_p95_seconds": round(percentile(document_seconds, 0.95), 3),
+        "page_p50_seconds": round(percentile(page_seconds, 0.50), 3),
+        "page_p95_seconds": round(percentile(page_seconds, 0.95), 3),
+        "model_calls": model.stats()["calls"],
+        "model_errors": model.stats()["errors"],
+        "failed_documents": failed_documents,
+        "failed_pages": failed_pages,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_direct(args, documents: List[Dict], output_dir: Path) -> Dict:
+    """Run process_pdf on every document, args.jobs documents at a time"""
+    from model1 import PDFTableExtractor
+
+    model = make_stub_model(args)
+    extractor = PDFTableExtractor(BENCHMARK_API_KEY, model=model)
+    extractor.base_output_dir = output_dir
+    extractor.extract_workers = args.concurrency
+    extractor.checkpoint_dir = None
+    extractor.output_format = args.format
+
+    observers: List[PageLatencyObserver] = []
+    document_seconds: List[float] = []
+    failed_documents = 0
+    lock = threading.Lock()
+
+    def process(document):
+        nonlocal failed_documents
+        worker = extractor.fork()
+        observer = PageLatencyObserver()
+        worker.add_observer(observer)
+        started = time.perf_counter()
+        try:
+            results = worker.process_pdf(document["path"])
+            failed = "error" in results
+        except Exception as e:
+            logger.error(f"❌ {document['path']}: {e}")
+            failed = True
+        with lock:
+            document_seconds.append(time.perf_counter() - started)
+            observers.append(observer)
+            failed_documents += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        list(executor.map(process, documents))
+    wall_seconds = time.perf_counter() - started
+
+    page_seconds = [seconds for observer in observers for seconds in observer.page_seconds]
+    failed_pages = sum(observer.failed_pages for observer in observers)
+    return summarize("direct", documents, wall_seconds, document_seconds, page_seconds, model,
+                     failed_documents, failed_pages)
+
+
+def run_upload(args, documents: List[Dict]) -> Dict:
+    """POST every document to /upload through the Flask test client, args.jobs at a time"""
+    import app as web_app
+
+    model = make_stub_model(args)
+    web_app.app.config['MODEL_FACTORY'] = lambda api_key: model
+    # Every upload must run the extraction, not be answered from the result cache
+    web_app.result_cache.max_bytes = 0
+
+    document_seconds: List[float] = []
+    failed_documents = 0
+    lock = threading.Lock()
+
+    def upload(document):
+        nonlocal failed_documents
+        client = web_app.app.test_client()
+        started = time.perf_counter()
+        with open(document["path"], 'rb') as f:
+            response = client.post('/upload', data={
+                'file': (f, os.path.basename(document["path"])),
+                'api_key': BENCHMARK_API_KEY,
+                'output_format': args.format,
+            }, content_type='multipart/form-data')
+        seconds = time.perf_counter() - started
+        if response.status_code != 200:
+            logger.error(f"❌ {document['path']}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+        with lock:
+            document_seconds.append(seconds)
+            failed_documents += response.status_code != 200
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        list(executor.map(upload, documents))
+    wall_seconds = time.perf_counter() - started
+
+    # The route builds its extractor itself; page latency is the stub's call time
+    return summarize("upload", documents, wall_seconds, document_seconds, list(model.call_seconds), model,
+                     failed_documents, 0)
+
+
+def print_report(report: Dict):
+    rss = report["peak_rss_mb"]
+    print(f"\n=== {report['mode']} ===")
+    print(f"Documents: {report['documents']} ({report['failed_documents']} failed), pages: {report['pages']}")
+    print(f"Wall time: {report['wall_seconds']:.2f}s  ->  {report['pages_per_second']:.2f} pages/sec")
+    print(f"Document latency: p50 {report['document_p50_seconds']:.2f}s, p95 {report['document_p95_seconds']:.2f}s")
+    print(f"Page latency:     p50 {report['page_p50_seconds']:.2f}s, p95 {report['page_p95_seconds']:.2f}s")
+    print(f"Model calls: {report['model_calls']} ({report['model_errors']} injected errors), "
+          f"failed pages: {report['failed_pages']}")
+    if rss["self"] is not None:
+        print(f"Peak RSS: {rss['self']:.1f} MB (render workers: {rss['children']:.1f} MB)")
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Benchmark PDF table extraction against a local stub model"
+    )
+    parser.add_argument("--mode", choices=("direct", "upload", "both"), default="both",
+                        help="process_pdf, the Flask /upload route, or both (default: both)")
+    parser.add_argument("--documents", type=int, default=4, help="Synthetic PDFs to process (default: 4)")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per PDF (default: 20)")
+    parser.add_argument("--tables-per-page", type=int, default=1, help="Tables per page (default: 1)")
+    parser.add_argument("--rows", type=int, default=20, help="Data rows per table (default: 20)")
+    parser.add_argument("--continuation-pages", type=int, default=2,
+                        help="Pages each statement runs over (default: 2)")
+    parser.add_argument("--scanned-ratio", type=float, default=0.1,
+                        help="Share of scanned-style image pages (default: 0.1)")
+    parser.add_argument("--blank-ratio", type=float, default=0.05, help="Share of blank pages (default: 0.05)")
+    parser.add_argument("--latency", type=float, default=1.5, help="Mean stub model latency in seconds (default: 1.5)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency standard deviation (default: 0.5)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of model calls failing with 429/500 (default: 0)")
+    parser.add_argument("--backoff", type=float, default=0.1,
+                        help="First retry delay in seconds for injected errors (default: 0.1)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Concurrent model calls per document (default: 4)")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="Documents processed at once (default: 2)")
+    parser.add_argument("--format", default="csv", help="Output format of tables (default: csv)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the reports as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the extractor's logs")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+
+    # The stub key gets its own budget: no rate limit, concurrency for every job
+    budget = get_api_budget(BENCHMARK_API_KEY, max_concurrent=max(1, args.concurrency * args.jobs),
+                            requests_per_minute=0)
+    budget.backoff_seconds = args.backoff
+
+    reports = []
+    try:
+        pdf_dir = Path(WORK_DIR) / "pdfs"
+        pdf_dir.mkdir(parents=True, exist_ok=True)
+        documents = generate_documents(args, pdf_dir)
+        if args.mode in ("direct", "both"):
+            reports.append(run_direct(args, documents, Path(WORK_DIR) / "direct_output"))
+            print_report(reports[-1])
+        if args.mode in ("upload", "both"):
+            reports.append(run_upload(args, documents))
+            print_report(reports[-1])
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"arguments": vars(args), "reports": reports}, f, indent=2)
+        print(f"\nReports written to {args.json}")
+    return 1 if any(report["failed_documents"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
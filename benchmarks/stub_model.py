@@ -0,0 +1,105 @@
+"""
+Local stand-in for the Gemini model
+
+Answers generate_content calls like gemini-2.0-flash-exp would for a
+financial statement page - a ```json block with has_tables/tables and usage
+metadata - after a configurable delay, and fails a configurable share of
+calls with 429/500 errors so retries and error handling are exercised.
+"""
+import json
+import random
+import threading
+import time
+from typing import Dict, List
+
+from benchmarks.synthetic_pdfs import LINE_ITEMS, PERIOD_HEADERS, STATEMENT_TITLES
+
+
+class StubUsage:
+    """Mirrors the usage_metadata of a Gemini response"""
+
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class StubResponse:
+    def __init__(self, text: str, usage_metadata: StubUsage):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class StubApiError(Exception):
+    """Transient API failure carrying an HTTP status code like google.api_core errors"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class StubModel:
+    """Thread-safe fake of genai.GenerativeModel"""
+
+    def __init__(self, latency: float = 1.5, jitter: float = 0.5, error_rate: float = 0.0,
+                 tables_per_page: int = 1, rows: int = 20, continuation_pages: int = 2, seed: int = 0):
+        """
+        Args:
+            latency (float): Mean seconds per call
+            jitter (float): Standard deviation of the call time in seconds
+            error_rate (float): Share of calls failing with 429 or 500
+            tables_per_page (int): Tables returned for each page
+            rows (int): Data rows per table
+            continuation_pages (int): Consecutive calls sharing a statement title, so
+                the extractor groups them as continuation tables
+            seed (int): Random seed
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tables_per_page = tables_per_page
+        self.rows = rows
+        self.continuation_pages = max(1, continuation_pages)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.call_seconds: List[float] = []
+
+    def generate_content(self, contents, generation_config=None, **kwargs) -> StubResponse:
+        with self._lock:
+            call = self.calls
+            self.calls += 1
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter))
+            fail = self._rng.random() < self.error_rate
+            status = self._rng.choice((429, 500)) if fail else None
+            if fail:
+                self.errors += 1
+            amounts = [[f"{self._rng.uniform(0, 250000):,.2f}" for _ in PERIOD_HEADERS[1:]]
+                       for _ in range(self.rows * self.tables_per_page)]
+
+        time.sleep(delay)
+        with self._lock:
+            self.call_seconds.append(delay)
+        if status == 429:
+            raise StubApiError(429, "Resource exhausted: quota exceeded (stub)")
+        if status == 500:
+            raise StubApiError(500, "Internal error encountered (stub)")
+
+        statement = call // self.continuation_pages
+        title = STATEMENT_TITLES[statement % len(STATEMENT_TITLES)]
+        tables: List[Dict] = []
+        for table in range(self.tables_per_page):
+            rows = amounts[table * self.rows:(table + 1) * self.rows]
+            tables.append({
+                "title": title if table == 0 else f"{title} - Part {table + 1}",
+                "headers": ["Sr. No."] + PERIOD_HEADERS,
+                "data": [[str(i + 1), LINE_ITEMS[i % len(LINE_ITEMS)]] + row for i, row in enumerate(rows)],
+            })
+        text = "```json\n" + json.dumps({"has_tables": True, "tables": tables}, indent=2) + "\n```"
+        # Roughly what Gemini reports: image tiles plus the prompt in, ~4 characters per token out
+        return StubResponse(text, StubUsage(1290 + 600, len(text) // 4))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors}
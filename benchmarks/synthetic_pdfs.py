@@ -0,0 +1,142 @@
+"""
+Synthetic financial-statement PDFs for benchmarks
+
+Generates filings that look like the documents the extractor sees in
+production: ruled statement tables with a "Particulars" column and period
+columns, statements continued over several pages, scanned-style pages
+(an image of the page with noise, no text layer) and blank separator pages.
+"""
+import random
+from typing import Dict, List
+
+import fitz  # PyMuPDF
+import numpy as np
+
+STATEMENT_TITLES = [
+    "STANDALONE STATEMENT OF PROFIT AND LOSS FOR THE QUARTER ENDED 30 JUNE 2024",
+    "CONSOLIDATED BALANCE SHEET AS AT 31 MARCH 2024",
+    "STATEMENT OF CASH FLOWS FOR THE YEAR ENDED 31 MARCH 2024",
+    "SEGMENT WISE REVENUE, RESULTS, ASSETS AND LIABILITIES",
+    "NOTES TO THE FINANCIAL RESULTS",
+]
+PERIOD_HEADERS = ["Particulars", "Quarter ended 30.06.2024", "Quarter ended 31.03.2024",
+                  "Quarter ended 30.06.2023", "Year ended 31.03.2024"]
+LINE_ITEMS = [
+    "Revenue from operations", "Other income", "Total income", "Cost of materials consumed",
+    "Purchases of stock-in-trade", "Employee benefits expense", "Finance costs",
+    "Depreciation and amortisation expense", "Other expenses", "Total expenses",
+    "Profit before exceptional items and tax", "Exceptional items", "Current tax",
+    "Deferred tax", "Profit for the period", "Other comprehensive income",
+    "Total comprehensive income", "Paid-up equity share capital", "Earnings per share (Basic)",
+    "Earnings per share (Diluted)",
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = fitz.paper_size("a4")
+MARGIN = 40
+ROW_HEIGHT = 16
+
+
+def _amount(rng: random.Random) -> str:
+    value = rng.uniform(-5000, 250000)
+    text = f"{abs(value):,.2f}"
+    return f"({text})" if value < 0 else text
+
+
+def _draw_table(page, rng: random.Random, title: str, top: float, rows: int) -> float:
+    """Draw one ruled statement table; returns the y position below it"""
+    page.insert_text((MARGIN, top), title, fontsize=10, fontname="helv")
+    page.insert_text((MARGIN, top + 12), "(Rs. in Lakhs)", fontsize=7, fontname="helv")
+    y = top + 22
+    col_widths = [215] + [(PAGE_WIDTH - 2 * MARGIN - 215) / (len(PERIOD_HEADERS) - 1)] * (len(PERIOD_HEADERS) - 1)
+    xs = [MARGIN]
+    for width in col_widths:
+        xs.append(xs[-1] + width)
+
+    for row in range(rows + 1):
+        if y + ROW_HEIGHT > PAGE_HEIGHT - MARGIN:
+            break
+        cells = PERIOD_HEADERS if row == 0 else [LINE_ITEMS[(row - 1) % len(LINE_ITEMS)]] + \
+            [_amount(rng) for _ in PERIOD_HEADERS[1:]]
+        for i, cell in enumerate(cells):
+            fontsize = 6.5 if row == 0 else 7
+            if i == 0:
+                page.insert_text((xs[i] + 3, y + 11), cell, fontsize=fontsize, fontname="helv")
+            else:
+                width = fitz.get_text_length(cell, fontname="helv", fontsize=fontsize)
+                page.insert_text((xs[i + 1] - width - 3, y + 11), cell, fontsize=fontsize, fontname="helv")
+        page.draw_line((MARGIN, y), (xs[-1], y), width=0.4)
+        y += ROW_HEIGHT
+    page.draw_line((MARGIN, y), (xs[-1], y), width=0.4)
+    for x in xs:
+        page.draw_line((x, top + 22), (x, y), width=0.4)
+    return y + 18
+
+
+def _scanned_copy(doc, page, rng: random.Random, dpi: int = 100):
+    """Replace a page with a noisy grayscale image of itself (no text layer)"""
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width).astype(np.int16)
+    noise = np.random.default_rng(rng.randrange(1 << 30)).normal(0, 12, pixels.shape)
+    pixels = np.clip(pixels + noise, 0, 255).astype(np.uint8)
+    noisy = fitz.Pixmap(fitz.csGRAY, pix.width, pix.height, pixels.tobytes(), False)
+    number = page.number
+    doc.delete_page(number)
+    scanned = doc.new_page(number, width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    scanned.insert_image(scanned.rect, pixmap=noisy)
+
+
+def make_financial_pdf(path: str, pages: int = 20, tables_per_page: int = 1, rows_per_table: int = 20,
+                       continuation_pages: int = 2, scanned_ratio: float = 0.1, blank_ratio: float = 0.05,
+                       seed: int = 0) -> Dict:
+    """
+    Write a synthetic filing
+
+    Args:
+        path (str): Output PDF path
+        pages (int): Number of pages
+        tables_per_page (int): Statement tables drawn on each table page
+        rows_per_table (int): Data rows per table (cut short at the page bottom)
+        continuation_pages (int): Pages each statement runs over; later pages repeat
+            the title with "(Continued)"
+        scanned_ratio (float): Share of pages turned into noisy images without text
+        blank_ratio (float): Share of blank separator pages
+        seed (int): Random seed - the same arguments give the same document
+
+    Returns:
+        Dict with the path and the kind of each page (table, scanned, blank)
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    kinds: List[str] = []
+    statement = 0
+    for page_index in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        if rng.random() < blank_ratio:
+            kinds.append("blank")
+            continue
+
+        part = page_index % max(1, continuation_pages)
+        if part == 0:
+            statement += 1
+        title = STATEMENT_TITLES[statement % len(STATEMENT_TITLES)]
+        if part:
+            title += " (Continued)"
+        page.insert_text((MARGIN, MARGIN), f"SYNTHETIC INDUSTRIES LIMITED - document {seed}", fontsize=9,
+                         fontname="helv")
+        y = MARGIN + 24
+        for table in range(tables_per_page):
+            y = _draw_table(page, rng, title if table == 0 else f"{title} - Part {table + 1}", y,
+                            max(1, rows_per_table // tables_per_page))
+            if y > PAGE_HEIGHT - MARGIN - 60:
+                break
+        page.insert_text((PAGE_WIDTH / 2 - 10, PAGE_HEIGHT - 20), str(page_index + 1), fontsize=8)
+
+        if rng.random() < scanned_ratio:
+            _scanned_copy(doc, page, rng)
+            kinds.append("scanned")
+        else:
+            kinds.append("table")
+
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return {"path": path, "pages": pages, "kinds": kinds}
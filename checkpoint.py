@@ -0,0 +1,139 @@
+"""
+Per-document checkpoints of finished page extractions
+
+Every page Gemini extracts is appended as one JSON line to a checkpoint file
+named after the document's content hash and the prompt version. When a run
+is interrupted (worker killed, deploy), the next run of the same document
+loads the finished pages and only sends the missing ones to Gemini. Pages
+whose call failed (quota, timeout) are recorded as failed and retried by the
+next run. The file is removed once every page of the document succeeded.
+"""
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Where checkpoints are kept unless the extractor is configured otherwise
+DEFAULT_CHECKPOINT_DIR = os.environ.get('EXTRACTION_CHECKPOINT_DIR', 'checkpoints')
+
+
+class ExtractionCheckpoint:
+    """Append-only JSONL record of the pages extracted from one document"""
+
+    def __init__(self, directory, document_hash: str, prompt_version: str):
+        """
+        Args:
+            directory (str): Directory holding checkpoint files
+            document_hash (str): Content hash of the PDF
+            prompt_version (str): Version of the extraction prompt; results of
+                another prompt are never reused
+        """
+        self.path = Path(directory) / f"{document_hash}_{prompt_version}.jsonl"
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Dict[int, Dict]:
+        """
+        Read the pages finished by earlier runs
+
+        Returns:
+            Dict of page number -> {"extraction": result, "image": image info}
+        """
+        pages = {}
+        failed = set()
+        if not self.path.exists():
+            return pages
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    page_number = int(entry["page_number"])
+                    if "failed" in entry:
+                        failed.add(page_number)
+                    else:
+                        pages[page_number] = entry
+                except (ValueError, KeyError, TypeError):
+                    # A line cut short when the previous run was killed
+                    logger.warning(f"Ignoring damaged checkpoint line in {self.path.name}")
+        if pages:
+            logger.info(f"♻️ Checkpoint {self.path.name}: {len(pages)} page(s) already extracted")
+        failed -= set(pages)
+        if failed:
+            logger.info(f"♻️ Checkpoint {self.path.name}: retrying {len(failed)} failed page(s): {sorted(failed)}")
+        return pages
+
+    def record(self, page_number: int, extraction: Dict, image_info: Optional[Dict] = None):
+        """
+        Append one finished page (safe to call from several threads)
+
+        Args:
+            page_number (int): 1-based page number
+            extraction (Dict): Result of extract_tables_from_image
+            image_info (Dict): Encoding details of the image sent
+        """
+        self._append({"page_number": page_number, "extraction": extraction, "image": image_info})
+
+    def record_failure(self, page_number: int, error: str):
+        """
+        Append a page whose extraction failed; load skips it so the next run retries it
+
+        Args:
+            page_number (int): 1-based page number
+            error (str): Why the extraction failed
+        """
+        self._append({"page_number": page_number, "failed": error})
+
+    def _append(self, entry: Dict):
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._drop_partial_line()
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + "\n")
+            # Flushed per page so a killed process keeps everything already extracted
+            self._file.flush()
+
+    def _drop_partial_line(self):
+        """
+        Cut off a last line left unfinished by a killed run
+
+        Appending after it would join the next record onto the damaged line,
+        and load would then discard both.
+        """
+        try:
+            with open(self.path, 'rb+') as f:
+                end = f.seek(0, os.SEEK_END)
+                position = end
+                while position > 0:
+                    start = max(0, position - 4096)
+                    f.seek(start)
+                    block = f.read(position - start)
+                    newline = block.rfind(b"\n")
+                    if newline != -1:
+                        position = start + newline + 1
+                        break
+                    position = start
+                if position < end:
+                    logger.warning(f"Dropping damaged last line of checkpoint {self.path.name}")
+                    f.truncate(position)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        """Delete the checkpoint once every page of the document succeeded"""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,125 @@
+"""
+Single-open PDF document session
+
+Opens a PDF once and serves title detection, text-layer analysis and page
+rendering from that one handle. Per-page TextPages, text and geometry are
+parsed lazily and cached, so each page is parsed at most once per document.
+"""
+import logging
+import threading
+from typing import Dict, Optional
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+
+class PDFDocumentSession:
+    """One open PyMuPDF document with lazily cached per-page text and geometry"""
+
+    def __init__(self, pdf_path: str):
+        """
+        Args:
+            pdf_path (str): Path to the PDF file
+        """
+        self.pdf_path = str(pdf_path)
+        self.doc = fitz.open(self.pdf_path)
+        # PyMuPDF objects must not be used from two threads at once
+        self.lock = threading.RLock()
+        self._pages: Dict[int, object] = {}
+        self._textpages: Dict[int, object] = {}
+        self._texts: Dict[int, str] = {}
+        self._rects: Dict[int, object] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release cached pages and close the document"""
+        with self.lock:
+            self.release_text_cache()
+            self._pages.clear()
+            if not self.doc.is_closed:
+                self.doc.close()
+
+    @property
+    def page_count(self) -> int:
+        return len(self.doc)
+
+    @property
+    def metadata(self) -> Dict:
+        return self.doc.metadata or {}
+
+    def page(self, page_num: int):
+        """Return the (cached) page object for a 1-based page number"""
+        with self.lock:
+            page = self._pages.get(page_num)
+            if page is None:
+                page = self.doc.load_page(page_num - 1)
+                self._pages[page_num] = page
+            return page
+
+    def rect(self, page_num: int):
+        """Return the page rectangle"""
+        with self.lock:
+            rect = self._rects.get(page_num)
+            if rect is None:
+                rect = self.page(page_num).rect
+                self._rects[page_num] = rect
+            return rect
+
+    def textpage(self, page_num: int):
+        """Return the page's TextPage, parsing the page content on first use only"""
+        with self.lock:
+            textpage = self._textpages.get(page_num)
+            if textpage is None:
+                textpage = self.page(page_num).get_textpage()
+                self._textpages[page_num] = textpage
+            return textpage
+
+    def text(self, page_num: int) -> str:
+        """Return the plain text layer of a page"""
+        with self.lock:
+            text = self._texts.get(page_num)
+            if text is None:
+                text = self.page(page_num).get_text("text", textpage=self.textpage(page_num))
+                self._texts[page_num] = text
+            return text
+
+    def text_dict(self, page_num: int) -> Dict:
+        """Return the structured (blocks/lines/spans) text of a page"""
+        with self.lock:
+            return self.page(page_num).get_text("dict", textpage=self.textpage(page_num))
+
+    def render(self, page_num: int, zoom: float, colorspace: Optional[object] = None):
+        """
+        Render a page to a pixmap
+
+        Args:
+            page_num (int): 1-based page number
+            zoom (float): Zoom factor (1.0 = 72 DPI)
+            colorspace: PyMuPDF colorspace, RGB when None
+
+        Returns:
+            fitz.Pixmap without alpha channel
+        """
+        with self.lock:
+            return self.page(page_num).get_pixmap(
+                matrix=fitz.Matrix(zoom, zoom),
+                colorspace=colorspace or fitz.csRGB,
+                alpha=False
+            )
+
+    def release_text_cache(self):
+        """Drop cached TextPages once text analysis is done, keeping the extracted strings"""
+        with self.lock:
+            self._textpages.clear()
+
+    def release_page(self, page_num: int):
+        """Drop a page object that will not be needed again (e.g. after rendering it)"""
+        with self.lock:
+            self._pages.pop(page_num, None)
+            self._textpages.pop(page_num, None)
@@ -0,0 +1,373 @@
+"""
+Prometheus-style metrics shared by all worker processes
+
+Counters and latency histograms are kept in memory per process and written
+to a small JSON snapshot file (one per process) at most once per second and
+at the end of every request. /metrics sums the snapshots of every worker
+that used the same METRICS_DIR, so totals are correct behind gunicorn no
+matter which worker serves the scrape. Snapshots of exited workers are
+folded into one retained totals file, so the directory (and the cost of a
+scrape) follows the number of live workers, not every worker ever started.
+No prometheus_client dependency - the text exposition format is written
+directly.
+"""
+import os
+import json
+import time
+import uuid
+import atexit
+import socket
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from observers import ExtractionObserver
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'pdf_extractor_metrics')
+
+# Retained sums of exited processes, and the lock guarding folds into it
+TOTALS_NAME = 'totals.json'
+LOCK_NAME = '.lock'
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# name -> (type, help)
+METRIC_DEFINITIONS = {
+    "pdf_extractor_stage_seconds": (
+        "histogram", "Duration of pipeline stages (upload_save, title_extraction, render, gemini, "
+                     "json_parse, grouping, table_write, zip_build)"),
+    "pdf_extractor_gemini_requests_total": ("counter", "Gemini page requests by outcome"),
+    "pdf_extractor_gemini_tokens_total": ("counter", "Gemini tokens reported in usage metadata, by direction"),
+    "pdf_extractor_gemini_retries_total": ("counter", "Gemini calls retried after a 429/5xx response"),
+    "pdf_extractor_pages_total": ("counter", "Processed pages by outcome (extracted, blank, duplicate, restored, error)"),
+    "pdf_extractor_result_cache_total": ("counter", "Result cache lookups by result (hit, miss)"),
+    "pdf_extractor_documents_total": ("counter", "Processed documents by status"),
+}
+
+
+def _label_key(labels: Dict) -> str:
+    return json.dumps(labels, sort_keys=True)
+
+
+def _format_labels(labels: Dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _merge(counters: Dict, histograms: Dict, snapshot: Dict):
+    """Add the counters and histograms of one snapshot to the totals"""
+    for metric, series in snapshot.get("counters", {}).items():
+        totals = counters.setdefault(metric, {})
+        for key, value in series.items():
+            totals[key] = totals.get(key, 0) + value
+    for metric, series in snapshot.get("histograms", {}).items():
+        totals = histograms.setdefault(metric, {})
+        for key, values in series.items():
+            current = totals.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                current[i] += value
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        # No signal support (Windows) - keep the snapshot
+        return True
+    return True
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(directory: str, path: str, text: str):
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+class MetricsRegistry:
+    """Counters and histograms of one process, plus the cross-process view"""
+
+    def __init__(self, directory: str = METRICS_DIR, flush_interval: float = 1.0):
+        """
+        Args:
+            directory (str): Directory of per-process snapshot files
+            flush_interval (float): Minimum seconds between snapshot writes
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # In-process stand-in for the directory lock where flock is unavailable
+        self._fold_lock = threading.Lock()
+        self._host = socket.gethostname()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # Unique per process start: a reused pid never overwrites a dead worker's totals
+        self._snapshot_name = f"{self._pid}-{uuid.uuid4().hex[:8]}.json"
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._histograms: Dict[str, Dict[str, list]] = {}
+        self._last_flush = 0.0
+        self._dirty = False
+        self._written = False
+
+    def _check_fork(self):
+        # A forked child starts with its parent's numbers - it counts only its own
+        if os.getpid() != self._pid:
+            self._reset()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add to a counter"""
+        with self._lock:
+            self._check_fork()
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+            self._dirty = True
+        self.flush()
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record one duration in a histogram"""
+        with self._lock:
+            self._check_fork()
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            # Per-bucket counts (not cumulative), then sum and count
+            values = series.get(key)
+            if values is None:
+                values = series[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    values[i] += 1
+                    break
+            values[-2] += seconds
+            values[-1] += 1
+            self._dirty = True
+        self.flush()
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        """Context manager observing the duration of its block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def flush(self, force: bool = False):
+        """
+        Write this process's snapshot if it changed (at most once per flush_interval)
+
+        Args:
+            force (bool): Write now regardless of the interval
+        """
+        now = time.monotonic()
+        if not self._dirty or (not force and now - self._last_flush < self.flush_interval):
+            return
+        with self._lock:
+            self._check_fork()
+            snapshot = json.dumps({"host": self._host, "pid": self._pid,
+                                   "counters": self._counters, "histograms": self._histograms})
+            self._last_flush = now
+            self._dirty = False
+            first_write = not self._written
+            self._written = True
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_atomic(self.directory, os.path.join(self.directory, self._snapshot_name), snapshot)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot: {e}")
+            return
+        # A new worker clears out the snapshots of the ones it replaced
+        if first_write:
+            self.fold_exited()
+
+    @contextmanager
+    def _directory_lock(self):
+        """Exclusive hold on the totals file, across processes where flock exists"""
+        if not FCNTL_AVAILABLE:
+            with self._fold_lock:
+                yield
+            return
+        fd = os.open(os.path.join(self.directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def fold_exited(self):
+        """
+        Move the snapshots of exited processes on this host into the totals file
+
+        Only processes of this host are checked (pids of other hosts sharing
+        METRICS_DIR mean nothing here). Each snapshot is added to the totals
+        and deleted under the directory lock, so it is counted exactly once.
+        """
+        try:
+            names = [name for name in os.listdir(self.directory)
+                     if name.endswith('.json') and name not in (TOTALS_NAME, self._snapshot_name)]
+        except FileNotFoundError:
+            return
+        if not names:
+            return
+        try:
+            with self._directory_lock():
+                totals_path = os.path.join(self.directory, TOTALS_NAME)
+                totals = _read_json(totals_path) or {}
+                counters, histograms = totals.get("counters", {}), totals.get("histograms", {})
+                folded = []
+                for name in names:
+                    path = os.path.join(self.directory, name)
+                    snapshot = _read_json(path)
+                    if snapshot is None or snapshot.get("host") != self._host:
+                        continue
+                    pid = snapshot.get("pid")
+                    if not isinstance(pid, int) or _process_alive(pid):
+                        continue
+                    _merge(counters, histograms, snapshot)
+                    folded.append(path)
+                if not folded:
+                    return
+                _write_atomic(self.directory, totals_path, json.dumps({"counters": counters, "histograms": histograms}))
+                for path in folded:
+                    os.remove(path)
+            logger.info(f"📊 Folded metrics of {len(folded)} exited worker(s) into {TOTALS_NAME}")
+        except OSError as e:
+            logger.warning(f"Could not fold metrics snapshots: {e}")
+
+    def collect(self) -> Tuple[Dict, Dict]:
+        """
+        Sum the snapshots of every live process and the totals of exited ones
+
+        Returns:
+            Tuple of (counters, histograms), each name -> label key -> value(s)
+        """
+        self.flush(force=True)
+        self.fold_exited()
+        counters: Dict[str, Dict[str, float]] = {}
+        histograms: Dict[str, Dict[str, list]] = {}
+        if not os.path.isdir(self.directory):
+            return counters, histograms
+        try:
+            # A fold moves snapshots into the totals under the same lock, so
+            # none is read twice or missed
+            with self._directory_lock():
+                for name in os.listdir(self.directory):
+                    if not name.endswith('.json'):
+                        continue
+                    snapshot = _read_json(os.path.join(self.directory, name))
+                    if snapshot is not None:
+                        _merge(counters, histograms, snapshot)
+        except OSError as e:
+            logger.warning(f"Could not read metrics snapshots: {e}")
+        return counters, histograms
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (metric_type, help_text) in METRIC_DEFINITIONS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if metric_type == "counter":
+                for key, value in sorted(counters.get(name, {}).items()):
+                    lines.append(f"{name}{_format_labels(json.loads(key))} {_format_value(value)}")
+            else:
+                for key, values in sorted(histograms.get(name, {}).items()):
+                    labels = json.loads(key)
+                    cumulative = 0
+                    for bound, count in zip(LATENCY_BUCKETS, values):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(dict(labels, le=repr(bound)))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(dict(labels, le='+Inf'))} {_format_value(values[-1])}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(values[-2])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {_format_value(values[-1])}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsObserver(ExtractionObserver):
+    """Records extractor events in a MetricsRegistry"""
+
+    def __init__(self, metrics_registry: Optional[MetricsRegistry] = None):
+        self.registry = metrics_registry or registry
+
+    def page_rendered(self, page_number, seconds, width, height):
+        self.registry.observe("pdf_extractor_stage_seconds", seconds, stage="render")
+
+    def response_received(self, page_number, extraction, usage):
+        self.registry.inc("pdf_extractor_gemini_requests_total",
+                          outcome="error" if "error" in extraction else "ok")
+        if not usage:
+            return
+        self.registry.observe("pdf_extractor_stage_seconds", usage.get("gemini_seconds", 0.0), stage="gemini")
+        if "json_parse_seconds" in usage:
+            self.registry.observe("pdf_extractor_stage_seconds", usage["json_parse_seconds"], stage="json_parse")
+        self.registry.inc("pdf_extractor_gemini_tokens_total", usage.get("input_tokens", 0), direction="in")
+        self.registry.inc("pdf_extractor_gemini_tokens_total", usage.get("output_tokens", 0), direction="out")
+
+    def table_grouped(self, page_number, table_number, group_key, reason, seconds):
+        self.registry.observe("pdf_extractor_stage_seconds", seconds, stage="grouping")
+
+    def page_finished(self, page_result):
+        if page_result.get("skipped"):
+            outcome = page_result["skipped"]
+        elif page_result.get("duplicate_of"):
+            outcome = "duplicate"
+        elif page_result.get("error"):
+            outcome = "error"
+        elif page_result.get("usage"):
+            outcome = "extracted"
+        else:
+            outcome = "restored"
+        self.registry.inc("pdf_extractor_pages_total", outcome=outcome)
+
+    def file_written(self, path, table, seconds):
+        self.registry.observe("pdf_extractor_stage_seconds", seconds, stage="table_write")
+
+    def document_finished(self, results, error=None):
+        if results is not None and results.get("timings", {}).get("title_extraction"):
+            self.registry.observe("pdf_extractor_stage_seconds", results["timings"]["title_extraction"],
+                                  stage="title_extraction")
+        status = "error" if error is not None or results is None or "error" in results else "ok"
+        self.registry.inc("pdf_extractor_documents_total", status=status)
+
+
+# Process-wide registry used by the app, the extractor and the API budget
+registry = MetricsRegistry()
+atexit.register(registry.flush, True)
+
+# Registered on every PDFTableExtractor by default
+metrics_observer = MetricsObserver()
@@ -1,21 +1,45 @@
 import os
 import base64
-import pandas as pd
 import google.generativeai as genai
 from pathlib import Path
 import json
 import re
-from typing import List, Dict, Optional
+import glob
+import time
+import hashlib
+import argparse
+from typing import Callable, List, Dict, Optional
 import io
 import fitz  # PyMuPDF
+import numpy as np
 import platform
 import subprocess
+from functools import lru_cache
 import sys
+import copy
 import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+from render_pool import RenderPool
+from page_index import PageTextIndex, check_page_ranges, check_targets, parse_page_ranges
+from document_session import PDFDocumentSession
+from title_rules import get_title_rules
+from table_grouping import TableGroupIndex, headers_compatible
+from records import PageResult, TableSummary, intern_text
+from api_budget import get_api_budget
+from checkpoint import DEFAULT_CHECKPOINT_DIR, ExtractionCheckpoint
+from page_dedup import DuplicatePageIndex
+from metrics import metrics_observer
+from observers import ExtractionObserver
+from result_cache import result_cache_key
+from table_export import OUTPUT_FORMATS, PYARROW_AVAILABLE, normalize_table, table_record, write_table_csv, write_table_parquet
+
 # Optional imports for different PDF processing methods
 try:
     from pdf2image import convert_from_path
@@ -30,33 +54,182 @@ try:
 except ImportError:
     PYPDF2_AVAILABLE = False
 
+# Default encoding for page images sent to Gemini
+DEFAULT_IMAGE_ENCODING = {
+    "format": "PNG",         # PNG, JPEG or WEBP
+    "quality": 85,           # JPEG/WebP quality, ignored for PNG
+    "mode": "RGB",           # RGB, L (grayscale) or 1 (black and white)
+    "max_long_edge": None,   # Downscale so the longest side fits, None keeps the render size
+}
+
+IMAGE_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# Gemini bills small images as one tile and larger ones per 768x768 tile
+GEMINI_SMALL_IMAGE_EDGE = 384
+GEMINI_IMAGE_TILE_EDGE = 768
+GEMINI_TOKENS_PER_TILE = 258
+
+# Result error of a document whose pages/targets select nothing
+NO_PAGES_SELECTED_ERROR = "No pages matched the requested pages/targets"
+
+
+# Markers passed between pipeline stages in process_pdf
+_PIPELINE_END = object()
+
+
+class _StageError:
+    """Exception raised in a pipeline stage, forwarded to the consuming stage"""
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+def _put_until_stopped(stage_queue: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put an item on a bounded stage queue, giving up once the pipeline is stopped"""
+    while not stop.is_set():
+        try:
+            stage_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get_until_stopped(stage_queue: queue.Queue, stop: threading.Event):
+    """Take the next item from a stage queue, returning the end marker once the pipeline is stopped"""
+    while not stop.is_set():
+        try:
+            return stage_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _PIPELINE_END
+
+
+@lru_cache(maxsize=None)
+def _poppler_available() -> bool:
+    """Probe for poppler's pdftoppm once per process"""
+    try:
+        if platform.system() == "Windows":
+            subprocess.run(["pdftoppm", "-h"], capture_output=True, check=True)
+        else:
+            subprocess.run(["which", "pdftoppm"], capture_output=True, check=True)
+        return True
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+
+
+class ImageEncodingError(ValueError):
+    """An image encoding setting is invalid; field names the setting"""
+    
+    def __init__(self, field: str, message: str):
+        super().__init__(message)
+        self.field = field
+
+
+def validate_image_encoding(settings: Dict) -> Dict:
+    """
+    Check and normalise image encoding settings (see DEFAULT_IMAGE_ENCODING)
+    
+    Args:
+        settings (Dict): Encoding settings, possibly with string values
+        
+    Returns:
+        Dict: The settings with format/mode normalised (PNG/RGB when unset) and numbers as int
+        
+    Raises:
+        ImageEncodingError: If a setting is invalid
+    """
+    validated = dict(settings)
+    image_format = str(settings.get("format") or "PNG").strip().upper()
+    if image_format == "JPG":
+        image_format = "JPEG"
+    if image_format not in IMAGE_MIME_TYPES:
+        raise ImageEncodingError("format", f"Unsupported image format: {settings.get('format')} "
+                                           f"(use one of {', '.join(IMAGE_MIME_TYPES)})")
+    validated["format"] = image_format
+    
+    mode = str(settings.get("mode") or "RGB").strip()
+    if mode not in ("RGB", "L", "1"):
+        raise ImageEncodingError("mode", f"Unsupported image mode: {settings.get('mode')} (use RGB, L or 1)")
+    validated["mode"] = mode
+    
+    if settings.get("quality") is not None:
+        try:
+            quality = int(settings["quality"])
+        except (TypeError, ValueError):
+            quality = None
+        if quality is None or not 1 <= quality <= 100:
+            raise ImageEncodingError("quality", f"Invalid image quality: {settings['quality']} "
+                                                f"(use a whole number from 1 to 100)")
+        validated["quality"] = quality
+    
+    if settings.get("max_long_edge") is not None:
+        try:
+            max_long_edge = int(settings["max_long_edge"])
+        except (TypeError, ValueError):
+            max_long_edge = None
+        if max_long_edge is None or max_long_edge < 1:
+            raise ImageEncodingError("max_long_edge", f"Invalid image max long edge: {settings['max_long_edge']} "
+                                                      f"(use a positive number of pixels)")
+        validated["max_long_edge"] = max_long_edge
+    
+    return validated
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """
+    Estimate the number of input tokens Gemini charges for an image
+    
+    Args:
+        width (int): Image width in pixels
+        height (int): Image height in pixels
+        
+    Returns:
+        int: Estimated image token count
+    """
+    if width <= GEMINI_SMALL_IMAGE_EDGE and height <= GEMINI_SMALL_IMAGE_EDGE:
+        return GEMINI_TOKENS_PER_TILE
+    tiles_x = -(-width // GEMINI_IMAGE_TILE_EDGE)
+    tiles_y = -(-height // GEMINI_IMAGE_TILE_EDGE)
+    return tiles_x * tiles_y * GEMINI_TOKENS_PER_TILE
+
+
 class PDFTableExtractor:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, model=None):
         """
         Initialize the PDF Table Extractor with Gemini 2.0 Flash
         
         Args:
             api_key (str): Your Google AI API key
+            model: Optional object with a generate_content method used instead of
+                Gemini (e.g. the stub model of the benchmarks); no API calls are
+                made to configure it
         """
         self.api_key = api_key
-        logger.info("Configuring Gemini API...")
         
         try:
-            genai.configure(api_key=api_key)
-            
-            # Test API key by listing models
-            available_models = []
-            try:
-                for model in genai.list_models():
-                    if 'generateContent' in model.supported_generation_methods:
-                        available_models.append(model.name)
-                logger.info(f"Available models: {available_models}")
-            except Exception as e:
-                logger.warning(f"Could not list models: {e}")
+            if model is not None:
+                self.model = model
+                logger.info(f"Using provided model: {type(model).__name__}")
+            else:
+                logger.info("Configuring Gemini API...")
+                genai.configure(api_key=api_key)
+                
+                # Test API key by listing models
+                available_models = []
+                try:
+                    for listed_model in genai.list_models():
+                        if 'generateContent' in listed_model.supported_generation_methods:
+                            available_models.append(listed_model.name)
+                    logger.info(f"Available models: {available_models}")
+                except Exception as e:
+                    logger.warning(f"Could not list models: {e}")
+                
+                # Initialize Gemini 2.0 Flash model
+                self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+                logger.info("Successfully initialized Gemini 2.0 Flash model")
             
-            # Initialize Gemini 2.0 Flash model
-            self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            logger.info("Successfully initialized Gemini 2.0 Flash model")
+            # Concurrency/rate budget shared by every extractor using this key
+            self.api_budget = get_api_budget(api_key)
             
         except Exception as e:
             logger.error(f"Failed to configure Gemini API: {e}")
@@ -67,42 +240,110 @@ class PDFTableExtractor:
         self.base_output_dir.mkdir(exist_ok=True)
         self.output_dir = None  # Will be set when processing PDF
         
+        # Blank page detection on low-resolution renders
+        self.skip_blank_pages = True
+        self.blank_page_zoom = 0.5         # 36 DPI is plenty to measure ink
+        self.blank_ink_level = 160         # Grayscale value below which a pixel counts as ink
+        # A page is skipped only if it has no text layer, (almost) no ink pixels AND is
+        # near-uniform: a ruled continuation table or a few lines of text measure
+        # 0.03-0.5% ink at 36 DPI, a full statement page about 1%
+        self.blank_ink_threshold = 0.0001  # Less than 0.01% ink (a page number or speck)
+        self.blank_std_threshold = 2.0     # Near-uniform page (any colour)
+        
+        # Repeated pages (identical low-resolution renders) reuse the extraction of
+        # their first occurrence instead of another Gemini call
+        self.dedupe_pages = True
+        self.duplicate_max_diff_pixels = 0  # Ink pixels allowed to differ between duplicates
+        
+        # Title normalisation rules used to group continuation tables
+        self.title_rules = get_title_rules()
+        
+        # Page targeting - pages after a target match that may hold its continuation
+        self.target_neighbour_pages = 1
+        
+        # Extracted pages without a continuation after which a table group is written
+        # out, keeping memory bounded on long documents (0 keeps every group to the end)
+        self.continuation_window = 2
+        
+        # Full-resolution rendering
+        self.render_zoom = 3.0  # 3x zoom = 216 DPI for better accuracy
+        self.render_workers = os.cpu_count() or 1
+        self.render_pool_min_pages = 16  # Smaller documents render faster in-process
+        self.render_pages_in_flight = 16  # Pages the render pool holds at once (~13.5MB each at 3x)
+        
+        # Pipeline between render, encode, extract and write stages
+        self.pipeline_depth = 2    # Pages (or table groups) buffered between stages
+        self.extract_workers = 1   # Concurrent Gemini calls per document
+        
+        # Encoding of page images sent to Gemini (see DEFAULT_IMAGE_ENCODING)
+        self.image_encoding = dict(DEFAULT_IMAGE_ENCODING)
+        
+        # Export numeric columns as numbers and label columns as categoricals
+        # instead of the cell text as printed (see table_export.typed_frame)
+        self.typed_export = False
+        
+        # File format of combined tables, one of OUTPUT_FORMATS
+        self.output_format = "csv"
+        
+        # Directory of per-document page checkpoints used to resume interrupted
+        # runs (see checkpoint.py); None disables checkpointing
+        self.checkpoint_dir = DEFAULT_CHECKPOINT_DIR
+        
+        # Observers of process_pdf events (see observers.py); metrics are one of them
+        self.observers: List[ExtractionObserver] = [metrics_observer]
+        
         # Check available PDF processing methods
         self.check_dependencies()
     
-    def extract_pdf_title(self, pdf_path: str) -> str:
+    def fork(self) -> "PDFTableExtractor":
+        """
+        Copy this extractor for processing another document concurrently
+        
+        The copy shares the configured Gemini model, API budget and title rules
+        (no new key probe) but has its own output directory and settings.
+        
+        Returns:
+            PDFTableExtractor
+        """
+        forked = copy.copy(self)
+        forked.image_encoding = dict(self.image_encoding)
+        forked.observers = list(self.observers)
+        forked.output_dir = None
+        return forked
+    
+    def extract_pdf_title(self, pdf_path: str, session: Optional[PDFDocumentSession] = None) -> str:
         """
         Extract title from PDF metadata or first page content
         
         Args:
             pdf_path (str): Path to the PDF file
+            session (PDFDocumentSession): Open document session to reuse, opened here if None
             
         Returns:
             str: Extracted title or fallback name
         """
+        own_session = session is None
         try:
             logger.info(f"Extracting title from PDF: {pdf_path}")
-            doc = fitz.open(pdf_path)
+            if own_session:
+                session = PDFDocumentSession(pdf_path)
             
             # First try to get title from metadata
-            metadata = doc.metadata
+            metadata = session.metadata
             if metadata and metadata.get('title'):
                 title = metadata['title'].strip()
                 if title and len(title) > 3:  # Valid title
-                    doc.close()
                     logger.info(f"Found title in metadata: {title}")
                     return self.sanitize_directory_name(title)
             
             # If no metadata title, try to extract from first page
-            if len(doc) > 0:
-                first_page = doc[0]
-                
+            if session.page_count > 0:
                 # Get text blocks (title is usually in larger font at top)
-                blocks = first_page.get_text("dict")
+                blocks = session.text_dict(1)
                 
                 # Look for the largest text in the upper portion of the page
                 title_candidates = []
-                page_height = first_page.rect.height
+                page_height = session.rect(1).height
                 
                 for block in blocks.get("blocks", []):
                     if "lines" in block:
@@ -136,14 +377,14 @@ class PDFTableExtractor:
                     potential_title = re.sub(r'^(COMPANY|CORPORATION|LIMITED|LTD|INC)[\s:]+', '', potential_title, flags=re.IGNORECASE)
                     
                     if len(potential_title) > 5:  # Valid title length
-                        doc.close()
                         logger.info(f"Extracted title from first page: {potential_title}")
                         return self.sanitize_directory_name(potential_title)
             
-            doc.close()
-            
         except Exception as e:
             logger.error(f"Error extracting PDF title: {e}")
+        finally:
+            if own_session and session is not None:
+                session.close()
         
         # Fallback to filename
         pdf_name = Path(pdf_path).stem
@@ -179,24 +420,34 @@ class PDFTableExtractor:
         
         return sanitized
     
-    def setup_output_directory(self, pdf_path: str):
+    def setup_output_directory(self, pdf_path: str, session: Optional[PDFDocumentSession] = None):
         """
         Setup output directory based on PDF title
         
         Args:
             pdf_path (str): Path to the PDF file
+            session (PDFDocumentSession): Open document session to reuse
         """
         # Extract title from PDF
-        pdf_title = self.extract_pdf_title(pdf_path)
+        pdf_title = self.extract_pdf_title(pdf_path, session)
         
         # Create directory name with timestamp to avoid conflicts
         from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         dir_name = f"{pdf_title}_{timestamp}"
         
-        # Create the output directory
+        # Create the output directory (documents with the same title processed in
+        # the same second, e.g. by the batch CLI, each get their own)
+        self.base_output_dir.mkdir(parents=True, exist_ok=True)
         self.output_dir = self.base_output_dir / dir_name
-        self.output_dir.mkdir(exist_ok=True)
+        counter = 2
+        while True:
+            try:
+                self.output_dir.mkdir()
+                break
+            except FileExistsError:
+                self.output_dir = self.base_output_dir / f"{dir_name}_{counter}"
+                counter += 1
         
         logger.info(f"📁 Created output directory: {self.output_dir}")
         logger.info(f"📄 PDF Title detected: {pdf_title}")
@@ -227,15 +478,8 @@ class PDFTableExtractor:
         logger.info(f"Available methods: {', '.join(methods)}")
     
     def check_poppler(self) -> bool:
-        """Check if poppler is installed and accessible"""
-        try:
-            if platform.system() == "Windows":
-                subprocess.run(["pdftoppm", "-h"], capture_output=True, check=True)
-            else:
-                subprocess.run(["which", "pdftoppm"], capture_output=True, check=True)
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+        """Check if poppler is installed and accessible (probed once per process)"""
+        return _poppler_available()
     
     def install_pymupdf(self):
         """Install PyMuPDF if not available"""
@@ -248,54 +492,224 @@ class PDFTableExtractor:
             logger.error(f"Failed to install PyMuPDF: {e}")
             raise Exception("No PDF processing library available. Please install either PyMuPDF or pdf2image with poppler.")
     
-    def pdf_to_images_pymupdf(self, pdf_path: str) -> List[any]:
+    def select_pages(self, pdf_path: str, pages: Optional[str] = None,
+                     targets: Optional[List[str]] = None,
+                     session: Optional[PDFDocumentSession] = None) -> Optional[set]:
         """
-        Convert PDF pages to images using PyMuPDF with enhanced quality
+        Resolve page ranges and keyword/regex targets to the pages worth extracting
         
         Args:
             pdf_path (str): Path to the PDF file
+            pages (str): Page ranges such as "1-5, 12, 40-", None for all pages
+            targets (List[str]): Phrases such as "Statement of Profit and Loss" or "re:<regex>"
+            session (PDFDocumentSession): Open document session to reuse, opened here if None
             
         Returns:
-            List of PIL Image objects
+            Set of 1-based page numbers, or None when every page should be processed
         """
+        if not pages and not targets:
+            return None
+        
+        own_session = session is None
+        if own_session:
+            session = PDFDocumentSession(pdf_path)
         try:
-            logger.info(f"Converting PDF to images using PyMuPDF: {pdf_path}")
-            from PIL import Image
-            doc = fitz.open(pdf_path)
-            images = []
+            page_count = session.page_count
+            selected = parse_page_ranges(pages, page_count) if pages else set(range(1, page_count + 1))
+            index = PageTextIndex.from_session(session, selected) if targets else None
+        finally:
+            if own_session:
+                session.close()
+        
+        if targets:
+            if index.has_text:
+                selected = index.resolve(targets, self.target_neighbour_pages, allowed=selected)
+            else:
+                logger.warning("PDF has no text layer - page targets ignored, processing the page range")
+        
+        logger.info(f"Selected {len(selected)} of {page_count} pages: {sorted(selected)}")
+        return selected
+    
+    def analyze_page_ink(self, pix) -> Dict:
+        """
+        Measure ink coverage and variance of a page from a low-resolution grayscale render
+        
+        Args:
+            pix: Grayscale PyMuPDF pixmap of the page, or its pixels as a 2-D array
             
-            logger.info(f"PDF has {len(doc)} pages")
+        Returns:
+            Dictionary with ink coverage, standard deviation and blank flag
+        """
+        gray = pix if isinstance(pix, np.ndarray) else self.pixmap_gray(pix)
+        
+        ink_coverage = float(np.count_nonzero(gray < self.blank_ink_level)) / gray.size if gray.size else 0.0
+        ink_std = float(gray.std()) if gray.size else 0.0
+        
+        return {
+            "ink_coverage": ink_coverage,
+            "ink_std": ink_std,
+            "is_blank": ink_coverage < self.blank_ink_threshold and ink_std < self.blank_std_threshold
+        }
+    
+    def pixmap_gray(self, pix) -> np.ndarray:
+        """View a grayscale pixmap as a 2-D uint8 array (no PNG round trip, no copy)"""
+        samples = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+        return samples.reshape(pix.height, pix.stride)[:, :pix.width]
+    
+    def detect_blank_pages(self, pdf_path: str, page_numbers: Optional[set] = None,
+                           session: Optional[PDFDocumentSession] = None) -> Dict[int, Dict]:
+        """
+        Find blank and near-blank pages (separators, blank versos, signature-only pages)
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+            page_numbers (set): 1-based page numbers to check, None checks every page
+            session (PDFDocumentSession): Open document session to reuse, opened here if None
             
-            for page_num in range(len(doc)):
-                logger.info(f"Processing page {page_num + 1}/{len(doc)}")
-                page = doc.load_page(page_num)
-                # Convert to image with higher DPI for better text recognition
-                mat = fitz.Matrix(3.0, 3.0)  # 3x zoom = 216 DPI for better accuracy
-                pix = page.get_pixmap(matrix=mat, alpha=False)  # No alpha for cleaner text
-                img_data = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_data))
+        Returns:
+            Dictionary mapping 1-based page number to ink statistics for pages to skip
+        """
+        return self.scan_pages(pdf_path, page_numbers, session)[0]
+    
+    def scan_pages(self, pdf_path: str, page_numbers: Optional[set] = None,
+                   session: Optional[PDFDocumentSession] = None):
+        """
+        Find blank pages and repeated pages from one low-resolution render per page
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+            page_numbers (set): 1-based page numbers to check, None checks every page
+            session (PDFDocumentSession): Open document session to reuse, opened here if None
+            
+        Returns:
+            Tuple of (blank pages: page number -> ink statistics,
+                      duplicate pages: page number -> earlier identical page number)
+        """
+        blank_pages = {}
+        duplicate_pages = {}
+        if not self.skip_blank_pages and not self.dedupe_pages:
+            return blank_pages, duplicate_pages
+        
+        own_session = session is None
+        try:
+            if own_session:
+                session = PDFDocumentSession(pdf_path)
+            duplicate_index = DuplicatePageIndex(self.blank_ink_level, self.duplicate_max_diff_pixels, session.text)
+            for page_num in range(1, session.page_count + 1):
+                if page_numbers is not None and page_num not in page_numbers:
+                    continue
+                pix = session.render(page_num, self.blank_page_zoom, fitz.csGRAY)
+                gray = self.pixmap_gray(pix)
                 
-                # Convert to RGB if needed for better processing
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
+                if self.skip_blank_pages:
+                    stats = self.analyze_page_ink(gray)
+                    # Any text layer means content, however little ink it renders to
+                    if stats["is_blank"] and not session.text(page_num).strip():
+                        blank_pages[page_num] = stats
+                        logger.info(f"Page {page_num} looks blank "
+                                    f"(ink {stats['ink_coverage']:.2%}, std {stats['ink_std']:.1f}) - skipping")
+                        continue
                 
-                logger.info(f"Page {page_num + 1} converted to image: {img.size}")
-                images.append(img)
+                if self.dedupe_pages:
+                    original = duplicate_index.add(page_num, gray)
+                    if original is not None:
+                        duplicate_pages[page_num] = original
+                        logger.info(f"Page {page_num} repeats page {original} - reusing its extraction")
+        except Exception as e:
+            logger.warning(f"Page scan failed, processing all pages: {e}")
+            return {}, {}
+        finally:
+            if own_session and session is not None:
+                session.close()
+        
+        if blank_pages:
+            logger.info(f"Skipping {len(blank_pages)} blank pages: {sorted(blank_pages)}")
+        return blank_pages, duplicate_pages
+    
+    def iter_page_images_pymupdf(self, pdf_path: str, skip_pages: Optional[set] = None,
+                                 session: Optional[PDFDocumentSession] = None):
+        """
+        Render PDF pages one at a time using PyMuPDF with enhanced quality
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+            skip_pages (set): 1-based page numbers not to render (None is yielded in their place)
+            session (PDFDocumentSession): Open document session to reuse, opened here if None
             
-            doc.close()
-            logger.info(f"Successfully converted {len(images)} pages to images")
+        Yields:
+            (page_number, PIL Image or None) tuples in page order
+        """
+        from PIL import Image
+        skip_pages = skip_pages or set()
+        own_session = session is None
+        if own_session:
+            session = PDFDocumentSession(pdf_path)
+        
+        try:
+            page_count = session.page_count
+            logger.info(f"PDF has {page_count} pages")
+            next_page = 1
+            
+            pages_to_render = [page_num for page_num in range(1, page_count + 1) if page_num not in skip_pages]
+            if self.render_workers > 1 and len(pages_to_render) >= self.render_pool_min_pages:
+                try:
+                    pool = RenderPool(workers=self.render_workers, max_pages_in_flight=self.render_pages_in_flight)
+                    for page_num, img in pool.render(pdf_path, pages_to_render, self.render_zoom):
+                        while next_page < page_num:
+                            yield next_page, None
+                            next_page += 1
+                        logger.info(f"Page {page_num} converted to image: {img.size}")
+                        yield page_num, img
+                        next_page = page_num + 1
+                except Exception as e:
+                    logger.warning(f"Render pool failed, rendering remaining pages in-process: {e}")
+            
+            for page_num in range(next_page, page_count + 1):
+                if page_num in skip_pages:
+                    yield page_num, None
+                    continue
+                
+                logger.info(f"Processing page {page_num}/{page_count}")
+                # Convert to image with higher DPI for better text recognition
+                pix = session.render(page_num, self.render_zoom)  # No alpha for cleaner text
+                img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride)
+                pix = None
+                session.release_page(page_num)
+                
+                logger.info(f"Page {page_num} converted to image: {img.size}")
+                yield page_num, img
+        finally:
+            if own_session:
+                session.close()
+    
+    def pdf_to_images_pymupdf(self, pdf_path: str, skip_pages: Optional[set] = None) -> List[any]:
+        """
+        Convert PDF pages to images using PyMuPDF with enhanced quality
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+            skip_pages (set): 1-based page numbers not to render (None is returned in their place)
+            
+        Returns:
+            List of PIL Image objects
+        """
+        try:
+            logger.info(f"Converting PDF to images using PyMuPDF: {pdf_path}")
+            images = [img for _, img in self.iter_page_images_pymupdf(pdf_path, skip_pages)]
+            logger.info(f"Successfully converted {sum(img is not None for img in images)} pages to images")
             return images
             
         except Exception as e:
             logger.error(f"Error converting PDF to images with PyMuPDF: {e}")
             return []
     
-    def pdf_to_images_pdf2image(self, pdf_path: str) -> List[any]:
+    def pdf_to_images_pdf2image(self, pdf_path: str, skip_pages: Optional[set] = None) -> List[any]:
         """
         Convert PDF pages to images using pdf2image
         
         Args:
             pdf_path (str): Path to the PDF file
+            skip_pages (set): 1-based page numbers to drop (None is returned in their place)
             
         Returns:
             List of PIL Image objects
@@ -306,18 +720,22 @@ class PDFTableExtractor:
             
             logger.info(f"Converting PDF to images using pdf2image: {pdf_path}")
             images = convert_from_path(pdf_path, dpi=200)
+            if skip_pages:
+                images = [None if page_num in skip_pages else image
+                          for page_num, image in enumerate(images, 1)]
             logger.info(f"Successfully converted {len(images)} pages using pdf2image")
             return images
         except Exception as e:
             logger.error(f"Error converting PDF to images with pdf2image: {e}")
             return []
     
-    def pdf_to_images(self, pdf_path: str) -> List[any]:
+    def pdf_to_images(self, pdf_path: str, skip_pages: Optional[set] = None) -> List[any]:
         """
         Convert PDF pages to images using available method
         
         Args:
             pdf_path (str): Path to the PDF file
+            skip_pages (set): 1-based page numbers not to render (None is returned in their place)
             
         Returns:
             List of PIL Image objects
@@ -325,7 +743,7 @@ class PDFTableExtractor:
         # Try PyMuPDF first (more reliable)
         try:
             import fitz
-            images = self.pdf_to_images_pymupdf(pdf_path)
+            images = self.pdf_to_images_pymupdf(pdf_path, skip_pages)
             if images:
                 logger.info(f"✓ Converted {len(images)} pages using PyMuPDF")
                 return images
@@ -334,7 +752,7 @@ class PDFTableExtractor:
         
         # Fallback to pdf2image if available and poppler is installed
         if PDF2IMAGE_AVAILABLE and self.check_poppler():
-            images = self.pdf_to_images_pdf2image(pdf_path)
+            images = self.pdf_to_images_pdf2image(pdf_path, skip_pages)
             if images:
                 logger.info(f"✓ Converted {len(images)} pages using pdf2image")
                 return images
@@ -342,6 +760,41 @@ class PDFTableExtractor:
         logger.error("❌ Failed to convert PDF to images. Please install PyMuPDF or pdf2image with poppler.")
         return []
     
+    def iter_page_images(self, pdf_path: str, skip_pages: Optional[set] = None,
+                         session: Optional[PDFDocumentSession] = None):
+        """
+        Render PDF pages lazily using available method
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+            skip_pages (set): 1-based page numbers not to render (None is yielded in their place)
+            session (PDFDocumentSession): Open document session to reuse
+            
+        Yields:
+            (page_number, PIL Image or None) tuples in page order
+        """
+        # Try PyMuPDF first (more reliable)
+        rendered_any = False
+        try:
+            for page in self.iter_page_images_pymupdf(pdf_path, skip_pages, session):
+                rendered_any = True
+                yield page
+            return
+        except Exception as e:
+            if rendered_any:
+                raise
+            logger.error(f"Error converting PDF to images with PyMuPDF: {e}")
+        
+        # Fallback to pdf2image if available and poppler is installed
+        if PDF2IMAGE_AVAILABLE and self.check_poppler():
+            images = self.pdf_to_images_pdf2image(pdf_path, skip_pages)
+            if images:
+                logger.info(f"✓ Converted {len(images)} pages using pdf2image")
+                yield from enumerate(images, 1)
+                return
+        
+        logger.error("❌ Failed to convert PDF to images. Please install PyMuPDF or pdf2image with poppler.")
+    
     def encode_image(self, image) -> str:
         """
         Encode PIL image to base64 string
@@ -357,7 +810,66 @@ class PDFTableExtractor:
         buffer.seek(0)
         return base64.b64encode(buffer.read()).decode('utf-8')
     
-    def create_table_extraction_prompt(self) -> str:
+    def encode_page_image(self, image, overrides: Optional[Dict] = None):
+        """
+        Encode a page image for the Gemini request using the configured encoding
+        
+        Args:
+            image: PIL Image object
+            overrides (Dict): Per-page encoding settings overriding self.image_encoding
+            
+        Returns:
+            Tuple of (inline image blob for Gemini, dictionary describing the encoded image)
+        """
+        from PIL import Image
+        
+        settings = dict(self.image_encoding)
+        if overrides:
+            settings.update(overrides)
+        settings = validate_image_encoding(settings)
+        image_format = settings["format"]
+        mode = settings["mode"]
+        
+        # Downscale to the maximum long edge
+        max_long_edge = settings.get("max_long_edge")
+        if max_long_edge and max(image.size) > max_long_edge:
+            scale = max_long_edge / max(image.size)
+            new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(new_size, Image.LANCZOS)
+        
+        # Reduce bit depth
+        if mode == "1":
+            # Plain threshold keeps glyph edges crisp, dithering would add noise around text
+            image = image.convert("L").point(lambda value: 255 if value > 160 else 0, mode="1")
+        elif image.mode != mode:
+            image = image.convert(mode)
+        
+        # JPEG cannot store 1-bit images and WebP only stores colour
+        if image_format == "JPEG" and image.mode == "1":
+            image = image.convert("L")
+        elif image_format == "WEBP" and image.mode != "RGB":
+            image = image.convert("RGB")
+        
+        save_options = {}
+        if image_format in ("JPEG", "WEBP"):
+            save_options["quality"] = settings.get("quality") or DEFAULT_IMAGE_ENCODING["quality"]
+        
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, **save_options)
+        data = buffer.getvalue()
+        
+        image_info = {
+            "format": image_format,
+            "mode": mode,
+            "width": image.width,
+            "height": image.height,
+            "bytes": len(data),
+            "image_tokens": estimate_image_tokens(image.width, image.height)
+        }
+        return {"mime_type": IMAGE_MIME_TYPES[image_format], "data": data}, image_info
+    
+    @staticmethod
+    def create_table_extraction_prompt() -> str:
         """
         Create the prompt for table extraction with enhanced title detection and Quarter/Nine Months format
         
@@ -527,16 +1039,21 @@ class PDFTableExtractor:
         """
         return prompt
     
+    def prompt_version(self) -> str:
+        """Version of the extraction prompt (see extraction_prompt_version)"""
+        return extraction_prompt_version()
+    
     def extract_tables_from_image(self, image) -> Dict:
         """
         Extract tables from a single image using Gemini with enhanced error handling
         
         Args:
-            image: PIL Image object
+            image: PIL Image object or encoded image blob from encode_page_image
             
         Returns:
             Dictionary containing extraction results
         """
+        request_started = None
         try:
             logger.info("Starting table extraction from image...")
             prompt = self.create_table_extraction_prompt()
@@ -550,108 +1067,137 @@ class PDFTableExtractor:
             }
             
             logger.info("Sending request to Gemini API...")
+            request_started = time.perf_counter()
             
-            response = self.model.generate_content(
+            response, retries = self.api_budget.call_counted(
+                self.model.generate_content,
                 [prompt, image],
                 generation_config=generation_config
             )
+            gemini_seconds = time.perf_counter() - request_started
+            
+            # Cost of this call, reported per page and in the summary
+            metadata = getattr(response, "usage_metadata", None)
+            usage = {
+                "gemini_seconds": gemini_seconds,
+                "input_tokens": (getattr(metadata, "prompt_token_count", 0) or 0) if metadata is not None else 0,
+                "output_tokens": (getattr(metadata, "candidates_token_count", 0) or 0) if metadata is not None else 0,
+                "retries": retries
+            }
+            parse_started = time.perf_counter()
+            result = self.parse_extraction_response(response)
+            usage["json_parse_seconds"] = time.perf_counter() - parse_started
+            
+            result["usage"] = usage
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error extracting tables from image: {e}")
+            logger.error(f"Error type: {type(e).__name__}")
+            import traceback
+            logger.error(f"Full traceback: {traceback.format_exc()}")
+            usage = {"gemini_seconds": time.perf_counter() - request_started} if request_started else None
+            return {"has_tables": False, "tables": [], "error": str(e), "usage": usage}
+    
+    def parse_extraction_response(self, response) -> Dict:
+        """
+        Parse and validate the JSON answer of a Gemini table extraction call
+        
+        Args:
+            response: Response returned by generate_content
+        
+        Returns:
+            Dictionary containing extraction results
+        """
+        if not response or not response.text:
+            logger.error("Empty response from Gemini API")
+            return {"has_tables": False, "tables": []}
+        
+        logger.info(f"Received response from Gemini API. Response length: {len(response.text)}")
+        
+        # Parse the JSON response with better error handling
+        response_text = response.text.strip()
+        
+        # Log first 500 characters of response for debugging
+        logger.info(f"Raw response (first 500 chars): {response_text[:500]}")
+        
+        # Multiple cleaning attempts for robust parsing
+        if response_text.startswith('```json'):
+            response_text = response_text[7:-3].strip()
+        elif response_text.startswith('```'):
+            response_text = response_text[3:-3].strip()
+        elif response_text.startswith('json'):
+            response_text = response_text[4:].strip()
+        
+        # Remove any trailing markdown
+        if response_text.endswith('```'):
+            response_text = response_text[:-3].strip()
+        
+        try:
+            result = json.loads(response_text)
+            logger.info(f"Successfully parsed JSON response")
             
-            if not response or not response.text:
-                logger.error("Empty response from Gemini API")
+            # Validate the result structure
+            if not isinstance(result, dict):
+                logger.error(f"Invalid response format: not a dictionary")
                 return {"has_tables": False, "tables": []}
             
-            logger.info(f"Received response from Gemini API. Response length: {len(response.text)}")
+            if "has_tables" not in result:
+                logger.error(f"Missing 'has_tables' key in response")
+                return {"has_tables": False, "tables": []}
             
-            # Parse the JSON response with better error handling
-            response_text = response.text.strip()
+            if result.get("has_tables") and "tables" not in result:
+                logger.error(f"Missing 'tables' key when has_tables is true")
+                return {"has_tables": False, "tables": []}
             
-            # Log first 500 characters of response for debugging
-            logger.info(f"Raw response (first 500 chars): {response_text[:500]}")
+            # Log table detection results
+            has_tables = result.get("has_tables", False)
+            table_count = len(result.get("tables", []))
+            logger.info(f"Table detection result: has_tables={has_tables}, table_count={table_count}")
             
-            # Multiple cleaning attempts for robust parsing
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3].strip()
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3].strip()
-            elif response_text.startswith('json'):
-                response_text = response_text[4:].strip()
+            # Validate each table structure
+            if result.get("has_tables") and result.get("tables"):
+                valid_tables = []
+                for i, table in enumerate(result["tables"]):
+                    if not isinstance(table, dict):
+                        logger.warning(f"Table {i+1}: Invalid table format")
+                        continue
+                    
+                    # Ensure required keys exist
+                    if "headers" not in table:
+                        table["headers"] = []
+                    if "data" not in table:
+                        table["data"] = []
+                    if "title" not in table:
+                        table["title"] = None
+                    
+                    # Log table details
+                    logger.info(f"Table {i+1}: title='{table.get('title', 'No title')}', headers={len(table.get('headers', []))}, data_rows={len(table.get('data', []))}")
+                    
+                    valid_tables.append(table)
+                
+                result["tables"] = valid_tables
+                logger.info(f"Validated {len(valid_tables)} tables")
             
-            # Remove any trailing markdown
-            if response_text.endswith('```'):
-                response_text = response_text[:-3].strip()
+            return result
+        
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON parsing error: {e}")
+            logger.error(f"Raw response (first 1000 chars): {response_text[:1000]}")
             
+            # Attempt to fix common JSON issues
             try:
-                result = json.loads(response_text)
-                logger.info(f"Successfully parsed JSON response")
-                
-                # Validate the result structure
-                if not isinstance(result, dict):
-                    logger.error(f"Invalid response format: not a dictionary")
-                    return {"has_tables": False, "tables": []}
-                
-                if "has_tables" not in result:
-                    logger.error(f"Missing 'has_tables' key in response")
-                    return {"has_tables": False, "tables": []}
-                
-                if result.get("has_tables") and "tables" not in result:
-                    logger.error(f"Missing 'tables' key when has_tables is true")
-                    return {"has_tables": False, "tables": []}
-                
-                # Log table detection results
-                has_tables = result.get("has_tables", False)
-                table_count = len(result.get("tables", []))
-                logger.info(f"Table detection result: has_tables={has_tables}, table_count={table_count}")
-                
-                # Validate each table structure
-                if result.get("has_tables") and result.get("tables"):
-                    valid_tables = []
-                    for i, table in enumerate(result["tables"]):
-                        if not isinstance(table, dict):
-                            logger.warning(f"Table {i+1}: Invalid table format")
-                            continue
-                        
-                        # Ensure required keys exist
-                        if "headers" not in table:
-                            table["headers"] = []
-                        if "data" not in table:
-                            table["data"] = []
-                        if "title" not in table:
-                            table["title"] = None
-                        
-                        # Log table details
-                        logger.info(f"Table {i+1}: title='{table.get('title', 'No title')}', headers={len(table.get('headers', []))}, data_rows={len(table.get('data', []))}")
-                        
-                        valid_tables.append(table)
-                    
-                    result["tables"] = valid_tables
-                    logger.info(f"Validated {len(valid_tables)} tables")
+                # Try to fix incomplete JSON
+                if not response_text.endswith('}') and not response_text.endswith(']'):
+                    response_text += '}'
                 
+                # Try parsing again
+                result = json.loads(response_text)
+                logger.info("Successfully recovered from JSON error")
                 return result
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parsing error: {e}")
-                logger.error(f"Raw response (first 1000 chars): {response_text[:1000]}")
-                
-                # Attempt to fix common JSON issues
-                try:
-                    # Try to fix incomplete JSON
-                    if not response_text.endswith('}') and not response_text.endswith(']'):
-                        response_text += '}'
-                    
-                    # Try parsing again
-                    result = json.loads(response_text)
-                    logger.info("Successfully recovered from JSON error")
-                    return result
-                except:
-                    logger.error(f"Failed to recover from JSON error")
-                    return {"has_tables": False, "tables": []}
-                
-        except Exception as e:
-            logger.error(f"Error extracting tables from image: {e}")
-            logger.error(f"Error type: {type(e).__name__}")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
-            return {"has_tables": False, "tables": []}
+            except:
+                logger.error(f"Failed to recover from JSON error")
+                return {"has_tables": False, "tables": []}
     
     def save_table_to_csv(self, table_data: Dict, page_num: int, table_num: int, pdf_name: str) -> str:
         """
@@ -669,19 +1215,7 @@ class PDFTableExtractor:
         try:
             # Create filename based on the actual extracted title
             title = table_data.get('title', '')
-            if title:
-                # Clean title for filename - remove special characters but keep structure
-                safe_filename = re.sub(r'[<>:"/\\|?*]', '', title)  # Remove only Windows invalid chars
-                safe_filename = safe_filename.replace('(Rs. In Lakhs)', '').strip()  # Remove currency part
-                safe_filename = re.sub(r'\s+', ' ', safe_filename)  # Normalize spaces
-                
-                # Use the cleaned title as filename
-                filename = f"{safe_filename}.csv"
-            else:
-                # Fallback filename
-                filename = f"{pdf_name}_page{page_num}_table{table_num}_Table.csv"
-            
-            filepath = self.output_dir / filename
+            filepath = self.table_file_path(title, f"{pdf_name}_page{page_num}_table{table_num}_Table", "csv")
             
             # Get headers and data
             headers = table_data.get('headers', [])
@@ -691,74 +1225,13 @@ class PDFTableExtractor:
                 logger.warning(f"No data found in table: {table_data.get('title', 'Unknown')}")
                 return None
             
-            # Fix data to prevent Excel #NAME? errors
-            def fix_excel_formula_issues(cell_value):
-                """Fix cell values that might be interpreted as formulas by Excel"""
-                if isinstance(cell_value, str):
-                    # If text starts with dash and contains letters, add single quote to prevent formula interpretation
-                    if cell_value.startswith('-') and any(c.isalpha() for c in cell_value):
-                        return f"'{cell_value}"
-                    # If text starts with = or +, add single quote
-                    elif cell_value.startswith(('=', '+')):
-                        return f"'{cell_value}"
-                return cell_value
-            
-            # Apply fix to all data
-            fixed_data = []
-            for row in data:
-                fixed_row = [fix_excel_formula_issues(cell) for cell in row]
-                fixed_data.append(fixed_row)
-            
-            # Handle column mismatch between headers and data
-            if headers and fixed_data:
-                # Find the maximum number of columns in the data
-                max_data_cols = max(len(row) for row in fixed_data) if fixed_data else 0
-                
-                # Adjust headers to match data columns
-                if len(headers) > max_data_cols:
-                    # Too many headers - truncate headers
-                    headers = headers[:max_data_cols]
-                    logger.info(f"  Adjusted headers: reduced from {len(table_data.get('headers', []))} to {len(headers)} columns")
-                elif len(headers) < max_data_cols:
-                    # Too few headers - add generic column names
-                    for i in range(len(headers), max_data_cols):
-                        headers.append(f"Column_{i+1}")
-                    logger.info(f"  Adjusted headers: expanded from {len(table_data.get('headers', []))} to {len(headers)} columns")
-                
-                # Ensure all data rows have the same number of columns as headers
-                adjusted_data = []
-                for row in fixed_data:
-                    if len(row) > len(headers):
-                        # Too many columns in row - truncate
-                        adjusted_row = row[:len(headers)]
-                    elif len(row) < len(headers):
-                        # Too few columns in row - pad with empty strings
-                        adjusted_row = row + [''] * (len(headers) - len(row))
-                    else:
-                        adjusted_row = row
-                    adjusted_data.append(adjusted_row)
-                
-                # Create DataFrame with adjusted data
-                df = pd.DataFrame(adjusted_data, columns=headers)
-                
-            elif fixed_data:
-                # No headers provided - use data as is with generic column names
-                max_cols = max(len(row) for row in fixed_data)
-                
-                # Ensure all rows have the same number of columns
-                adjusted_data = []
-                for row in fixed_data:
-                    if len(row) < max_cols:
-                        adjusted_row = row + [''] * (max_cols - len(row))
-                    else:
-                        adjusted_row = row[:max_cols]
-                    adjusted_data.append(adjusted_row)
-                
-                df = pd.DataFrame(adjusted_data)
-                logger.info(f"  No headers provided - created table with {len(df.columns)} columns")
-            else:
+            # Escape formula-like cells and square up ragged rows and headers in one pass
+            columns, cells = normalize_table(headers, data)
+            if not cells.size:
                 logger.warning(f"No valid data found in table: {table_data.get('title', 'Unknown')}")
                 return None
+            if not headers:
+                logger.info(f"  No headers provided - created table with {len(columns)} columns")
             
             # Save to CSV with title at the top
             with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
@@ -769,11 +1242,11 @@ class PDFTableExtractor:
                     csvfile.write('\n')  # Empty line after title
                     logger.info(f"  Added title: {title}")
                 
-                # Write the DataFrame to CSV
-                df.to_csv(csvfile, index=False)
+                # Write the table rows
+                write_table_csv(csvfile, columns, cells, typed=self.typed_export)
             
             logger.info(f"✓ Saved table: {filepath}")
-            logger.info(f"  Final table size: {len(df)} rows × {len(df.columns)} columns")
+            logger.info(f"  Final table size: {cells.shape[0]} rows × {cells.shape[1]} columns")
             
             return str(filepath)
             
@@ -785,12 +1258,25 @@ class PDFTableExtractor:
                 logger.error(f"  Max columns in data: {max(len(row) for row in table_data.get('data', []))}")
             return None
     
-    def process_pdf(self, pdf_path: str) -> Dict:
+    def process_pdf(self, pdf_path: str, page_encodings: Optional[Dict[int, Dict]] = None,
+                    pages: Optional[str] = None, targets: Optional[List[str]] = None,
+                    table_sink: Optional[Callable[[Dict], None]] = None) -> Dict:
         """
         Process entire PDF and extract all tables
         
+        Pages flow through render -> encode -> extract -> write stages connected by
+        bounded queues, so rendering the next pages overlaps with the Gemini call for
+        the current one and finished table groups are written while extraction runs.
+        
         Args:
             pdf_path (str): Path to PDF file
+            page_encodings (Dict): Optional image encoding overrides keyed by 1-based page number
+            pages (str): Optional page ranges to process, e.g. "1-5, 12, 40-"
+            targets (List[str]): Optional keyword phrases or "re:" regexes; only matching pages
+                and their continuation pages are processed
+            table_sink (Callable): Optional callback receiving each finished table as a
+                record (see table_export.table_record) instead of writing files; no output
+                directory, CSV or Parquet files are created
             
         Returns:
             Dictionary with processing results
@@ -801,15 +1287,256 @@ class PDFTableExtractor:
         if not pdf_path.exists():
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
         
-        # Setup output directory based on PDF title
-        self.setup_output_directory(str(pdf_path))
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {self.output_format} (expected one of {', '.join(OUTPUT_FORMATS)})")
+        if self.output_format == "parquet" and not PYARROW_AVAILABLE:
+            raise Exception("Parquet output requires pyarrow: pip install pyarrow")
+        
+        # Bad encoding settings fail here once, not on every page
+        validate_image_encoding(self.image_encoding)
+        for overrides in (page_encodings or {}).values():
+            validate_image_encoding(dict(self.image_encoding, **overrides))
+        
+        # One open document serves title detection, page selection and rendering
+        try:
+            with PDFDocumentSession(str(pdf_path)) as session:
+                results = self._process_document(session, pdf_path, page_encodings or {}, pages, targets, table_sink)
+        except Exception as e:
+            if self.observers:
+                self._notify("document_finished", None, e)
+            raise
+        if self.observers:
+            self._notify("document_finished", results, None)
+        return results
+    
+    def add_observer(self, observer: ExtractionObserver):
+        """
+        Register an observer of process_pdf events (see observers.py)
+        
+        Args:
+            observer (ExtractionObserver): Observer receiving the hooks it overrides
+        """
+        self.observers.append(observer)
+    
+    def _notify(self, event: str, *args):
+        """Call one hook on every observer; a failing observer never stops extraction"""
+        for observer in self.observers:
+            try:
+                getattr(observer, event)(*args)
+            except Exception as e:
+                logger.warning(f"Observer {type(observer).__name__}.{event} failed: {e}")
+    
+    def _process_document(self, session: PDFDocumentSession, pdf_path: Path, page_encodings: Dict,
+                          pages: Optional[str], targets: Optional[List[str]],
+                          table_sink: Optional[Callable[[Dict], None]]) -> Dict:
+        """
+        Run the extraction pipeline over an open document (see process_pdf)
+        """
+        # Seconds spent per stage; stages run concurrently, so they add up to
+        # more than the wall-clock total
+        document_started = time.perf_counter()
+        if self.observers:
+            self._notify("document_started", str(pdf_path), session.page_count)
+        timings = dict.fromkeys(("title_extraction", "page_selection", "page_scan", "render", "encode",
+                                 "gemini", "json_parse", "grouping", "table_write"), 0.0)
         
         pdf_name = pdf_path.stem
         logger.info(f"Processing PDF: {pdf_name}")
         
-        # Convert PDF to images
-        images = self.pdf_to_images(str(pdf_path))
-        if not images:
+        # Restrict processing to the requested pages - before anything is created,
+        # so a selection without pages leaves no empty output directory behind
+        started = time.perf_counter()
+        try:
+            selected_pages = self.select_pages(str(pdf_path), pages, targets, session)
+        except ValueError as e:
+            return self._page_selection_error(pdf_name, str(e), session.page_count)
+        if selected_pages is not None and not selected_pages:
+            return self._page_selection_error(pdf_name, NO_PAGES_SELECTED_ERROR, session.page_count)
+        timings["page_selection"] = time.perf_counter() - started
+        
+        # Setup output directory based on PDF title (tables handed to a sink need none)
+        if table_sink is None:
+            started = time.perf_counter()
+            self.setup_output_directory(str(pdf_path), session)
+            timings["title_extraction"] = time.perf_counter() - started
+        
+        # Find blank pages on cheap low-resolution renders before the full render
+        # and find repeated pages whose extraction can be reused
+        started = time.perf_counter()
+        blank_pages, duplicate_pages = self.scan_pages(str(pdf_path), selected_pages, session)
+        timings["page_scan"] = time.perf_counter() - started
+        session.release_text_cache()
+        
+        # Pages extracted by an interrupted earlier run are not rendered or sent again
+        checkpoint = None
+        restored_pages = {}
+        if self.checkpoint_dir:
+            checkpoint = ExtractionCheckpoint(self.checkpoint_dir, file_sha256(str(pdf_path)), self.prompt_version())
+            restored_pages = checkpoint.load()
+        
+        
+        results = {
+            "pdf_name": pdf_name,
+            "source_pdf": pdf_path.name,
+            "output_directory": str(self.output_dir) if table_sink is None else None,
+            "total_pages": 0,
+            "pages_with_tables": 0,
+            "total_tables_extracted": 0,
+            "pages_skipped": 0,
+            "pages_restored": 0,
+            "pages_deduplicated": 0,
+            "image_bytes_sent": 0,
+            "image_tokens": 0,
+            "gemini_requests": 0,
+            "gemini_input_tokens": 0,
+            "gemini_output_tokens": 0,
+            "gemini_retries": 0,
+            "timings": timings,
+            "selected_pages": sorted(selected_pages) if selected_pages is not None else None,
+            "output_format": self.output_format,
+            "csv_files": [],
+            "page_results": [],
+            "extracted_titles": []  # Track extracted titles
+        }
+        
+        # Open table groups, indexed by normalized title for combining
+        group_index = TableGroupIndex(self.continuation_window)
+        
+        stop = threading.Event()
+        rendered_queue = queue.Queue(maxsize=self.pipeline_depth)
+        encoded_queue = queue.Queue(maxsize=self.pipeline_depth)
+        write_queue = queue.Queue(maxsize=self.pipeline_depth)
+        write_errors = []
+        
+        def render_stage():
+            try:
+                skip_pages = set(blank_pages) | set(restored_pages) | set(duplicate_pages)
+                if selected_pages is not None:
+                    skip_pages |= set(range(1, session.page_count + 1)) - selected_pages
+                render_started = time.perf_counter()
+                for page_num, image in self.iter_page_images(str(pdf_path), skip_pages, session):
+                    render_seconds = None
+                    if image is not None:
+                        render_seconds = time.perf_counter() - render_started
+                        timings["render"] += render_seconds
+                        if self.observers:
+                            self._notify("page_rendered", page_num, render_seconds, *image.size)
+                    if selected_pages is None or page_num in selected_pages:
+                        if not _put_until_stopped(rendered_queue, (page_num, image, render_seconds), stop):
+                            return
+                    render_started = time.perf_counter()
+            except Exception as e:
+                _put_until_stopped(rendered_queue, _StageError(e), stop)
+                return
+            _put_until_stopped(rendered_queue, _PIPELINE_END, stop)
+        
+        def encode_stage():
+            while True:
+                item = _get_until_stopped(rendered_queue, stop)
+                if item is _PIPELINE_END or isinstance(item, _StageError):
+                    _put_until_stopped(encoded_queue, item, stop)
+                    return
+                
+                page_num, image, render_seconds = item
+                encoded = {"page_number": page_num, "image_blob": None, "image_info": None, "error": None,
+                           "timings": {}}
+                if page_num in duplicate_pages:
+                    encoded["duplicate_of"] = duplicate_pages[page_num]
+                elif page_num in restored_pages:
+                    encoded["restored"] = restored_pages[page_num]
+                elif image is not None:
+                    started = time.perf_counter()
+                    try:
+                        encoded["image_blob"], encoded["image_info"] = self.encode_page_image(image, page_encodings.get(page_num))
+                    except Exception as e:
+                        encoded["error"] = e
+                    encode_seconds = time.perf_counter() - started
+                    timings["encode"] += encode_seconds
+                    encoded["timings"] = {"render": render_seconds, "encode": encode_seconds}
+                if not _put_until_stopped(encoded_queue, encoded, stop):
+                    return
+        
+        def write_stage():
+            while True:
+                item = _get_until_stopped(write_queue, stop)
+                if item is _PIPELINE_END:
+                    return
+                started = time.perf_counter()
+                try:
+                    if table_sink is not None:
+                        table_path = self._emit_combined_table(item[0], item[1], results, table_sink)
+                    else:
+                        table_path = self._write_combined_table(item[0], item[1], pdf_name, results)
+                    write_seconds = time.perf_counter() - started
+                    timings["table_write"] += write_seconds
+                    if self.observers:
+                        self._notify("file_written", table_path, item[1], write_seconds)
+                except Exception as e:
+                    # e.g. the sink's consumer went away - nothing more can be delivered
+                    write_errors.append(e)
+                    stop.set()
+                    return
+        
+        stage_threads = [
+            threading.Thread(target=render_stage, name="pdf-render", daemon=True),
+            threading.Thread(target=encode_stage, name="pdf-encode", daemon=True),
+            threading.Thread(target=write_stage, name="pdf-write", daemon=True)
+        ]
+        for thread in stage_threads:
+            thread.start()
+        
+        # Futures of pages repeated later in the document, shared with their duplicates
+        original_pages = set(duplicate_pages.values())
+        original_futures = {}
+        
+        try:
+            in_flight = deque()
+            with ThreadPoolExecutor(max_workers=self.extract_workers, thread_name_prefix="pdf-extract") as executor:
+                while True:
+                    item = _get_until_stopped(encoded_queue, stop)
+                    if item is _PIPELINE_END:
+                        break
+                    if isinstance(item, _StageError):
+                        raise item.error
+                    
+                    future = None
+                    if item.get("duplicate_of") is not None:
+                        future = original_futures.get(item["duplicate_of"])
+                        if future is None:
+                            item["error"] = Exception(f"Repeats page {item['duplicate_of']}, which was not extracted")
+                    elif item.get("restored") is not None:
+                        future = Future()
+                        future.set_result(item["restored"]["extraction"])
+                    elif item["image_blob"] is not None:
+                        future = executor.submit(self._extract_page, item, checkpoint)
+                    if future is not None and item["page_number"] in original_pages:
+                        original_futures[item["page_number"]] = future
+                    in_flight.append((item, future))
+                    
+                    # Pages are grouped strictly in page order so continuations line up
+                    while len(in_flight) >= self.extract_workers:
+                        self._finish_page(*in_flight.popleft(), blank_pages, group_index, results, write_queue, stop)
+                
+                while in_flight:
+                    self._finish_page(*in_flight.popleft(), blank_pages, group_index, results, write_queue, stop)
+            
+            # Everything still open is finished once the last page is in
+            for closed_group in group_index.close_all():
+                _put_until_stopped(write_queue, closed_group, stop)
+            _put_until_stopped(write_queue, _PIPELINE_END, stop)
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            for thread in stage_threads:
+                thread.join()
+            if checkpoint is not None:
+                checkpoint.close()
+        
+        if write_errors:
+            raise write_errors[0]
+        
+        if results["total_pages"] == 0:
             logger.error("Failed to convert PDF to images")
             return {
                 "error": "Failed to convert PDF to images",
@@ -817,139 +1544,294 @@ class PDFTableExtractor:
                 "total_pages": 0,
                 "pages_with_tables": 0,
                 "total_tables_extracted": 0,
+                "pages_skipped": 0,
                 "csv_files": [],
                 "page_results": []
             }
         
-        results = {
+        # Keep the checkpoint while any page failed, so the next run retries only those
+        results["pages_failed"] = [page["page_number"] for page in results["page_results"] if page.get("error")]
+        if checkpoint is not None:
+            if results["pages_failed"]:
+                logger.warning(f"⚠️ {len(results['pages_failed'])} page(s) failed: {results['pages_failed']} - "
+                               f"keeping checkpoint {checkpoint.path.name} to retry them")
+            else:
+                checkpoint.remove()
+        
+        timings["total"] = time.perf_counter() - document_started
+        
+        logger.info(f"\n=== PDF processing complete ===")
+        logger.info(f"Total tables extracted: {results['total_tables_extracted']}")
+        logger.info(f"{self.output_format.upper()} files created: {len(results['csv_files'])}")
+        
+        return results
+    
+    def _page_selection_error(self, pdf_name: str, error: str, page_count: int) -> Dict:
+        """
+        Result of a document whose pages/targets selected nothing to extract
+        
+        Args:
+            pdf_name (str): Name of the PDF without extension
+            error (str): Why no pages were selected
+            page_count (int): Pages in the document
+            
+        Returns:
+            Dictionary with the error and error_type "page_selection"
+        """
+        logger.error(f"❌ {error}")
+        return {
+            "error": error,
+            "error_type": "page_selection",
             "pdf_name": pdf_name,
-            "output_directory": str(self.output_dir),
-            "total_pages": len(images),
+            "document_pages": page_count,
+            "total_pages": 0,
             "pages_with_tables": 0,
             "total_tables_extracted": 0,
+            "pages_skipped": 0,
             "csv_files": [],
-            "page_results": [],
-            "extracted_titles": []  # Track extracted titles
+            "page_results": []
         }
+    
+    def _finish_page(self, page: Dict, future, blank_pages: Dict, group_index: TableGroupIndex,
+                     results: Dict, write_queue: queue.Queue, stop: threading.Event):
+        """
+        Group the tables of one extracted page and hand finished groups to the writer
         
-        # Dictionary to store tables by title for combining
-        tables_by_title = {}
+        Args:
+            page (Dict): Encoded page from the encode stage
+            future: Future of the Gemini call, None when the page was not sent
+            blank_pages (Dict): Ink statistics of skipped blank pages
+            group_index (TableGroupIndex): Open table groups
+            results (Dict): Processing results being accumulated
+            write_queue (queue.Queue): Queue feeding the write stage
+            stop (threading.Event): Set when the pipeline is shutting down
+        """
+        page_num = page["page_number"]
+        results["total_pages"] += 1
+        logger.info(f"\n=== Processing page {page_num} ===")
+        
+        if future is None and page["error"] is None:
+            # Blank page - no render, no API call
+            stats = blank_pages.get(page_num, {})
+            results["pages_skipped"] += 1
+            results["page_results"].append(PageResult(
+                page_num,
+                skipped="blank",
+                ink_coverage=stats.get("ink_coverage"),
+                ink_std=stats.get("ink_std")
+            ))
+            if self.observers:
+                self._notify("page_finished", results["page_results"][-1])
+            # Blank pages do not count towards the continuation window
+            return
         
-        # Process each page
-        for page_num, image in enumerate(images, 1):
-            logger.info(f"\n=== Processing page {page_num}/{len(images)} ===")
+        try:
+            if page["error"] is not None:
+                raise page["error"]
             
-            try:
-                # Extract tables from current page
-                extraction_result = self.extract_tables_from_image(image)
+            if page.get("duplicate_of") is not None:
+                # Identical to an earlier page - its extraction is reused
+                image_info = None
+                results["pages_deduplicated"] += 1
+                logger.info(f"  Page {page_num} repeats page {page['duplicate_of']}, reusing its extraction")
+            elif page.get("restored") is not None:
+                # Extracted by an earlier run, nothing sent this time
+                image_info = page["restored"].get("image")
+                results["pages_restored"] += 1
+                logger.info(f"  Restored page {page_num} from checkpoint")
+            else:
+                image_info = page["image_info"]
+                results["image_bytes_sent"] += image_info["bytes"]
+                results["image_tokens"] += image_info["image_tokens"]
+                logger.info(f"  Encoded page as {image_info['format']} {image_info['mode']} "
+                            f"{image_info['width']}x{image_info['height']}: "
+                            f"{image_info['bytes']} bytes, ~{image_info['image_tokens']} image tokens")
+            
+            extraction_result = future.result()
+            if page.get("duplicate_of") is not None:
+                # Table groups keep (and intern in place) the rows they are given
+                extraction_result = copy.deepcopy(extraction_result)
+            
+            # Only calls made for this page in this run count towards its cost
+            page_timings = dict(page.get("timings") or {})
+            usage = None
+            if page.get("duplicate_of") is None and page.get("restored") is None:
+                usage = extraction_result.get("usage")
+            if usage:
+                page_timings["gemini"] = usage.get("gemini_seconds", 0.0)
+                page_timings["json_parse"] = usage.get("json_parse_seconds", 0.0)
+                results["gemini_requests"] += 1
+                results["gemini_input_tokens"] += usage.get("input_tokens", 0)
+                results["gemini_output_tokens"] += usage.get("output_tokens", 0)
+                results["gemini_retries"] += usage.get("retries", 0)
+                results["timings"]["gemini"] += page_timings["gemini"]
+                results["timings"]["json_parse"] += page_timings["json_parse"]
+            
+            page_result = PageResult(
+                page_num,
+                has_tables=extraction_result.get("has_tables", False),
+                tables_count=len(extraction_result.get("tables", [])),
+                image=image_info,
+                error=extraction_result.get("error"),
+                duplicate_of=page.get("duplicate_of"),
+                timings=page_timings,
+                usage=usage
+            )
+            
+            if extraction_result.get("has_tables", False):
+                results["pages_with_tables"] += 1
+                tables = extraction_result.get("tables", [])
                 
-                page_result = {
-                    "page_number": page_num,
-                    "has_tables": extraction_result.get("has_tables", False),
-                    "tables_count": len(extraction_result.get("tables", [])),
-                    "tables": []
-                }
+                logger.info(f"Found {len(tables)} table(s) on page {page_num}")
                 
-                if extraction_result.get("has_tables", False):
-                    results["pages_with_tables"] += 1
-                    tables = extraction_result.get("tables", [])
+                for table_num, table_data in enumerate(tables, 1):
+                    title = table_data.get('title', 'Untitled Table')
+                    logger.info(f"  Table {table_num}: {title}")
                     
-                    logger.info(f"Found {len(tables)} table(s) on page {page_num}")
+                    # Track extracted titles
+                    if table_data.get('title'):
+                        results["extracted_titles"].append(intern_text(table_data.get('title')))
                     
-                    for table_num, table_data in enumerate(tables, 1):
-                        title = table_data.get('title', 'Untitled Table')
-                        logger.info(f"  Table {table_num}: {title}")
-                        
-                        # Track extracted titles
-                        if table_data.get('title'):
-                            results["extracted_titles"].append(table_data.get('title'))
-                        
-                        # Enhanced title normalization for better continuation detection
-                        normalized_title = self.normalize_title_for_grouping(title, page_num)
-                        
-                        # Group tables by normalized title
-                        if normalized_title not in tables_by_title:
-                            tables_by_title[normalized_title] = {
-                                "title": title,
-                                "headers": table_data.get('headers', []),
-                                "data": table_data.get('data', []),
-                                "pages": [page_num],
-                                "table_numbers": [table_num],
-                                "original_titles": [title]
-                            }
-                            logger.info(f"    Created new table group: {normalized_title}")
-                        else:
-                            # Combine data from continuation pages
-                            existing_table = tables_by_title[normalized_title]
-                            
-                            # Check if headers are similar (for continuation detection)
-                            if self.are_headers_compatible(existing_table["headers"], table_data.get('headers', [])):
-                                existing_table["data"].extend(table_data.get('data', []))
-                                existing_table["pages"].append(page_num)
-                                existing_table["table_numbers"].append(table_num)
-                                existing_table["original_titles"].append(title)
-                                logger.info(f"    Added continuation data to existing table: {normalized_title}")
-                                logger.info(f"    Combined data from pages: {existing_table['pages']}")
-                            else:
-                                # Different table structure, create new entry
-                                alt_normalized_title = f"{normalized_title}_v{len([k for k in tables_by_title.keys() if k.startswith(normalized_title)])+1}"
-                                tables_by_title[alt_normalized_title] = {
-                                    "title": title,
-                                    "headers": table_data.get('headers', []),
-                                    "data": table_data.get('data', []),
-                                    "pages": [page_num],
-                                    "table_numbers": [table_num],
-                                    "original_titles": [title]
-                                }
-                                logger.info(f"    Created variant table group: {alt_normalized_title}")
-                        
-                        page_result["tables"].append({
-                            "title": table_data.get("title"),
-                            "table_number": table_data.get("table_number"),
-                            "normalized_title": normalized_title,
-                            "rows": len(table_data.get("data", [])),
-                            "columns": len(table_data.get("headers", []))
-                        })
-                else:
-                    logger.info(f"  No tables found on page {page_num}")
-                
-                results["page_results"].append(page_result)
-                
-            except Exception as e:
-                logger.error(f"  Error processing page {page_num}: {e}")
-                page_result = {
-                    "page_number": page_num,
-                    "has_tables": False,
-                    "tables_count": 0,
-                    "tables": [],
-                    "error": str(e)
-                }
-                results["page_results"].append(page_result)
+                    # Enhanced title normalization for better continuation detection
+                    normalized_title = self.normalize_title_for_grouping(title, page_num)
+                    
+                    # Merge into a compatible open group or start a new one
+                    started = time.perf_counter()
+                    group_key, reason = group_index.add(normalized_title, table_data, page_num, table_num)
+                    grouping_seconds = time.perf_counter() - started
+                    page_timings["grouping"] = page_timings.get("grouping", 0.0) + grouping_seconds
+                    results["timings"]["grouping"] += grouping_seconds
+                    if self.observers:
+                        self._notify("table_grouped", page_num, table_num, group_key, reason, grouping_seconds)
+                    logger.info(f"    Table group {group_key}: {reason}")
+                    
+                    page_result.tables.append(TableSummary(
+                        table_data.get("title"),
+                        table_data.get("table_number"),
+                        normalized_title,
+                        group_key,
+                        reason,
+                        len(table_data.get("data", [])),
+                        len(table_data.get("headers", []))
+                    ))
+            else:
+                logger.info(f"  No tables found on page {page_num}")
+            
+            results["page_results"].append(page_result)
+            
+        except Exception as e:
+            logger.error(f"  Error processing page {page_num}: {e}")
+            results["page_results"].append(PageResult(page_num, error=str(e)))
+        
+        if self.observers:
+            self._notify("page_finished", results["page_results"][-1])
         
-        # Now save the combined tables
-        logger.info(f"\n=== Combining and saving tables ===")
-        for normalized_title, combined_table in tables_by_title.items():
-            logger.info(f"\nSaving combined table: {normalized_title}")
-            logger.info(f"  Pages: {combined_table['pages']}")
-            logger.info(f"  Total rows: {len(combined_table['data'])}")
+        self._close_finished_groups(page_num, group_index, write_queue, stop)
+    
+    def _extract_page(self, page: Dict, checkpoint: Optional[ExtractionCheckpoint]) -> Dict:
+        """
+        Extract the tables of an encoded page and checkpoint the result
+        
+        Args:
+            page (Dict): Encoded page from the encode stage
+            checkpoint (ExtractionCheckpoint): Checkpoint of the document, or None
             
-            # Save the combined table
-            csv_path = self.save_combined_table_to_csv(combined_table, pdf_name)
+        Returns:
+            Dictionary containing extraction results
+        """
+        if self.observers:
+            self._notify("request_sent", page["page_number"], page["image_info"])
+        extraction_result = self.extract_tables_from_image(page["image_blob"])
+        if self.observers:
+            self._notify("response_received", page["page_number"], extraction_result, extraction_result.get("usage"))
+        # Failed calls are recorded as failed, so a resumed run retries them
+        if checkpoint is not None:
+            try:
+                if "error" in extraction_result:
+                    checkpoint.record_failure(page["page_number"], extraction_result["error"])
+                else:
+                    checkpoint.record(page["page_number"], extraction_result, page["image_info"])
+            except OSError as e:
+                logger.warning(f"Could not checkpoint page {page['page_number']}: {e}")
+        return extraction_result
+    
+    def _close_finished_groups(self, page_num: int, group_index: TableGroupIndex,
+                               write_queue: queue.Queue, stop: threading.Event):
+        """
+        Hand table groups that cannot continue past this page to the writer
+        
+        Args:
+            page_num (int): Page that was just processed
+            group_index (TableGroupIndex): Open table groups
+            write_queue (queue.Queue): Queue feeding the write stage
+            stop (threading.Event): Set when the pipeline is shutting down
+        """
+        # Untitled tables are grouped per page, so they cannot continue on later pages
+        closed_groups = group_index.close_title(f"Table_Page_{page_num}")
+        # Groups without a continuation for continuation_window pages are finished too
+        closed_groups += group_index.finish_page()
+        
+        for key, combined_table in closed_groups:
+            if combined_table["pages"][-1] != page_num:
+                logger.info(f"  Closing table group {key}: no continuation since page {combined_table['pages'][-1]}")
+            _put_until_stopped(write_queue, (key, combined_table), stop)
+    
+    def _write_combined_table(self, normalized_title: str, combined_table: Dict, pdf_name: str,
+                              results: Dict) -> Optional[str]:
+        """
+        Save one finished table group and record it in the results
+        
+        Args:
+            normalized_title (str): Group key
+            combined_table (Dict): Combined table data dictionary
+            pdf_name (str): Original PDF filename
+            results (Dict): Processing results being accumulated
             
-            if csv_path:
-                results["csv_files"].append(csv_path)
-                results["total_tables_extracted"] += 1
+        Returns:
+            Path of the written table file, None if the table was empty
+        """
+        logger.info(f"\nSaving combined table: {normalized_title}")
+        logger.info(f"  Pages: {combined_table['pages']}")
+        logger.info(f"  Total rows: {len(combined_table['data'])}")
         
-        logger.info(f"\n=== PDF processing complete ===")
-        logger.info(f"Total tables extracted: {results['total_tables_extracted']}")
-        logger.info(f"CSV files created: {len(results['csv_files'])}")
+        # Save the combined table (csv_files lists the table files of either format)
+        if self.output_format == "parquet":
+            table_path = self.save_combined_table_to_parquet(combined_table, pdf_name, results.get("source_pdf"))
+        else:
+            table_path = self.save_combined_table_to_csv(combined_table, pdf_name)
         
-        return results
+        if table_path:
+            results["csv_files"].append(table_path)
+            results["total_tables_extracted"] += 1
+        return table_path
+    
+    def _emit_combined_table(self, normalized_title: str, combined_table: Dict, results: Dict,
+                             table_sink: Callable[[Dict], None]):
+        """
+        Hand one finished table group to a table sink instead of writing a file
+        
+        Args:
+            normalized_title (str): Group key
+            combined_table (Dict): Combined table data dictionary
+            results (Dict): Processing results being accumulated
+            table_sink (Callable): Callback receiving the table record
+        """
+        record = table_record(normalized_title, combined_table, results.get("source_pdf"))
+        if record is None:
+            logger.warning(f"No data found in combined table: {combined_table.get('title', '')}")
+            return
+        
+        table_sink(record)
+        results["total_tables_extracted"] += 1
+        logger.info(f"✓ Emitted combined table: {normalized_title} ({len(record['rows'])} rows)")
     
     def normalize_title_for_grouping(self, title: str, page_num: int) -> str:
         """
         Normalize title for better grouping of continuation tables
         
+        The rules (continuation markers, company/period spellings and canonical
+        statement titles) come from the title rules file - see title_rules.py.
+        
         Args:
             title (str): Original title
             page_num (int): Page number
@@ -960,54 +1842,7 @@ class PDFTableExtractor:
         if not title or title.strip() == '':
             return f"Table_Page_{page_num}"
         
-        # Remove extra spaces and normalize
-        normalized = re.sub(r'\s+', ' ', title.strip())
-        
-        # Remove common continuation indicators
-        continuation_patterns = [
-            r'\s*\(continued\)',
-            r'\s*\(contd\)',
-            r'\s*\(cont\)',
-            r'\s*continued',
-            r'\s*contd',
-            r'\s*\-\s*continued',
-            r'\s*\-\s*contd',
-            r'page\s*\d+',
-            r'sheet\s*\d+'
-        ]
-        
-        for pattern in continuation_patterns:
-            normalized = re.sub(pattern, '', normalized, flags=re.IGNORECASE)
-        
-        # Normalize company name variations and Quarter/Nine Months patterns
-        company_patterns = [
-            (r'HDFC\s+Life\s+Insurance\s+Company\s+Limited?', 'HDFC Life Insurance Company Limited'),
-            (r'LLOYDS\s+ENGINEERING\s+WORKS\s+LIMITED', 'LLOYDS ENGINEERING WORKS LIMITED'),
-            (r'Statement\s+of\s+Standalone\s+Audited\s+Results', 'Statement of Standalone Audited Results'),
-            (r'UNAUDITED\s+CONSOLIDATED\s+FINANCIAL\s+RESULTS', 'UNAUDITED CONSOLIDATED FINANCIAL RESULTS'),
-            (r'for\s+the\s+Quarter\s+and\s+Year\s+ended', 'for the Quarter and Year ended'),
-            (r'for\s+the\s+Quarter\s+&\s+Nine\s+Months\s+ended', 'for the Quarter & Nine Months ended'),
-            (r'for\s+the\s+Quarter\s+&\s+Year\s+ended', 'for the Quarter & Year ended'),
-            (r'March\s+31,?\s*2025', 'March 31, 2025'),
-            (r'December\s+31,?\s*2024', 'December 31, 2024'),
-            (r'₹\s*in\s*Lakhs?', '₹ in Lakhs'),
-            (r'Rs\.?\s*in\s*Lakhs?', 'Rs. in Lakhs')
-        ]
-        
-        for pattern, replacement in company_patterns:
-            normalized = re.sub(pattern, replacement, normalized, flags=re.IGNORECASE)
-        
-        # Handle similar financial statement titles with Quarter/Nine Months format
-        if 'financial results' in normalized.lower() or 'audited results' in normalized.lower():
-            # Group similar financial statements together
-            if 'quarter' in normalized.lower() and 'nine months' in normalized.lower():
-                # For Quarter & Nine Months format
-                if 'lloyds' in normalized.lower() and 'consolidated' in normalized.lower():
-                    normalized = "LLOYDS ENGINEERING WORKS LIMITED UNAUDITED CONSOLIDATED FINANCIAL RESULTS for the Quarter & Nine Months ended December 31, 2024"
-            elif 'hdfc' in normalized.lower() and 'standalone' in normalized.lower():
-                normalized = "HDFC Life Insurance Company Limited Statement of Standalone Audited Results for the Quarter and Year ended March 31, 2025"
-        
-        return normalized.strip()
+        return self.title_rules.normalize(title)
     
     def are_headers_compatible(self, headers1: List, headers2: List) -> bool:
         """
@@ -1020,38 +1855,40 @@ class PDFTableExtractor:
         Returns:
             bool: True if headers are compatible
         """
-        if not headers1 or not headers2:
-            return True  # Allow if one has no headers
-        
-        # Normalize headers for comparison
-        norm_headers1 = [re.sub(r'\s+', ' ', str(h).strip().lower()) for h in headers1]
-        norm_headers2 = [re.sub(r'\s+', ' ', str(h).strip().lower()) for h in headers2]
-        
-        # Check if headers are identical or very similar
-        if norm_headers1 == norm_headers2:
-            return True
+        return headers_compatible(headers1, headers2)
+    
+    def table_file_path(self, title: str, fallback_name: str, extension: str) -> Path:
+        """
+        Build the output path for a table file from its extracted title
         
-        # Check if headers have significant overlap (at least 70%)
-        if len(norm_headers1) > 0 and len(norm_headers2) > 0:
-            common_headers = set(norm_headers1) & set(norm_headers2)
-            overlap_ratio = len(common_headers) / max(len(norm_headers1), len(norm_headers2))
+        Args:
+            title (str): Extracted table title (may be empty)
+            fallback_name (str): File name (without extension) used when there is no title
+            extension (str): File extension without the dot
             
-            if overlap_ratio >= 0.7:  # 70% similarity
-                return True
-        
-        # Check if one set is a subset of the other (for partial headers)
-        if set(norm_headers1).issubset(set(norm_headers2)) or set(norm_headers2).issubset(set(norm_headers1)):
-            return True
-        
-        # Check for common financial statement header patterns including Quarter/Nine Months
-        financial_keywords = ['particulars', 'sr. no', 'march', 'december', 'audited', 'reviewed', 'quarter ended', 'nine months ended']
-        headers1_has_financial = any(keyword in ' '.join(norm_headers1) for keyword in financial_keywords)
-        headers2_has_financial = any(keyword in ' '.join(norm_headers2) for keyword in financial_keywords)
-        
-        if headers1_has_financial and headers2_has_financial:
-            return True
-        
-        return False
+        Returns:
+            Path inside the output directory
+        """
+        if title:
+            # Clean title for filename - remove special characters but keep structure
+            safe_filename = re.sub(r'[<>:"/\\|?*]', '', title)  # Remove only Windows invalid chars
+            safe_filename = safe_filename.replace('(Rs. In Lakhs)', '').strip()  # Remove currency part
+            safe_filename = re.sub(r'\s+', ' ', safe_filename)  # Normalize spaces
+            
+            # Use the cleaned title as filename
+            filename = f"{safe_filename}.{extension}"
+        else:
+            # Fallback filename
+            filename = f"{fallback_name}.{extension}"
+        
+        # Separate groups can share a title (e.g. a statement repeated later in the
+        # document) - never overwrite a table written earlier in this run
+        filepath = self.output_dir / filename
+        counter = 2
+        while filepath.exists():
+            filepath = self.output_dir / f"{Path(filename).stem} ({counter}).{extension}"
+            counter += 1
+        return filepath
     
     def save_combined_table_to_csv(self, combined_table: Dict, pdf_name: str) -> str:
         """
@@ -1067,19 +1904,7 @@ class PDFTableExtractor:
         try:
             # Create filename based on the actual extracted title
             title = combined_table.get('title', '')
-            if title:
-                # Clean title for filename - remove special characters but keep structure
-                safe_filename = re.sub(r'[<>:"/\\|?*]', '', title)  # Remove only Windows invalid chars
-                safe_filename = safe_filename.replace('(Rs. In Lakhs)', '').strip()  # Remove currency part
-                safe_filename = re.sub(r'\s+', ' ', safe_filename)  # Normalize spaces
-                
-                # Use the cleaned title as filename
-                filename = f"{safe_filename}.csv"
-            else:
-                # Fallback filename
-                filename = f"{pdf_name}_Combined_Table.csv"
-            
-            filepath = self.output_dir / filename
+            filepath = self.table_file_path(title, f"{pdf_name}_Combined_Table", "csv")
             
             # Get headers and data
             headers = combined_table.get('headers', [])
@@ -1089,74 +1914,13 @@ class PDFTableExtractor:
                 logger.warning(f"No data found in combined table: {title}")
                 return None
             
-            # Fix data to prevent Excel #NAME? errors
-            def fix_excel_formula_issues(cell_value):
-                """Fix cell values that might be interpreted as formulas by Excel"""
-                if isinstance(cell_value, str):
-                    # If text starts with dash and contains letters, add single quote to prevent formula interpretation
-                    if cell_value.startswith('-') and any(c.isalpha() for c in cell_value):
-                        return f"'{cell_value}"
-                    # If text starts with = or +, add single quote
-                    elif cell_value.startswith(('=', '+')):
-                        return f"'{cell_value}"
-                return cell_value
-            
-            # Apply fix to all data
-            fixed_data = []
-            for row in data:
-                fixed_row = [fix_excel_formula_issues(cell) for cell in row]
-                fixed_data.append(fixed_row)
-            
-            # Handle column mismatch between headers and data
-            if headers and fixed_data:
-                # Find the maximum number of columns in the data
-                max_data_cols = max(len(row) for row in fixed_data) if fixed_data else 0
-                
-                # Adjust headers to match data columns
-                if len(headers) > max_data_cols:
-                    # Too many headers - truncate headers
-                    headers = headers[:max_data_cols]
-                    logger.info(f"  Adjusted headers: reduced from original to {len(headers)} columns")
-                elif len(headers) < max_data_cols:
-                    # Too few headers - add generic column names
-                    for i in range(len(headers), max_data_cols):
-                        headers.append(f"Column_{i+1}")
-                    logger.info(f"  Adjusted headers: expanded to {len(headers)} columns")
-                
-                # Ensure all data rows have the same number of columns as headers
-                adjusted_data = []
-                for row in fixed_data:
-                    if len(row) > len(headers):
-                        # Too many columns in row - truncate
-                        adjusted_row = row[:len(headers)]
-                    elif len(row) < len(headers):
-                        # Too few columns in row - pad with empty strings
-                        adjusted_row = row + [''] * (len(headers) - len(row))
-                    else:
-                        adjusted_row = row
-                    adjusted_data.append(adjusted_row)
-                
-                # Create DataFrame with adjusted data
-                df = pd.DataFrame(adjusted_data, columns=headers)
-                
-            elif fixed_data:
-                # No headers provided - use data as is with generic column names
-                max_cols = max(len(row) for row in fixed_data)
-                
-                # Ensure all rows have the same number of columns
-                adjusted_data = []
-                for row in fixed_data:
-                    if len(row) < max_cols:
-                        adjusted_row = row + [''] * (max_cols - len(row))
-                    else:
-                        adjusted_row = row[:max_cols]
-                    adjusted_data.append(adjusted_row)
-                
-                df = pd.DataFrame(adjusted_data)
-                logger.info(f"  No headers provided - created table with {len(df.columns)} columns")
-            else:
+            # Escape formula-like cells and square up ragged rows and headers in one pass
+            columns, cells = normalize_table(headers, data)
+            if not cells.size:
                 logger.warning(f"No valid data found in combined table: {title}")
                 return None
+            if not headers:
+                logger.info(f"  No headers provided - created table with {len(columns)} columns")
             
             # Save to CSV with title at the top
             with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
@@ -1174,11 +1938,11 @@ class PDFTableExtractor:
                     csvfile.write('\n')  # Empty line after note
                     logger.info(f"  Added page info: Combined from pages {pages}")
                 
-                # Write the DataFrame to CSV
-                df.to_csv(csvfile, index=False)
+                # Write the table rows
+                write_table_csv(csvfile, columns, cells, typed=self.typed_export)
             
             logger.info(f"✓ Saved combined table: {filepath}")
-            logger.info(f"  Final combined table size: {len(df)} rows × {len(df.columns)} columns")
+            logger.info(f"  Final combined table size: {cells.shape[0]} rows × {cells.shape[1]} columns")
             
             return str(filepath)
             
@@ -1186,6 +1950,52 @@ class PDFTableExtractor:
             logger.error(f"Error saving combined table to CSV: {e}")
             return None
     
+    def save_combined_table_to_parquet(self, combined_table: Dict, pdf_name: str, source_pdf: Optional[str] = None) -> str:
+        """
+        Save combined table data to a Parquet file
+        
+        The title, pages and source PDF go into the file metadata rather than
+        preamble rows, so the file loads directly (and in column subsets).
+        
+        Args:
+            combined_table (Dict): Combined table data dictionary
+            pdf_name (str): Original PDF filename
+            source_pdf (str): Source PDF file name stored in the metadata
+            
+        Returns:
+            Path to saved Parquet file
+        """
+        try:
+            title = combined_table.get('title', '')
+            filepath = self.table_file_path(title, f"{pdf_name}_Combined_Table", "parquet")
+            
+            data = combined_table.get('data', [])
+            if not data:
+                logger.warning(f"No data found in combined table: {title}")
+                return None
+            
+            # Parquet is never opened as a spreadsheet, so cells are kept unescaped
+            columns, cells = normalize_table(combined_table.get('headers', []), data, escape_formulas=False)
+            if not cells.size:
+                logger.warning(f"No valid data found in combined table: {title}")
+                return None
+            
+            write_table_parquet(str(filepath), columns, cells, {
+                "title": title or "",
+                "pages": combined_table.get('pages', []),
+                "original_titles": combined_table.get('original_titles', []),
+                "source_pdf": source_pdf or f"{pdf_name}.pdf"
+            }, typed=self.typed_export)
+            
+            logger.info(f"✓ Saved combined table: {filepath}")
+            logger.info(f"  Final combined table size: {cells.shape[0]} rows × {cells.shape[1]} columns")
+            
+            return str(filepath)
+            
+        except Exception as e:
+            logger.error(f"Error saving combined table to Parquet: {e}")
+            return None
+    
     def generate_summary_report(self, results: Dict) -> str:
         """
         Generate a summary report of extraction results
@@ -1205,7 +2015,49 @@ class PDFTableExtractor:
             f.write(f"Output Directory: {results['output_directory']}\n")
             f.write(f"Total Pages: {results['total_pages']}\n")
             f.write(f"Pages with Tables: {results['pages_with_tables']}\n")
-            f.write(f"Total Tables Extracted: {results['total_tables_extracted']}\n\n")
+            f.write(f"Pages Skipped (blank): {results.get('pages_skipped', 0)}\n")
+            if results.get('pages_restored'):
+                f.write(f"Pages Restored from Checkpoint: {results['pages_restored']}\n")
+            if results.get('pages_deduplicated'):
+                f.write(f"Repeated Pages Reused (no API call): {results['pages_deduplicated']}\n")
+            if results.get('selected_pages') is not None:
+                f.write(f"Selected Pages: {', '.join(map(str, results['selected_pages']))}\n")
+            f.write(f"Total Tables Extracted: {results['total_tables_extracted']}\n")
+            f.write(f"Image Bytes Sent: {results.get('image_bytes_sent', 0)}\n")
+            f.write(f"Estimated Image Tokens: {results.get('image_tokens', 0)}\n")
+            f.write(f"Gemini Requests: {results.get('gemini_requests', 0)}\n")
+            f.write(f"Gemini Tokens (input/output): {results.get('gemini_input_tokens', 0)} / "
+                    f"{results.get('gemini_output_tokens', 0)}\n")
+            f.write(f"Gemini Retries: {results.get('gemini_retries', 0)}\n\n")
+            
+            # Where the time went (stages overlap, so they add up to more than the total)
+            if results.get('timings'):
+                f.write("Timing Breakdown (seconds):\n")
+                f.write("-" * 30 + "\n")
+                timings = results['timings']
+                if 'total' in timings:
+                    f.write(f"Total (wall clock): {timings['total']:.2f}\n")
+                for stage, seconds in timings.items():
+                    if stage != 'total':
+                        f.write(f"  {stage}: {seconds:.2f}\n")
+                f.write("\n")
+            
+            # Pages that dominate the Gemini cost
+            costly_pages = sorted(
+                (p for p in results['page_results'] if p.get('usage')),
+                key=lambda p: (p['usage'].get('input_tokens', 0) + p['usage'].get('output_tokens', 0),
+                               p['usage'].get('gemini_seconds', 0.0)),
+                reverse=True
+            )[:5]
+            if costly_pages:
+                f.write("Costliest Pages (Gemini tokens):\n")
+                f.write("-" * 30 + "\n")
+                for page_result in costly_pages:
+                    usage = page_result['usage']
+                    f.write(f"Page {page_result['page_number']}: {usage.get('input_tokens', 0)} in / "
+                            f"{usage.get('output_tokens', 0)} out tokens, "
+                            f"{usage.get('gemini_seconds', 0.0):.2f}s, {usage.get('retries', 0)} retries\n")
+                f.write("\n")
             
             # Show extracted titles
             if results.get('extracted_titles'):
@@ -1215,7 +2067,8 @@ class PDFTableExtractor:
                     f.write(f"{i}. {title}\n")
                 f.write("\n")
             
-            f.write("Extracted CSV Files:\n")
+            output_format = results.get('output_format', self.output_format)
+            f.write(f"Extracted {'Parquet' if output_format == 'parquet' else 'CSV'} Files:\n")
             f.write("-" * 30 + "\n")
             for csv_file in results['csv_files']:
                 f.write(f"• {csv_file}\n")
@@ -1224,8 +2077,18 @@ class PDFTableExtractor:
             f.write("-" * 30 + "\n")
             for page_result in results['page_results']:
                 f.write(f"Page {page_result['page_number']}: ")
-                if page_result['has_tables']:
-                    f.write(f"{page_result['tables_count']} table(s) found\n")
+                if page_result.get('skipped') == 'blank':
+                    f.write(f"Skipped (blank page, ink {page_result['ink_coverage']:.2%})\n")
+                elif page_result['has_tables']:
+                    f.write(f"{page_result['tables_count']} table(s) found")
+                    if page_result.get('duplicate_of'):
+                        f.write(f" [repeats page {page_result['duplicate_of']}]")
+                    elif page_result.get('image'):
+                        f.write(f" [{page_result['image']['bytes']} bytes, ~{page_result['image']['image_tokens']} image tokens]")
+                    if page_result.get('timings'):
+                        f.write(" (" + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds
+                                                  in page_result['timings'].items() if seconds is not None) + ")")
+                    f.write("\n")
                     for table in page_result['tables']:
                         f.write(f"  - {table['title']} ({table['rows']} rows, {table['columns']} cols)\n")
                 else:
@@ -1234,75 +2097,242 @@ class PDFTableExtractor:
         return str(report_path)
 
 
-def main():
+@lru_cache(maxsize=1)
+def extraction_prompt_version() -> str:
+    """
+    Short fingerprint of the extraction prompt, so stored results (checkpoints,
+    cached archives) of an older prompt are not reused
+    
+    Returns:
+        str: First 12 hex digits of the prompt's SHA-256
+    """
+    prompt = PDFTableExtractor.create_table_extraction_prompt()
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+
+
+# Marker files of completed CLI inputs (keyed by document hash, prompt version and
+# output options), kept under the output directory
+COMPLETED_MARKER_DIR = ".completed"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash a file's contents in chunks
+    
+    Args:
+        path (str): Path to the file
+        chunk_size (int): Bytes read per chunk
+        
+    Returns:
+        str: Hex SHA-256 digest
     """
-    Main function to demonstrate usage
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def expand_pdf_inputs(inputs: List[str]) -> List[Path]:
     """
-    # Configuration
-    API_KEY = "YOUR_API_KEY_HERE"  # Replace with your actual API key
-    PDF_PATH = "path/to/your/pdf/file.pdf"  # Replace with path to your PDF
+    Resolve CLI inputs (PDF files, directories and glob patterns) to PDF paths
     
-    try:
-        # Initialize extractor
-        extractor = PDFTableExtractor(API_KEY)
-        
-        # Process PDF
-        print("Starting PDF table extraction with title-based directory creation...")
-        results = extractor.process_pdf(PDF_PATH)
-        
-        # Check for errors
-        if "error" in results:
-            print(f"❌ Error: {results['error']}")
-            print("\nTroubleshooting:")
-            print("1. Install PyMuPDF: pip install PyMuPDF")
-            print("2. Or install poppler for pdf2image:")
-            print("   - Windows: Download from https://poppler.freedesktop.org/")
-            print("   - Mac: brew install poppler")
-            print("   - Linux: sudo apt-get install poppler-utils")
-            return
+    Args:
+        inputs (List[str]): Paths, directories (searched recursively) or glob patterns
         
-        # Generate summary report
-        summary_path = extractor.generate_summary_report(results)
-        
-        # Print results
-        print(f"\n{'='*60}")
-        print("EXTRACTION COMPLETE!")
-        print(f"{'='*60}")
-        print(f"📄 PDF: {results['pdf_name']}")
-        print(f"📁 Output Directory: {results['output_directory']}")
-        print(f"📊 Tables extracted: {results['total_tables_extracted']}")
-        print(f"📄 CSV files created: {len(results['csv_files'])}")
-        print(f"📋 Summary report: {summary_path}")
-        
-        # Show extracted titles
-        if results.get('extracted_titles'):
-            print(f"\n📝 Titles extracted from PDF:")
-            for i, title in enumerate(results['extracted_titles'], 1):
-                print(f"  {i}. {title}")
-        
-        if results['csv_files']:
-            print(f"\nExtracted CSV files:")
-            for csv_file in results['csv_files']:
-                print(f"  • {csv_file}")
-                
-            # Show directory structure
-            print(f"\n📂 Directory Structure:")
-            print(f"  📁 {extractor.base_output_dir}/")
-            print(f"    📁 {Path(results['output_directory']).name}/")
-            for csv_file in results['csv_files']:
-                csv_name = Path(csv_file).name
-                print(f"      📄 {csv_name}")
-            print(f"      📄 {Path(summary_path).name}")
+    Returns:
+        List of unique PDF paths in input order
+    """
+    found = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            found.extend(sorted(p for p in path.rglob('*') if p.suffix.lower() == '.pdf' and p.is_file()))
+        elif path.is_file():
+            found.append(path)
         else:
-            print(f"\n⚠️  No tables were found in the PDF.")
+            matches = sorted(Path(p) for p in glob.glob(item, recursive=True))
+            if not matches:
+                logger.warning(f"No files match {item}")
+            found.extend(p for p in matches if p.suffix.lower() == '.pdf' and p.is_file())
+    
+    unique = {}
+    for path in found:
+        unique.setdefault(path.resolve(), path)
+    return list(unique.values())
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Command-line options of the batch extractor"""
+    parser = argparse.ArgumentParser(
+        description="Extract tables from PDFs with Gemini into CSV or Parquet files"
+    )
+    parser.add_argument("inputs", nargs="+",
+                        help="PDF files, directories (searched recursively) or glob patterns")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"),
+                        help="Gemini API key (default: $GEMINI_API_KEY)")
+    parser.add_argument("-o", "--output-dir", default="extracted_tables",
+                        help="Directory receiving one folder per document (default: extracted_tables)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv",
+                        help="Output file format (default: csv)")
+    parser.add_argument("--typed", action="store_true",
+                        help="Write numeric columns as numbers instead of cell text")
+    parser.add_argument("-j", "--jobs", type=int, default=2,
+                        help="Documents processed in parallel (default: 2)")
+    parser.add_argument("--page-workers", type=int, default=None,
+                        help="Concurrent Gemini calls per document (default: the API key budget)")
+    parser.add_argument("--pages", default=None,
+                        help='Page ranges to process in every document, e.g. "1-5, 12, 40-"')
+    parser.add_argument("--targets", default=None,
+                        help='Comma-separated keywords or "re:" patterns; only matching pages are processed')
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess documents already completed in the output directory")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log progress of every page")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command-line entry point: extract tables from many PDFs
+    
+    Documents run in parallel on forks of one extractor, so they share the
+    Gemini model and the per-key API budget. A document whose contents were
+    already extracted into the output directory with the same output options
+    (see COMPLETED_MARKER_DIR) is skipped unless --force is given, so
+    interrupted backfills can be rerun.
+    
+    Args:
+        argv (List[str]): Arguments, defaults to sys.argv
         
+    Returns:
+        int: Exit status - 0 when every document succeeded, 1 otherwise
+    """
+    args = build_arg_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    
+    if not args.api_key:
+        print("❌ Error: no API key - pass --api-key or set GEMINI_API_KEY")
+        return 1
+    if args.format == "parquet" and not PYARROW_AVAILABLE:
+        print("❌ Error: Parquet output requires pyarrow: pip install pyarrow")
+        return 1
+    targets = [t.strip() for t in args.targets.split(',') if t.strip()] if args.targets else None
+    try:
+        if args.pages:
+            check_page_ranges(args.pages)
+        check_targets(targets or [])
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return 1
+    
+    pdf_paths = expand_pdf_inputs(args.inputs)
+    if not pdf_paths:
+        print("❌ Error: no PDF files found")
+        return 1
+    
+    output_root = Path(args.output_dir)
+    marker_dir = output_root / COMPLETED_MARKER_DIR
+    marker_dir.mkdir(parents=True, exist_ok=True)
+    
+    try:
+        extractor = PDFTableExtractor(args.api_key)
     except Exception as e:
         print(f"❌ Error: {e}")
-        print("\nMake sure to:")
-        print("1. Replace API_KEY with your actual Gemini API key")
-        print("2. Replace PDF_PATH with the path to your PDF file")
-        print("3. Install required dependencies:")
-        print("   pip install google-generativeai pandas PyMuPDF pillow")
+        return 1
+    
+    jobs = max(1, min(args.jobs, len(pdf_paths)))
+    extractor.base_output_dir = output_root
+    extractor.output_format = args.format
+    extractor.typed_export = args.typed
+    extractor.extract_workers = max(1, args.page_workers or extractor.api_budget.max_concurrent)
+    extractor.render_workers = max(1, (os.cpu_count() or 1) // jobs)
+    # Everything that changes the output; a document completed with other options is redone
+    output_options = {
+        "output_format": args.format,
+        "typed": args.typed,
+        "pages": args.pages,
+        "targets": targets
+    }
+    
+    print(f"📄 {len(pdf_paths)} PDF(s), {jobs} document(s) at a time, "
+          f"{extractor.extract_workers} Gemini call(s) per document")
+    
+    print_lock = threading.Lock()
+    
+    def process_one(pdf_path: Path) -> Dict:
+        outcome = {"file": str(pdf_path), "status": "error", "pages": 0, "tables": 0, "seconds": 0.0}
+        started = time.perf_counter()
+        try:
+            marker_key = result_cache_key(file_sha256(str(pdf_path)), extraction_prompt_version(), output_options)
+            marker = marker_dir / f"{marker_key}.json"
+            if marker.exists() and not args.force:
+                outcome["status"] = "skipped"
+                outcome["output_directory"] = json.loads(marker.read_text(encoding='utf-8')).get("output_directory")
+                return outcome
+            
+            document_extractor = extractor.fork()
+            results = document_extractor.process_pdf(str(pdf_path), pages=args.pages, targets=targets)
+            if "error" in results:
+                outcome["error"] = results["error"]
+                return outcome
+            
+            summary_path = document_extractor.generate_summary_report(results)
+            outcome.update(
+                status="ok",
+                pages=results["total_pages"],
+                tables=results["total_tables_extracted"],
+                image_tokens=results.get("image_tokens", 0),
+                output_directory=results["output_directory"]
+            )
+            marker.write_text(json.dumps({
+                "source_pdf": str(pdf_path.resolve()),
+                "output_directory": results["output_directory"],
+                "files": results["csv_files"] + [summary_path],
+                "tables": results["total_tables_extracted"],
+                "options": output_options
+            }, indent=2, ensure_ascii=False), encoding='utf-8')
+        except Exception as e:
+            logger.error(f"Failed to process {pdf_path}: {e}")
+            outcome["error"] = str(e)
+        finally:
+            outcome["seconds"] = time.perf_counter() - started
+            with print_lock:
+                if outcome["status"] == "ok":
+                    print(f"✓ {pdf_path}: {outcome['tables']} table(s) from {outcome['pages']} page(s) "
+                          f"in {outcome['seconds']:.1f}s -> {outcome['output_directory']}")
+                elif outcome["status"] == "skipped":
+                    print(f"↷ {pdf_path}: already completed -> {outcome.get('output_directory')}")
+                else:
+                    print(f"❌ {pdf_path}: {outcome.get('error')}")
+        return outcome
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="pdf-document") as executor:
+        outcomes = list(executor.map(process_one, pdf_paths))
+    elapsed = time.perf_counter() - started
+    
+    done = [o for o in outcomes if o["status"] == "ok"]
+    skipped = sum(1 for o in outcomes if o["status"] == "skipped")
+    failed = [o for o in outcomes if o["status"] == "error"]
+    pages = sum(o["pages"] for o in done)
+    
+    print(f"\n{'='*60}")
+    print("BATCH COMPLETE")
+    print(f"{'='*60}")
+    print(f"📄 Documents: {len(done)} processed, {skipped} skipped, {len(failed)} failed")
+    print(f"📊 Tables extracted: {sum(o['tables'] for o in done)}")
+    print(f"🧮 Estimated image tokens: {sum(o.get('image_tokens', 0) for o in done)}")
+    print(f"⏱️  Elapsed: {elapsed:.1f}s")
+    if elapsed > 0 and done:
+        print(f"🚀 Throughput: {pages / elapsed:.2f} pages/s, {len(done) / elapsed * 60:.1f} documents/min")
+    print(f"📁 Output: {output_root}")
+    if failed:
+        print("\nFailed documents:")
+        for outcome in failed:
+            print(f"  • {outcome['file']}: {outcome.get('error')}")
+    
+    return 1 if failed else 0
 
 
 def install_dependencies():
@@ -1328,4 +2358,4 @@ if __name__ == "__main__":
     # Uncomment the line below if you need to install dependencies
     # install_dependencies()
     
-    main()
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Observer interface for following PDFTableExtractor.process_pdf
+
+Metrics, progress streaming and tracing exporters subclass
+ExtractionObserver, override the hooks they need and register with
+extractor.add_observer(). Hooks run synchronously on the pipeline threads
+(render, extract workers, writer and the main thread), so they must be
+thread-safe and quick. An exception raised by a hook is logged and
+ignored. With no observers registered the extractor skips the calls
+entirely.
+"""
+from typing import Dict, Optional
+
+
+class ExtractionObserver:
+    """Base observer - every hook is a no-op"""
+
+    def document_started(self, pdf_path: str, page_count: int):
+        """process_pdf opened a document"""
+
+    def page_rendered(self, page_number: int, seconds: float, width: int, height: int):
+        """A page was rendered at full resolution"""
+
+    def request_sent(self, page_number: int, image_info: Dict):
+        """A page image is being sent to Gemini (image_info: format, size, bytes, image tokens)"""
+
+    def response_received(self, page_number: int, extraction: Dict, usage: Optional[Dict]):
+        """
+        Gemini answered for a page (or the call failed - see extraction.get("error"))
+
+        usage holds gemini_seconds, json_parse_seconds, input/output tokens and retries
+        """
+
+    def table_grouped(self, page_number: int, table_number: int, group_key: str, reason: str,
+                      seconds: float):
+        """A table was merged into (or started) a table group"""
+
+    def page_finished(self, page_result):
+        """A page is done (records.PageResult: extracted, blank, duplicate, restored or failed)"""
+
+    def file_written(self, path: Optional[str], table, seconds: float):
+        """
+        A finished table group was written (path is None when handed to a table sink)
+
+        table is the records.TableGroup
+        """
+
+    def document_finished(self, results: Dict, error: Optional[BaseException] = None):
+        """process_pdf finished (results is None when it raised error)"""
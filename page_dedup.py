@@ -0,0 +1,109 @@
+"""
+Detection of repeated pages within a document
+
+Filings often print the same page more than once - notes shared by the
+standalone and consolidated statements, a disclaimer on every sheet. Each
+page's low-resolution grayscale render gets a 64-bit difference hash
+(dHash); pages with the same hash are candidates, confirmed by comparing
+their bit-packed ink masks (and text layers, when both have one). A
+confirmed duplicate reuses the extraction of the first page instead of
+being rendered and sent to Gemini again.
+"""
+import logging
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# dHash grid: 9x8 samples give 8x8 horizontal gradients = 64 bits
+DHASH_SIZE = 8
+
+
+def dhash(gray: np.ndarray) -> int:
+    """
+    Difference hash of a grayscale image
+
+    Args:
+        gray (np.ndarray): 2-D uint8 array
+
+    Returns:
+        int: 64-bit hash, one bit per "left sample brighter than right" comparison
+    """
+    small = np.asarray(Image.fromarray(gray).resize((DHASH_SIZE + 1, DHASH_SIZE), Image.BILINEAR),
+                       dtype=np.int16)
+    bits = (small[:, :-1] > small[:, 1:]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class PageFingerprint:
+    """Hash and ink mask of one low-resolution page render"""
+
+    __slots__ = ("page_number", "hash", "shape", "mask")
+
+    def __init__(self, page_number: int, gray: np.ndarray, ink_level: int):
+        self.page_number = page_number
+        self.hash = dhash(gray)
+        self.shape = gray.shape
+        # One bit per pixel: ~15 KB for an A4 page at 36 DPI
+        self.mask = np.packbits(gray < ink_level)
+
+    def differing_pixels(self, other: "PageFingerprint") -> int:
+        """Count pixels that are ink on one page and paper on the other"""
+        return int(np.unpackbits(np.bitwise_xor(self.mask, other.mask)).sum())
+
+
+class DuplicatePageIndex:
+    """Fingerprints of the pages seen so far, bucketed by hash"""
+
+    def __init__(self, ink_level: int = 160, max_diff_pixels: int = 0,
+                 text_of: Optional[Callable[[int], str]] = None):
+        """
+        Args:
+            ink_level (int): Grayscale value below which a pixel counts as ink
+            max_diff_pixels (int): Ink-mask pixels allowed to differ between duplicates;
+                0 only merges pages that render identically (a single changed
+                figure in a table must never be reused)
+            text_of (Callable): Returns the text layer of a page, compared as well
+                when both pages have one
+        """
+        self.ink_level = ink_level
+        self.max_diff_pixels = max_diff_pixels
+        self.text_of = text_of
+        self._buckets: Dict[int, List[PageFingerprint]] = {}
+
+    def add(self, page_number: int, gray: np.ndarray) -> Optional[int]:
+        """
+        Fingerprint a page and look for an earlier identical page
+
+        Args:
+            page_number (int): 1-based page number (pages are added in order)
+            gray (np.ndarray): Low-resolution grayscale render of the page
+
+        Returns:
+            Page number of the earlier identical page, or None if the page is new
+        """
+        fingerprint = PageFingerprint(page_number, gray, self.ink_level)
+        bucket = self._buckets.setdefault(fingerprint.hash, [])
+        for candidate in bucket:
+            if candidate.shape != fingerprint.shape:
+                continue
+            if candidate.differing_pixels(fingerprint) > self.max_diff_pixels:
+                continue
+            if not self._same_text(candidate.page_number, page_number):
+                continue
+            return candidate.page_number
+        bucket.append(fingerprint)
+        return None
+
+    def _same_text(self, first: int, second: int) -> bool:
+        if self.text_of is None:
+            return True
+        try:
+            first_text, second_text = self.text_of(first).strip(), self.text_of(second).strip()
+        except Exception as e:
+            logger.warning(f"Could not compare text of pages {first} and {second}: {e}")
+            return False
+        # Scanned pages have no text layer - the ink mask decides
+        return not first_text or not second_text or first_text == second_text
@@ -0,0 +1,236 @@
+"""
+Page selection for targeted extraction
+
+Supports explicit page ranges ("1-5, 12, 40-") and keyword or regex targets
+resolved against an inverted index built once from the PDF's text layer.
+"""
+import re
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+CONTINUATION_PATTERN = re.compile(r"\(?\b(?:continued|contd|cont)\b\.?\)?", re.IGNORECASE)
+
+
+def _page_range_bounds(spec: str) -> Iterator[Tuple[str, int, Optional[int]]]:
+    """Yield (part, start, end) of each range in a spec; end is None for an open end"""
+    for part in re.split(r"[,\s]+", spec.strip()):
+        if not part:
+            continue
+
+        match = re.fullmatch(r"(\d*)-(\d*)", part)
+        if match and (match.group(1) or match.group(2)):
+            start = int(match.group(1)) if match.group(1) else 1
+            end = int(match.group(2)) if match.group(2) else None
+        elif part.isdigit():
+            start = end = int(part)
+        else:
+            raise ValueError(f"Invalid page range: {part}")
+
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"Invalid page range: {part}")
+        yield part, start, end
+
+
+def check_page_ranges(spec: str):
+    """
+    Check the syntax of a page range specification without expanding it
+
+    Used before the page count is known; parse_page_ranges does the rest.
+
+    Args:
+        spec (str): Comma-separated pages and ranges, e.g. "1-5, 12, 40-"
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    for _ in _page_range_bounds(spec):
+        pass
+
+
+def parse_page_ranges(spec: str, page_count: int) -> Set[int]:
+    """
+    Parse a page range specification
+
+    Args:
+        spec (str): Comma-separated pages and ranges, e.g. "1-5, 12, 40-" (open ends allowed)
+        page_count (int): Number of pages in the document
+
+    Returns:
+        Set of 1-based page numbers within the document
+
+    Raises:
+        ValueError: If the spec is malformed or a range starts past the last page
+    """
+    pages = set()
+    for part, start, end in _page_range_bounds(spec):
+        if start > page_count:
+            raise ValueError(f"Page range {part} is past the last page ({page_count})")
+        pages.update(range(start, min(end or page_count, page_count) + 1))
+
+    return pages
+
+
+def target_pattern(target: str) -> Optional[Pattern]:
+    """
+    Compile a regex target
+
+    Args:
+        target (str): Target written as "re:<pattern>" or "/<pattern>/", or a plain phrase
+
+    Returns:
+        Compiled case-insensitive pattern, or None for a plain phrase
+
+    Raises:
+        ValueError: If the pattern does not compile
+    """
+    if target.startswith("re:"):
+        pattern = target[3:]
+    elif len(target) > 2 and target.startswith("/") and target.endswith("/"):
+        pattern = target[1:-1]
+    else:
+        return None
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"Invalid target pattern {target}: {e}")
+
+
+def check_targets(targets: Iterable[str]):
+    """
+    Check that every regex target compiles
+
+    Raises:
+        ValueError: Naming the first invalid pattern
+    """
+    for target in targets:
+        target_pattern(target)
+
+
+def parse_targets(spec: str) -> List[str]:
+    """
+    Split a target specification from a form field into individual targets
+
+    Args:
+        spec (str): Targets separated by newlines or semicolons
+
+    Returns:
+        List of non-empty targets
+
+    Raises:
+        ValueError: If a regex target does not compile
+    """
+    targets = [target.strip() for target in re.split(r"[\n;]+", spec or "") if target.strip()]
+    check_targets(targets)
+    return targets
+
+
+class PageTextIndex:
+    """Inverted index from words to the pages of a PDF that contain them"""
+
+    def __init__(self, page_texts: Iterable[str]):
+        """
+        Args:
+            page_texts (Iterable[str]): Text layer of each page, in page order
+        """
+        self.page_texts: List[str] = []
+        self.postings: Dict[str, Set[int]] = {}
+
+        for page_num, text in enumerate(page_texts, 1):
+            normalized = re.sub(r"\s+", " ", text or "").strip().lower()
+            self.page_texts.append(normalized)
+            for token in set(TOKEN_PATTERN.findall(normalized)):
+                self.postings.setdefault(token, set()).add(page_num)
+
+    @classmethod
+    def from_pdf(cls, pdf_path: str) -> "PageTextIndex":
+        """Build the index from the text layer of a PDF file"""
+        doc = fitz.open(pdf_path)
+        try:
+            return cls(page.get_text("text") for page in doc)
+        finally:
+            doc.close()
+
+    @classmethod
+    def from_session(cls, session, page_numbers: Optional[Set[int]] = None) -> "PageTextIndex":
+        """
+        Build the index from an open PDFDocumentSession
+
+        Args:
+            session: PDFDocumentSession whose cached page text is reused
+            page_numbers (Set[int]): Only index these pages, None indexes every page
+        """
+        return cls(session.text(page_num) if page_numbers is None or page_num in page_numbers else ""
+                   for page_num in range(1, session.page_count + 1))
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_texts)
+
+    @property
+    def has_text(self) -> bool:
+        """False for scanned documents without a text layer"""
+        return bool(self.postings)
+
+    def search(self, target: str) -> Set[int]:
+        """
+        Find pages matching a keyword phrase or regex target
+
+        Args:
+            target (str): Phrase such as "Statement of Profit and Loss", or a regex
+                written as "re:<pattern>" or "/<pattern>/"
+
+        Returns:
+            Set of 1-based page numbers
+        """
+        pattern = target_pattern(target)
+        if pattern is not None:
+            return {page_num for page_num, text in enumerate(self.page_texts, 1) if pattern.search(text)}
+
+        phrase = re.sub(r"\s+", " ", target).strip().lower()
+        tokens = TOKEN_PATTERN.findall(phrase)
+        if not tokens:
+            return set()
+
+        # Intersect postings, rarest word first, then confirm the exact phrase
+        postings = sorted((self.postings.get(token, set()) for token in set(tokens)), key=len)
+        candidates = set(postings[0])
+        for pages in postings[1:]:
+            candidates &= pages
+            if not candidates:
+                return set()
+
+        return {page_num for page_num in candidates if phrase in self.page_texts[page_num - 1]}
+
+    def resolve(self, targets: List[str], neighbour_pages: int = 1, allowed: Optional[Set[int]] = None) -> Set[int]:
+        """
+        Resolve targets to the pages to extract, including continuation pages
+
+        Args:
+            targets (List[str]): Keyword phrases or regex targets
+            neighbour_pages (int): Pages after each match always included as possible continuations
+            allowed (Set[int]): Restrict the result to these pages (e.g. an explicit range)
+
+        Returns:
+            Set of 1-based page numbers
+        """
+        allowed = allowed if allowed is not None else set(range(1, self.page_count + 1))
+        matched = set()
+        for target in targets:
+            pages = self.search(target) & allowed
+            logger.info(f"Target '{target}' matched pages: {sorted(pages)}")
+            matched |= pages
+
+        selected = set(matched)
+        for page_num in matched:
+            last = min(page_num + neighbour_pages, self.page_count)
+            # Keep following pages that announce themselves as continuations
+            while last < self.page_count and CONTINUATION_PATTERN.search(self.page_texts[last]):
+                last += 1
+            selected.update(range(page_num + 1, last + 1))
+
+        return selected & allowed
@@ -0,0 +1,128 @@
+"""
+Compact records for tables and page results
+
+Extraction results used to be carried as nested dicts. These classes use
+__slots__ (no per-instance __dict__) and intern titles, headers, group keys
+and short cell values, so repeated strings - the same statement title on
+every page, the same header row on every continuation, "-" and "0.00" cells -
+are stored once. For existing readers they still support dict-style access
+(record["pages"], record.get("title")), and to_dict() gives plain JSON data.
+"""
+import sys
+from typing import Dict, List, Optional
+
+# Cells up to this length are interned - long cells are rarely repeated
+INTERN_MAX_CELL_LENGTH = 32
+
+
+def intern_text(value):
+    """Intern a string so equal titles and headers share one object"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def intern_row(row: List) -> List:
+    """Intern the short cells of a row in place"""
+    for i, cell in enumerate(row):
+        if type(cell) is str and len(cell) <= INTERN_MAX_CELL_LENGTH:
+            row[i] = sys.intern(cell)
+    return row
+
+
+class _Record:
+    """Dict-style read access over __slots__ fields"""
+
+    __slots__ = ()
+
+    # Fields left out of to_dict() (and missing for item access) while None
+    _optional = ()
+
+    def __getitem__(self, name: str):
+        try:
+            value = getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+        if value is None and name in self._optional:
+            raise KeyError(name)
+        return value
+
+    def get(self, name: str, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict:
+        """Plain dictionary (JSON-serialisable) form of the record"""
+        result = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is None and name in self._optional:
+                continue
+            if isinstance(value, list) and value and isinstance(value[0], _Record):
+                value = [item.to_dict() for item in value]
+            result[name] = value
+        return result
+
+
+class TableGroup(_Record):
+    """A table combined from one or more pages"""
+
+    __slots__ = ("title", "headers", "data", "pages", "table_numbers", "original_titles")
+
+    def __init__(self, title: str, headers: List, data: List[List], page_num: int, table_num: int):
+        self.title = intern_text(title)
+        self.headers = [intern_text(header) for header in headers or []]
+        self.data = [intern_row(row) for row in data or []]
+        self.pages = [page_num]
+        self.table_numbers = [table_num]
+        self.original_titles = [self.title]
+
+    def extend(self, title: str, data: List[List], page_num: int, table_num: int):
+        """Append the rows of a continuation table"""
+        self.data.extend(intern_row(row) for row in data or [])
+        self.pages.append(page_num)
+        self.table_numbers.append(table_num)
+        self.original_titles.append(intern_text(title))
+
+
+class TableSummary(_Record):
+    """One extracted table as listed in a page result"""
+
+    __slots__ = ("title", "table_number", "normalized_title", "group", "grouping", "rows", "columns")
+
+    def __init__(self, title: Optional[str], table_number, normalized_title: str, group: str,
+                 grouping: str, rows: int, columns: int):
+        self.title = intern_text(title)
+        self.table_number = table_number
+        self.normalized_title = intern_text(normalized_title)
+        self.group = intern_text(group)
+        self.grouping = grouping
+        self.rows = rows
+        self.columns = columns
+
+
+class PageResult(_Record):
+    """Outcome of processing one page"""
+
+    __slots__ = ("page_number", "has_tables", "tables_count", "tables", "skipped", "ink_coverage",
+                 "ink_std", "image", "error", "duplicate_of", "timings", "usage")
+    _optional = ("skipped", "ink_coverage", "ink_std", "image", "error", "duplicate_of", "timings", "usage")
+
+    def __init__(self, page_number: int, has_tables: bool = False, tables_count: int = 0,
+                 tables: Optional[List[TableSummary]] = None, skipped: Optional[str] = None,
+                 ink_coverage: Optional[float] = None, ink_std: Optional[float] = None,
+                 image: Optional[Dict] = None, error: Optional[str] = None,
+                 duplicate_of: Optional[int] = None, timings: Optional[Dict] = None,
+                 usage: Optional[Dict] = None):
+        self.page_number = page_number
+        self.has_tables = has_tables
+        self.tables_count = tables_count
+        self.tables = tables if tables is not None else []
+        self.skipped = skipped
+        self.ink_coverage = ink_coverage
+        self.ink_std = ink_std
+        self.image = image
+        self.error = error
+        self.duplicate_of = duplicate_of
+        self.timings = timings  # seconds per stage for this page
+        self.usage = usage      # Gemini tokens, retries and latency of this page's call
@@ -0,0 +1,214 @@
+"""
+Process-pool page rendering for large PDFs
+
+Rendering with PyMuPDF is CPU-bound, so large documents are split into
+contiguous page ranges and rendered by worker processes. Each worker opens
+its own document handle and hands pixel buffers back through shared memory,
+so only a few integers per page cross the process boundary.
+"""
+import os
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# Shared memory segments outlive the worker only where the OS keeps named
+# segments alive without an open handle (POSIX). Elsewhere bytes are returned.
+SHARED_MEMORY_HANDOFF = os.name == "posix"
+
+# Document handle of the current worker process, reused across page ranges
+_worker_doc = None
+_worker_doc_path = None
+
+
+def _open_worker_document(pdf_path: str):
+    """Open (or reuse) this worker's own handle on the PDF"""
+    global _worker_doc, _worker_doc_path
+    if _worker_doc_path != pdf_path:
+        if _worker_doc is not None:
+            _worker_doc.close()
+        _worker_doc = fitz.open(pdf_path)
+        _worker_doc_path = pdf_path
+    return _worker_doc
+
+
+def _export_samples(pix) -> Tuple:
+    """Copy pixmap samples into a new shared memory segment and return its handle"""
+    samples = pix.samples_mv
+    if not SHARED_MEMORY_HANDOFF:
+        return ("bytes", bytes(samples))
+
+    segment = shared_memory.SharedMemory(create=True, size=max(1, len(samples)))
+    segment.buf[:len(samples)] = samples
+
+    # The parent process unlinks the segment once it has copied the pixels out,
+    # so this worker's resource tracker must not reclaim it when the worker exits
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, "shared_memory")
+    except Exception:
+        pass
+
+    name = segment.name
+    segment.close()
+    return ("shm", name)
+
+
+def render_page_range(pdf_path: str, page_numbers: List[int], zoom: float) -> List[Tuple]:
+    """
+    Render a range of pages in a worker process
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        page_numbers (List[int]): 1-based page numbers to render
+        zoom (float): Render zoom factor
+
+    Returns:
+        List of (page_number, width, height, stride, components, buffer handle) tuples
+    """
+    doc = _open_worker_document(pdf_path)
+    matrix = fitz.Matrix(zoom, zoom)
+    rendered = []
+
+    for page_num in page_numbers:
+        pix = doc.load_page(page_num - 1).get_pixmap(matrix=matrix, alpha=False)
+        rendered.append((page_num, pix.width, pix.height, pix.stride, pix.n, _export_samples(pix)))
+        pix = None
+
+    return rendered
+
+
+def _import_samples(page_meta: Tuple):
+    """Build a PIL image from a rendered page and release its shared memory"""
+    from PIL import Image
+
+    page_num, width, height, stride, components, (kind, payload) = page_meta
+    mode = "RGB" if components == 3 else "L"
+
+    if kind == "bytes":
+        return page_num, Image.frombytes(mode, (width, height), payload, "raw", mode, stride)
+
+    segment = shared_memory.SharedMemory(name=payload)
+    try:
+        view = segment.buf[:stride * height]
+        try:
+            image = Image.frombytes(mode, (width, height), view, "raw", mode, stride)
+        finally:
+            view.release()
+    finally:
+        segment.close()
+        segment.unlink()
+
+    return page_num, image
+
+
+def _release_samples(page_meta: Tuple):
+    """Unlink a rendered page's shared memory without reading it"""
+    kind, payload = page_meta[5]
+    if kind != "shm":
+        return
+    try:
+        segment = shared_memory.SharedMemory(name=payload)
+        segment.close()
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def split_page_ranges(page_numbers: List[int], chunk_size: int) -> List[List[int]]:
+    """
+    Split page numbers into contiguous chunks
+
+    Args:
+        page_numbers (List[int]): Sorted 1-based page numbers
+        chunk_size (int): Maximum pages per chunk
+
+    Returns:
+        List of page number chunks, each a contiguous run of pages
+    """
+    chunks = []
+    current = []
+    for page_num in page_numbers:
+        if current and (len(current) >= chunk_size or page_num != current[-1] + 1):
+            chunks.append(current)
+            current = []
+        current.append(page_num)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class RenderPool:
+    """Render PDF pages across worker processes, yielding PIL images in page order"""
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 4, max_pages_in_flight: Optional[int] = None):
+        """
+        Args:
+            workers (int): Number of worker processes (defaults to the CPU count)
+            chunk_size (int): Most pages rendered per task - each task is a contiguous page range
+            max_pages_in_flight (int): Submitted-but-unconsumed pages allowed (defaults to two
+                chunks per worker). A full-resolution page is ~13.5MB of shared memory, so
+                chunks shrink until every worker has one within this budget; a budget below
+                the worker count leaves the extra workers idle
+        """
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        max_pages_in_flight = max(1, max_pages_in_flight or self.workers * max(1, chunk_size) * 2)
+        self.chunk_size = max(1, min(chunk_size, max_pages_in_flight // self.workers))
+        self.max_chunks_in_flight = max(1, max_pages_in_flight // self.chunk_size)
+
+    @staticmethod
+    def _consume(page_metas: List[Tuple]) -> Iterator[Tuple[int, object]]:
+        """Yield the pages of one finished range, releasing the rest if the consumer stops"""
+        for index, page_meta in enumerate(page_metas):
+            try:
+                yield _import_samples(page_meta)
+            except BaseException:
+                for leftover in page_metas[index + 1:]:
+                    _release_samples(leftover)
+                raise
+
+    def render(self, pdf_path: str, page_numbers: List[int], zoom: float) -> Iterator[Tuple[int, object]]:
+        """
+        Render pages in parallel
+
+        Args:
+            pdf_path (str): Path to the PDF file
+            page_numbers (List[int]): 1-based page numbers to render
+            zoom (float): Render zoom factor
+
+        Yields:
+            (page_number, PIL Image) tuples in page order
+        """
+        chunks = split_page_ranges(sorted(page_numbers), self.chunk_size)
+        logger.info(f"Rendering {len(page_numbers)} pages in {len(chunks)} ranges "
+                    f"across {self.workers} processes")
+
+        # Spawned workers do not inherit the parent's threads or gRPC state
+        context = multiprocessing.get_context("spawn")
+        pending = deque()
+
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+            try:
+                for chunk in chunks:
+                    pending.append(executor.submit(render_page_range, str(pdf_path), chunk, zoom))
+                    if len(pending) >= self.max_chunks_in_flight:
+                        yield from self._consume(pending.popleft().result())
+
+                while pending:
+                    yield from self._consume(pending.popleft().result())
+            finally:
+                # Consumer stopped early or a worker failed - free what was rendered
+                for future in pending:
+                    if future.cancel():
+                        continue
+                    try:
+                        for page_meta in future.result():
+                            _release_samples(page_meta)
+                    except Exception:
+                        pass
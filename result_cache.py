@@ -0,0 +1,309 @@
+"""
+Local cache of finished extraction archives
+
+Users often upload the exact same filing again (a colleague shares it, a
+download is retried). The ZIP built for an upload is stored under a key made
+from the document's SHA-256, the prompt version and every option that
+changes the output, so an identical request is answered from disk without
+rendering or calling Gemini. The cache is bounded by total size; the least
+recently used entries (by file mtime, refreshed on every hit) are evicted
+first.
+
+Concurrent uploads of the same document are coalesced (single flight): the
+first request takes a lock file for the key and runs the extraction, the
+others wait on the lock - across gunicorn workers, via flock - and are then
+answered from the cache. When the extraction fails or finds no tables, its
+error response is kept briefly so the requests that were waiting get the
+same answer instead of repeating the extraction one after another.
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Optional imports - file locks are POSIX only
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+DEFAULT_RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', 'result_cache')
+DEFAULT_RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # 512MB
+
+# Longest a duplicate request waits for the running extraction before doing its own
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 900))
+SINGLE_FLIGHT_POLL_SECONDS = 0.5
+
+# Seconds a failed extraction is handed to requests that were waiting for it
+FAILED_RESULT_TTL = float(os.environ.get('FAILED_RESULT_TTL', 120))
+
+
+def result_cache_key(document_hash: str, prompt_version: str, options: Dict) -> str:
+    """
+    Cache key of an extraction result
+
+    Args:
+        document_hash (str): SHA-256 of the PDF bytes
+        prompt_version (str): Version of the extraction prompt
+        options (Dict): Request options that change the output (format, pages, ...)
+
+    Returns:
+        str: Hex digest identifying the result
+    """
+    material = json.dumps([document_hash, prompt_version, options], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class FlightLock:
+    """Exclusive claim on computing one cache key, held by one request at a time"""
+
+    # In-process fallback where flock is unavailable
+    _local_locks: Dict[str, threading.Lock] = {}
+    _local_locks_guard = threading.Lock()
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd = None
+        self._local = None
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Wait for the claim
+
+        Args:
+            timeout (float): Seconds to wait before giving up
+
+        Returns:
+            bool: True if acquired, False on timeout
+        """
+        if not FCNTL_AVAILABLE:
+            with self._local_locks_guard:
+                self._local = self._local_locks.setdefault(str(self.path), threading.Lock())
+            if self._local.acquire(timeout=timeout):
+                return True
+            self._local = None
+            return False
+
+        deadline = time.monotonic() + timeout
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+                continue
+            # The previous holder removes the file on release; a lock on the
+            # removed inode guards nothing, so start over on the new file
+            try:
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    self._fd = fd
+                    return True
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def release(self):
+        if self._local is not None:
+            self._local.release()
+            self._local = None
+        if self._fd is not None:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class ResultCache:
+    """Size-bounded directory of result archives with LRU eviction"""
+
+    def __init__(self, directory=DEFAULT_RESULT_CACHE_DIR, max_bytes: int = DEFAULT_RESULT_CACHE_MAX_BYTES):
+        """
+        Args:
+            directory (str): Directory holding the archives
+            max_bytes (int): Total size of stored archives kept after eviction (0 disables caching)
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.directory / f"{key}.zip", self.directory / f"{key}.json"
+
+    def _failure_path(self, key: str) -> Path:
+        return self.directory / f"{key}.failed"
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict]]:
+        """
+        Look up a stored result and mark it as recently used
+
+        Returns:
+            Tuple of (archive path, metadata), or None on a miss
+        """
+        if self.max_bytes <= 0:
+            return None
+        archive, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            os.utime(archive)
+        except (OSError, ValueError):
+            return None
+        return str(archive), metadata
+
+    def claim(self, key: str, timeout: float = SINGLE_FLIGHT_TIMEOUT) -> Optional[FlightLock]:
+        """
+        Claim the computation of a key, waiting while another request holds it
+
+        After the claim, check the cache again: the request that held it has
+        usually just stored the result.
+
+        Args:
+            key (str): Key from result_cache_key
+            timeout (float): Seconds to wait for a running computation
+
+        Returns:
+            FlightLock to release once the result is stored (or the attempt
+            failed), or None when caching is off or the wait timed out
+        """
+        if self.max_bytes <= 0:
+            return None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            lock = FlightLock(self.directory / f"{key}.lock")
+            started = time.monotonic()
+            if not lock.acquire(timeout):
+                logger.warning(f"Gave up waiting for the running extraction of {key[:12]}")
+                return None
+        except OSError as e:
+            logger.warning(f"Could not lock {key[:12]}: {e}")
+            return None
+        waited = time.monotonic() - started
+        if waited >= SINGLE_FLIGHT_POLL_SECONDS:
+            logger.info(f"⏳ Waited {waited:.1f}s for the running extraction of {key[:12]}")
+        return lock
+
+    def put_failure(self, key: str, payload: Dict, status: int, scope: Optional[str] = None):
+        """
+        Record the error response of a failed computation for the requests waiting on it
+
+        Args:
+            key (str): Key from result_cache_key
+            payload (Dict): JSON error body
+            status (int): HTTP status of the error
+            scope (Optional[str]): Only waiters passing the same scope get this
+                error (e.g. a rejected API key); None shares it with all of them
+        """
+        if self.max_bytes <= 0:
+            return
+        record = {'failed_at': time.time(), 'status': status, 'payload': payload, 'scope': scope}
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._write_atomic(self._failure_path(key), json.dumps(record, ensure_ascii=False).encode('utf-8'))
+        except OSError as e:
+            logger.warning(f"Could not record failed result: {e}")
+
+    def get_failure(self, key: str, since: float, scope: Optional[str] = None) -> Optional[Tuple[Dict, int]]:
+        """
+        Error response of a computation that failed while the caller was waiting for it
+
+        Only failures recorded after since (and within FAILED_RESULT_TTL) are
+        returned: a request arriving later tries the extraction again.
+
+        Args:
+            key (str): Key from result_cache_key
+            since (float): time.time() at which the caller started waiting
+            scope (Optional[str]): Scope of the caller, see put_failure
+
+        Returns:
+            Tuple of (JSON error body, HTTP status), or None
+        """
+        if self.max_bytes <= 0:
+            return None
+        try:
+            with open(self._failure_path(key), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        failed_at = record.get('failed_at', 0)
+        if failed_at < since or time.time() - failed_at > FAILED_RESULT_TTL:
+            return None
+        if record.get('scope') not in (None, scope):
+            return None
+        return record.get('payload', {}), record.get('status', 500)
+
+    def put(self, key: str, data: bytes, metadata: Dict):
+        """
+        Store a result archive, then evict old entries beyond max_bytes
+
+        Args:
+            key (str): Key from result_cache_key
+            data (bytes): ZIP archive
+            metadata (Dict): JSON-serialisable details returned with hits
+        """
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return
+        archive, meta_path = self._paths(key)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Archive first, metadata last: a reader never sees metadata without its archive
+            self._write_atomic(archive, data)
+            self._write_atomic(meta_path, json.dumps(metadata, ensure_ascii=False).encode('utf-8'))
+            logger.info(f"💾 Cached result {key[:12]} ({len(data)} bytes)")
+            self._failure_path(key).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not cache result: {e}")
+            return
+        self.evict()
+
+    def _write_atomic(self, path: Path, data: bytes):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def evict(self):
+        """Remove least recently used archives until the cache fits max_bytes, and stale failures"""
+        with self._lock:
+            try:
+                for failure in self.directory.glob('*.failed'):
+                    if time.time() - failure.stat().st_mtime > FAILED_RESULT_TTL:
+                        failure.unlink(missing_ok=True)
+            except OSError:
+                pass
+            try:
+                entries = []
+                for archive in self.directory.glob('*.zip'):
+                    stat = archive.stat()
+                    entries.append((stat.st_mtime, stat.st_size, archive))
+            except OSError:
+                return
+            total = sum(size for _, size, _ in entries)
+            for _, size, archive in sorted(entries, key=lambda entry: entry[0]):
+                if total <= self.max_bytes:
+                    break
+                for path in (archive.with_suffix('.json'), archive):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                logger.info(f"Evicted cached result {archive.stem[:12]}")
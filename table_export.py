@@ -0,0 +1,347 @@
+"""
+Table normalisation for export
+
+Extracted tables arrive as ragged lists of rows. Before they are written out
+every cell is escaped so spreadsheet apps do not read it as a formula, every
+row is padded or truncated to the header width and the headers themselves are
+reconciled with the widest row. This is done once per table, in one pass over
+a 2-D object array, and shared by every writer.
+
+For typed exports, numeric columns written in Indian/accounting notation
+("1,23,456.78", "(1,234.00)", "-", "12.5*") are parsed column-wise into numeric
+dtypes and label columns become categoricals.
+
+Plain CSV output is written with the stdlib csv module; pandas is imported
+lazily and only for typed exports. Parquet output needs pyarrow, which is
+optional and also imported only when used.
+"""
+import os
+import re
+import csv
+import json
+import logging
+import importlib.util
+from itertools import chain
+from typing import IO, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# File formats combined tables can be written in
+OUTPUT_FORMATS = ("csv", "parquet")
+
+# Parquet output needs pyarrow (checked without importing it)
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+# Share of non-empty cells that must parse as numbers for a column to be typed numeric
+NUMERIC_COLUMN_THRESHOLD = 0.8
+
+# Footnote markers trailing a figure: "12.5*", "1,234 #", "45.00 (a)", "10.2 [1]", "7.1²"
+FOOTNOTE_PATTERN = r"(?:\s*(?:[*#†‡^]+|\[\w{1,3}\]|\(\s*[a-zA-Z]{1,2}\s*\)|[¹²³⁴⁵⁶⁷⁸⁹⁰]+))+$"
+
+# Characters dropped before parsing: lakh/crore grouping, spaces, currency and percent signs
+NUMBER_NOISE_PATTERN = r"[,\s₹%]|^(?:Rs\.?|INR)"
+
+# Cells standing for zero: dashes and "nil"
+NIL_PATTERN = r"(?:-+|–|—|nil)"
+
+# Leading characters Excel treats as the start of a formula
+FORMULA_PREFIXES = ('=', '+')
+
+# Cells are scanned as one string joined by this separator
+CELL_SEPARATOR = '\x00'
+
+
+def needs_formula_escape(cell: str) -> bool:
+    """Check if Excel would interpret a cell as a formula"""
+    # If text starts with dash and contains letters, it would read as a formula
+    if cell.startswith('-'):
+        return any(c.isalpha() for c in cell)
+    return cell.startswith(FORMULA_PREFIXES)
+
+
+def escape_formula_cells(cells: List[str], joined: str) -> List[str]:
+    """
+    Prefix cells that Excel would interpret as formulas with a single quote
+
+    The joined cells are viewed as one array of code points, so first
+    characters and ASCII letters are found for every cell at once. Only
+    dash-prefixed cells whose sole letters are non-ASCII are checked one by
+    one.
+
+    Args:
+        cells (List[str]): Flat list of cell strings
+        joined (str): The cells joined by CELL_SEPARATOR
+
+    Returns:
+        The same list, escaped in place
+    """
+    if not cells:
+        return cells
+    if joined.count(CELL_SEPARATOR) != len(cells) - 1:
+        # A cell contains the separator itself - check every cell
+        for i, cell in enumerate(cells):
+            if needs_formula_escape(cell):
+                cells[i] = f"'{cell}"
+        return cells
+
+    # Code points of every cell, each one followed by the separator
+    codes = np.frombuffer((joined + CELL_SEPARATOR).encode('utf-32-le'), dtype=np.uint32)
+    starts = np.empty(len(cells), dtype=np.intp)
+    starts[0] = 0
+    starts[1:] = np.flatnonzero(codes == 0)[:-1] + 1
+    first = codes[starts]
+
+    escape = np.zeros(len(cells), dtype=bool)
+    for prefix in FORMULA_PREFIXES:
+        escape |= first == ord(prefix)
+
+    dashed = np.flatnonzero(first == ord('-'))
+    if len(dashed):
+        # Count letters per dashed cell from running totals over all code points
+        ends = np.append(starts[1:], len(codes))
+        folded = codes | 0x20
+        ascii_letters = np.concatenate(([0], np.cumsum((folded >= ord('a')) & (folded <= ord('z')), dtype=np.int64)))
+        non_ascii = np.concatenate(([0], np.cumsum(codes > 0x7f, dtype=np.int64)))
+        has_ascii_letter = ascii_letters[ends[dashed]] > ascii_letters[starts[dashed]]
+        has_non_ascii = non_ascii[ends[dashed]] > non_ascii[starts[dashed]]
+        escape[dashed[has_ascii_letter]] = True
+        for i in dashed[~has_ascii_letter & has_non_ascii].tolist():
+            escape[i] = needs_formula_escape(cells[i])
+
+    for i in np.flatnonzero(escape).tolist():
+        cells[i] = f"'{cells[i]}"
+    return cells
+
+
+def normalize_table(headers: List, data: List[List], escape_formulas: bool = True) -> Tuple[List, np.ndarray]:
+    """
+    Escape, pad/truncate and reconcile an extracted table in one pass
+
+    Args:
+        headers (List): Header row as extracted (may be empty)
+        data (List[List]): Data rows, possibly of different lengths
+        escape_formulas (bool): Quote cells Excel would read as formulas (not
+            needed for formats that are never opened in a spreadsheet)
+
+    Returns:
+        Tuple of (columns, cells) where cells is a rows × columns object array
+        of strings. Without headers the columns are numbered 0..n-1.
+    """
+    lengths = np.fromiter((len(row) for row in data), dtype=np.intp, count=len(data))
+    width = int(lengths.max()) if len(lengths) else 0
+
+    if headers:
+        columns = list(headers)
+        if len(columns) > width:
+            # Too many headers - truncate headers
+            columns = columns[:width]
+            logger.info(f"  Adjusted headers: reduced from {len(headers)} to {len(columns)} columns")
+        elif len(columns) < width:
+            # Too few headers - add generic column names
+            columns.extend(f"Column_{i+1}" for i in range(len(columns), width))
+            logger.info(f"  Adjusted headers: expanded from {len(headers)} to {len(columns)} columns")
+    else:
+        columns = list(range(width))
+
+    # Flatten every cell to a string (None becomes an empty cell)
+    flat = list(chain.from_iterable(data))
+    try:
+        joined = CELL_SEPARATOR.join(flat)
+    except TypeError:
+        flat = ['' if cell is None else cell if type(cell) is str else str(cell) for cell in flat]
+        joined = CELL_SEPARATOR.join(flat)
+    if escape_formulas:
+        escape_formula_cells(flat, joined)
+    values = np.empty(len(flat), dtype=object)
+    values[:] = flat
+
+    # Scatter the flat cells into the grid; cells past the last column are dropped
+    # and short rows keep the empty padding
+    row_index = np.repeat(np.arange(len(lengths)), lengths)
+    col_index = np.arange(len(values)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    keep = col_index < width
+
+    cells = np.full((len(lengths), width), '', dtype=object)
+    cells[row_index[keep], col_index[keep]] = values[keep]
+    return columns, cells
+
+
+
+def parse_numeric_cells(cells: np.ndarray):
+    """
+    Parse a column of cells written in Indian/accounting notation
+
+    Lakh/crore grouping commas, currency and percent signs are dropped,
+    bracketed figures are negative, dashes and "nil" are zero and trailing
+    footnote markers are ignored.
+
+    Args:
+        cells (np.ndarray): 1-D array of cell strings
+
+    Returns:
+        Tuple of (float Series, boolean Series marking cells that parsed)
+    """
+    import pandas as pd
+
+    text = pd.Series(cells, dtype=object).str.strip()
+    text = text.str.replace(FOOTNOTE_PATTERN, '', regex=True).str.lstrip("'")
+
+    negative = text.str.startswith('(') & text.str.endswith(')')
+    text = text.str.replace(NUMBER_NOISE_PATTERN, '', regex=True).str.strip('()')
+    text = text.mask(text.str.fullmatch(NIL_PATTERN, case=False), '0')
+
+    values = pd.to_numeric(text, errors='coerce')
+    values = values.mask(negative, -values)
+    return values, values.notna()
+
+
+def typed_frame(columns: List, cells: np.ndarray):
+    """
+    Build a DataFrame with numeric columns parsed and label columns as categoricals
+
+    A column is numeric when at least NUMERIC_COLUMN_THRESHOLD of its non-empty
+    cells parse; its remaining cells become missing values. Whole-number
+    columns use the nullable Int64 dtype so they are written without ".0".
+
+    Args:
+        columns (List): Column names from normalize_table
+        cells (np.ndarray): Rows × columns object array from normalize_table
+
+    Returns:
+        pandas DataFrame
+    """
+    import pandas as pd
+
+    typed = {}
+    for index in range(cells.shape[1]):
+        column = cells[:, index]
+        non_empty = column != ''
+        values, parsed = parse_numeric_cells(column)
+        parsed_share = parsed[non_empty].mean() if non_empty.any() else 0.0
+
+        if parsed_share >= NUMERIC_COLUMN_THRESHOLD:
+            dropped = int((non_empty & ~parsed.to_numpy()).sum())
+            if dropped:
+                logger.info(f"  Column {columns[index]!r}: {dropped} non-numeric cells left empty")
+            finite = values.dropna()
+            if len(finite) and (finite % 1 == 0).all() and finite.abs().max() < 2 ** 53:
+                values = values.astype('Int64')
+            typed[index] = values
+        else:
+            typed[index] = pd.Categorical(column)
+
+    df = pd.DataFrame(typed, index=pd.RangeIndex(cells.shape[0]))
+    df.columns = columns
+    return df
+
+
+def write_table_csv(csvfile: IO[str], columns: List, cells: np.ndarray, typed: bool = False):
+    """
+    Write a normalised table as CSV, below anything already written to csvfile
+
+    The output matches DataFrame.to_csv(index=False) byte for byte.
+
+    Args:
+        csvfile (IO[str]): Text file opened with newline=''
+        columns (List): Column names from normalize_table
+        cells (np.ndarray): Rows × columns object array from normalize_table
+        typed (bool): Parse numeric columns first (see typed_frame)
+    """
+    if typed:
+        typed_frame(columns, cells).to_csv(csvfile, index=False)
+        return
+
+    writer = csv.writer(csvfile, lineterminator=os.linesep)
+    writer.writerow([str(column) for column in columns])
+    writer.writerows(cells.tolist())
+
+
+def unique_column_names(columns: List) -> List[str]:
+    """
+    Make column names usable as Parquet field names
+
+    Args:
+        columns (List): Column names from normalize_table
+
+    Returns:
+        Non-empty, unique string names ("Column_3" for a blank header,
+        "Q1_2" for a second "Q1")
+    """
+    names = []
+    seen = set()
+    for i, column in enumerate(columns):
+        name = str(column).strip() or f"Column_{i+1}"
+        candidate = name
+        suffix = 2
+        while candidate in seen:
+            candidate = f"{name}_{suffix}"
+            suffix += 1
+        seen.add(candidate)
+        names.append(candidate)
+    return names
+
+
+def write_table_parquet(path: str, columns: List, cells: np.ndarray, metadata: Dict[str, object],
+                        typed: bool = False):
+    """
+    Write a normalised table as a Parquet file
+
+    Title, pages and source are stored in the file's key-value metadata
+    instead of preamble rows, so the file loads directly into a DataFrame or
+    warehouse table.
+
+    Args:
+        path (str): Output file path
+        columns (List): Column names from normalize_table
+        cells (np.ndarray): Rows × columns object array from normalize_table
+        metadata (Dict[str, object]): File metadata; non-string values are stored as JSON
+        typed (bool): Parse numeric columns first (see typed_frame)
+    """
+    if not PYARROW_AVAILABLE:
+        raise Exception("Parquet output requires pyarrow: pip install pyarrow")
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    names = unique_column_names(columns)
+    if typed:
+        df = typed_frame(names, cells)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    else:
+        table = pa.table({name: pa.array(cells[:, i].tolist(), type=pa.string()) for i, name in enumerate(names)})
+
+    file_metadata = dict(table.schema.metadata or {})
+    for key, value in metadata.items():
+        file_metadata[key.encode()] = (value if isinstance(value, str) else json.dumps(value)).encode()
+    pq.write_table(table.replace_schema_metadata(file_metadata), path)
+
+
+def table_record(key: str, combined_table: Dict, source_pdf: Optional[str] = None) -> Optional[Dict]:
+    """
+    Build a JSON-serialisable record of a combined table for API responses
+
+    Args:
+        key (str): Group key of the table
+        combined_table (Dict): Combined table (title, headers, data, pages, ...)
+        source_pdf (str): Source PDF file name
+
+    Returns:
+        Dictionary with the columns and squared-up rows, None for a table without data
+    """
+    columns, cells = normalize_table(combined_table.get('headers', []), combined_table.get('data', []),
+                                     escape_formulas=False)
+    if not cells.size:
+        return None
+
+    return {
+        "key": key,
+        "title": combined_table.get('title', ''),
+        "columns": [str(column) for column in columns],
+        "rows": cells.tolist(),
+        "pages": combined_table.get('pages', []),
+        "table_numbers": combined_table.get('table_numbers', []),
+        "original_titles": combined_table.get('original_titles', []),
+        "source_pdf": source_pdf
+    }
@@ -0,0 +1,191 @@
+"""
+Grouping index for continuation tables
+
+Tables extracted from consecutive pages are merged when their normalised
+titles match and their headers are compatible. Each group keeps a
+precomputed header signature (the normalised header tuple) and header set,
+so matching a new table is a hash lookup on the title plus a comparison
+against the few variants stored under it - no rescans of every group and
+no re-normalisation of stored headers.
+
+Groups can be closed early: once a configurable number of pages pass without
+a continuation, a group is finished and handed back for writing, so only the
+tables of the last few pages are held in memory on long documents. A table
+with the same title after that starts a new group (a "_v" variant).
+"""
+import re
+import logging
+from typing import Dict, List, Tuple
+
+from records import TableGroup, intern_text
+
+logger = logging.getLogger(__name__)
+
+# Header words that mark a financial statement layout
+FINANCIAL_HEADER_KEYWORDS = ('particulars', 'sr. no', 'march', 'december', 'audited', 'reviewed',
+                             'quarter ended', 'nine months ended')
+
+# Minimum share of common headers for two tables to count as one
+HEADER_OVERLAP_THRESHOLD = 0.7
+
+
+class HeaderSignature:
+    """Normalised form of a header row, computed once per table"""
+
+    __slots__ = ("headers", "header_set", "is_financial")
+
+    def __init__(self, headers: List):
+        self.headers = tuple(re.sub(r'\s+', ' ', str(h).strip().lower()) for h in headers or [])
+        self.header_set = frozenset(self.headers)
+        joined = ' '.join(self.headers)
+        self.is_financial = any(keyword in joined for keyword in FINANCIAL_HEADER_KEYWORDS)
+
+
+def compare_signatures(first: HeaderSignature, second: HeaderSignature) -> Tuple[bool, str]:
+    """
+    Decide whether two header rows belong to the same (continued) table
+
+    Args:
+        first (HeaderSignature): Headers of the existing group
+        second (HeaderSignature): Headers of the new table
+
+    Returns:
+        Tuple of (compatible, human readable reason)
+    """
+    if not first.headers or not second.headers:
+        return True, "one table has no headers"
+
+    # Check if headers are identical
+    if first.headers == second.headers:
+        return True, "identical headers"
+
+    # Check if headers have significant overlap
+    common = len(first.header_set & second.header_set)
+    overlap_ratio = common / max(len(first.headers), len(second.headers))
+    if overlap_ratio >= HEADER_OVERLAP_THRESHOLD:
+        return True, f"header overlap {overlap_ratio:.0%}"
+
+    # Check if one set is a subset of the other (for partial headers)
+    if first.header_set <= second.header_set or second.header_set <= first.header_set:
+        return True, "header subset"
+
+    # Check for common financial statement header patterns
+    if first.is_financial and second.is_financial:
+        return True, "both financial statement headers"
+
+    return False, f"incompatible headers (overlap {overlap_ratio:.0%})"
+
+
+def headers_compatible(headers1: List, headers2: List) -> bool:
+    """Check if two header rows are compatible for table continuation"""
+    return compare_signatures(HeaderSignature(headers1), HeaderSignature(headers2))[0]
+
+
+class TableGroupIndex:
+    """Open table groups, indexed by normalised title"""
+
+    def __init__(self, continuation_window: int = 0):
+        """
+        Args:
+            continuation_window (int): Pages without a continuation after which a
+                group is closed by finish_page; 0 keeps groups open until close_all
+        """
+        self.continuation_window = continuation_window
+        self.groups: Dict[str, TableGroup] = {}           # group key -> combined table
+        self._signatures: Dict[str, HeaderSignature] = {}
+        self._keys_by_title: Dict[str, List[str]] = {}    # normalised title -> open group keys
+        self._groups_created: Dict[str, int] = {}         # normalised title -> groups ever created
+        self._title_of: Dict[str, str] = {}               # group key -> normalised title
+        self._last_page: Dict[str, int] = {}              # group key -> pages finished when last extended
+        self._pages_finished = 0
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def add(self, normalized_title: str, table_data: Dict, page_num: int, table_num: int) -> Tuple[str, str]:
+        """
+        Add an extracted table, merging it into a compatible open group
+
+        Args:
+            normalized_title (str): Normalised title of the table
+            table_data (Dict): Extracted table (title, headers, data)
+            page_num (int): Page the table was found on
+            table_num (int): Position of the table on the page
+
+        Returns:
+            Tuple of (group key, reason the table was merged or split)
+        """
+        normalized_title = intern_text(normalized_title)
+        title = table_data.get('title', 'Untitled Table')
+        headers = table_data.get('headers', [])
+        signature = HeaderSignature(headers)
+
+        open_keys = self._keys_by_title.get(normalized_title)
+        if not open_keys:
+            created = self._groups_created.get(normalized_title, 0)
+            key = normalized_title if not created else f"{normalized_title}_v{created + 1}"
+            key = self._new_group(normalized_title, key, table_data, signature, page_num, table_num)
+            return key, "new title"
+
+        rejections = []
+        for key in open_keys:
+            compatible, reason = compare_signatures(self._signatures[key], signature)
+            if compatible:
+                self.groups[key].extend(title, table_data.get('data', []), page_num, table_num)
+                self._last_page[key] = self._pages_finished
+                return key, f"continuation of {key}: {reason}"
+            rejections.append(reason)
+
+        # Different table structure under the same title - start a variant group
+        variant = f"{normalized_title}_v{self._groups_created[normalized_title] + 1}"
+        key = self._new_group(normalized_title, variant, table_data, signature, page_num, table_num)
+        return key, f"split from {open_keys[0]}: {rejections[0]}"
+
+    def _new_group(self, normalized_title: str, key: str, table_data: Dict, signature: HeaderSignature,
+                   page_num: int, table_num: int) -> str:
+        key = intern_text(key)
+        self.groups[key] = TableGroup(table_data.get('title', 'Untitled Table'), table_data.get('headers', []),
+                                      table_data.get('data', []), page_num, table_num)
+        self._signatures[key] = signature
+        self._title_of[key] = normalized_title
+        self._last_page[key] = self._pages_finished
+        self._keys_by_title.setdefault(normalized_title, []).append(key)
+        self._groups_created[normalized_title] = self._groups_created.get(normalized_title, 0) + 1
+        return key
+
+    def _close(self, key: str) -> Tuple[str, TableGroup]:
+        normalized_title = self._title_of.pop(key)
+        open_keys = self._keys_by_title[normalized_title]
+        open_keys.remove(key)
+        if not open_keys:
+            del self._keys_by_title[normalized_title]
+        self._signatures.pop(key, None)
+        self._last_page.pop(key, None)
+        return key, self.groups.pop(key)
+
+    def close_title(self, normalized_title: str) -> List[Tuple[str, TableGroup]]:
+        """
+        Close every open group under a normalised title
+
+        Returns:
+            List of (group key, combined table) in creation order
+        """
+        return [self._close(key) for key in list(self._keys_by_title.get(normalized_title, []))]
+
+    def finish_page(self) -> List[Tuple[str, TableGroup]]:
+        """
+        Mark a page as processed and close groups that can no longer continue
+
+        Returns:
+            List of (group key, combined table) for groups that went
+            continuation_window pages without a continuation, in creation order
+        """
+        self._pages_finished += 1
+        if self.continuation_window <= 0:
+            return []
+        cutoff = self._pages_finished - self.continuation_window
+        return [self._close(key) for key in list(self.groups) if self._last_page[key] < cutoff]
+
+    def close_all(self) -> List[Tuple[str, TableGroup]]:
+        """Close every open group, in creation order"""
+        return [self._close(key) for key in list(self.groups)]
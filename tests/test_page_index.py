@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from page_index import PageTextIndex, check_page_ranges, parse_page_ranges, parse_targets  # noqa: E402
+
+
+def test_check_page_ranges_accepts_open_ended_ranges_without_expanding():
+    # Expanding "40-" against an unknown page count must never be attempted
+    check_page_ranges("40-")
+    check_page_ranges("1-5, 12, 40-")
+
+
+@pytest.mark.parametrize("spec", ["abc", "0", "5-3", "-", "1-2-3"])
+def test_check_page_ranges_rejects_malformed_specs(spec):
+    with pytest.raises(ValueError):
+        check_page_ranges(spec)
+
+
+def test_parse_page_ranges_expands_open_end_to_page_count():
+    assert parse_page_ranges("40-", 42) == {40, 41, 42}
+    assert parse_page_ranges("-2, 5", 10) == {1, 2, 5}
+
+
+def test_parse_page_ranges_rejects_ranges_past_last_page():
+    with pytest.raises(ValueError):
+        parse_page_ranges("50-60", 12)
+
+
+def test_parse_targets_rejects_invalid_patterns():
+    with pytest.raises(ValueError):
+        parse_targets("re:(")
+    with pytest.raises(ValueError):
+        parse_targets("Balance Sheet; /[unclosed/")
+    assert parse_targets("Balance Sheet; re:cash\\s+flows?") == ["Balance Sheet", "re:cash\\s+flows?"]
+
+
+def test_search_matches_regex_and_phrase_targets():
+    index = PageTextIndex(["Balance Sheet as at 31 March", "Statement of Cash Flows", "Notes"])
+    assert index.search("re:cash\\s+flows?") == {2}
+    assert index.search("balance sheet") == {1}
@@ -0,0 +1,176 @@
+"""
+Data-driven title normalisation for grouping continuation tables
+
+Rules live in a JSON file (title_rules.json by default, or TITLE_RULES_PATH)
+so new issuers can be onboarded without a code change:
+
+    continuation_patterns  regexes removed from titles ("(continued)", "page 2")
+    replacements           {"pattern", "replacement"} pairs that canonicalise
+                           company names, periods and units
+    canonical_titles       {"any", "all", "not_all", "title"} keyword rules that
+                           map a whole family of titles onto one group title
+
+All patterns are case-insensitive and compiled once into a single combined
+matcher per rule type. Normalised titles are memoised, and the rules file is
+re-read automatically when it changes on disk.
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("title_rules.json")
+
+
+class TitleRules:
+    """Compiled title normalisation rules with a memo of titles already seen"""
+
+    def __init__(self, rules_path: Optional[str] = None, cache_size: int = 4096, reload_interval: float = 5.0):
+        """
+        Args:
+            rules_path (str): JSON rules file, defaults to TITLE_RULES_PATH or title_rules.json
+            cache_size (int): Maximum number of memoised titles
+            reload_interval (float): Seconds between checks of the rules file for changes
+        """
+        self.rules_path = Path(rules_path or os.environ.get("TITLE_RULES_PATH") or DEFAULT_RULES_PATH)
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._cache: Dict[str, str] = {}
+        self._mtime = None
+        self._next_check = 0.0
+
+        self._continuation = None
+        self._replacement = None
+        self._replacement_values: Dict[str, str] = {}
+        self._canonical: List[tuple] = []
+
+        self.reload()
+
+    def reload(self):
+        """Load and compile the rules file, keeping the previous rules if it is invalid"""
+        try:
+            mtime = self.rules_path.stat().st_mtime
+            with open(self.rules_path, "r", encoding="utf-8") as f:
+                rules = json.load(f)
+            self._compile(rules)
+        except Exception as e:
+            if self._continuation is None:
+                raise Exception(f"Failed to load title rules from {self.rules_path}: {e}")
+            logger.error(f"Failed to reload title rules from {self.rules_path}, keeping previous rules: {e}")
+            return
+
+        with self._lock:
+            self._mtime = mtime
+            self._cache.clear()
+        logger.info(f"Loaded title rules from {self.rules_path}: "
+                    f"{len(self._replacement_values)} replacements, {len(self._canonical)} canonical titles")
+
+    def _compile(self, rules: Dict):
+        """Compile rule lists into combined matchers"""
+        continuation = rules.get("continuation_patterns", [])
+        self._continuation = re.compile("|".join(f"(?:{pattern})" for pattern in continuation), re.IGNORECASE) \
+            if continuation else None
+
+        # One alternation for all replacements - the matching group names the replacement
+        alternatives = []
+        values = {}
+        for i, rule in enumerate(rules.get("replacements", [])):
+            name = f"_r{i}"
+            alternatives.append(f"(?P<{name}>{rule['pattern']})")
+            values[name] = rule["replacement"]
+        replacement = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+
+        canonical = []
+        for rule in rules.get("canonical_titles", []):
+            canonical.append((
+                tuple(keyword.lower() for keyword in rule.get("any", [])),
+                tuple(keyword.lower() for keyword in rule.get("all", [])),
+                tuple(keyword.lower() for keyword in rule.get("not_all", [])),
+                rule["title"]
+            ))
+
+        self._replacement = replacement
+        self._replacement_values = values
+        self._canonical = canonical
+
+    def _maybe_reload(self):
+        """Pick up edits to the rules file without a restart"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        try:
+            if self.rules_path.stat().st_mtime != self._mtime:
+                self.reload()
+        except OSError as e:
+            logger.warning(f"Cannot check title rules file {self.rules_path}: {e}")
+
+    def normalize(self, title: str) -> str:
+        """
+        Normalise a (non-empty) table title for grouping
+
+        Args:
+            title (str): Original title
+
+        Returns:
+            str: Normalised title
+        """
+        self._maybe_reload()
+
+        cached = self._cache.get(title)
+        if cached is not None:
+            return cached
+
+        # Remove extra spaces and normalize
+        normalized = re.sub(r"\s+", " ", title.strip())
+
+        # Remove common continuation indicators
+        if self._continuation is not None:
+            normalized = self._continuation.sub("", normalized)
+
+        # Normalize company name variations and period/unit patterns
+        if self._replacement is not None:
+            values = self._replacement_values
+            normalized = self._replacement.sub(lambda match: values[match.lastgroup], normalized)
+
+        # Map families of similar financial statement titles onto one group
+        lowered = normalized.lower()
+        for any_keywords, all_keywords, not_all_keywords, canonical_title in self._canonical:
+            if any_keywords and not any(keyword in lowered for keyword in any_keywords):
+                continue
+            if not all(keyword in lowered for keyword in all_keywords):
+                continue
+            if not_all_keywords and all(keyword in lowered for keyword in not_all_keywords):
+                continue
+            normalized = canonical_title
+            break
+
+        normalized = normalized.strip()
+
+        with self._lock:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[title] = normalized
+
+        return normalized
+
+
+_default_rules = None
+_default_rules_lock = threading.Lock()
+
+
+def get_title_rules() -> TitleRules:
+    """Return the process-wide rules engine shared by all extractors"""
+    global _default_rules
+    with _default_rules_lock:
+        if _default_rules is None:
+            _default_rules = TitleRules()
+        return _default_rules